@@ -2,14 +2,17 @@
 bottomup_elimination.py - Contains several heuristics to compute a vtree based on a literal context (LiteralInfo).
 """
 import random
+from typing import List, Tuple, Iterable
 
 #from pywmi.engines.xsdd.vtrees.vtree import *
 from pywmi.engines.xsdd.literals import LiteralInfo
 from pywmi.engines.xsdd.vtrees.vtree import Vtree, balanced
 
-from .int_tree import IntTreeFactory, IntTreeVar, IntTreeLine
-from .primal import create_interaction_graph_from_literals
-from .topdown_mincut import conversion_tables
+from .elimination_engine import EliminationEngine, MINFILL, MINDEGREE, MIN_INDUCED_WIDTH, BALANCED, LINE, \
+    least_depth_increase, random_candidate
+from .lookahead import MinfillLookahead
+from .parallel_ties import ParallelLowestFutureMinfill
+from .weighted_primal import literal_multiplicity
 
 
 def bottomup_balanced_minfill(literals: LiteralInfo) -> Vtree:
@@ -18,25 +21,43 @@ def bottomup_balanced_minfill(literals: LiteralInfo) -> Vtree:
     :param literals: The context to create a vtree for.
     :return: A vtree based on a balanced min-fill ordering.
     """
-    logic2cont, cont2logic = conversion_tables(literals)
-    primal = create_interaction_graph_from_literals(cont2logic.keys(), logic2cont.values(), True, False)
-    int_factory = IntTreeFactory(primal)
+    return EliminationEngine(literals).vtree(MINFILL, BALANCED)
 
-    primal.compute_fills()
-    while primal.nb_fills() > 0:
-        minfills = primal.get_minfills()
-        minfills = int_factory.get_least_depth_increase(minfills)  # balanced
-        minfills = primal.get_lowest_future_minfill(minfills)  # balanced
-        selected_var = minfills[0]
-        int_factory.add_node(selected_var)
-        primal.remove_and_process_node(selected_var)
 
-    # Construct vtree
-    int_tree = int_factory.get_int_tree()
-    if int_tree is not None:
-        return int_tree.create_vtree(set(logic2cont.keys()), logic2cont)
-    else:
-        return balanced(literals)
+def bottomup_balanced_minfill_parallel(literals: LiteralInfo, workers=4, processes=True, min_candidates=16) -> Vtree:
+    """
+    Create a vtree by using a balanced min-fill approach, where the lowest future minfill of large sets of tied
+    vertices is evaluated in a pool of workers (see ParallelLowestFutureMinfill). An equal-score variant of
+    bottomup_balanced_minfill: the tied vertices get the same scores, but the vertices with equal scores may be ordered
+    differently, so the vtree can differ. The result does not depend on the amount of workers.
+    :param literals: The context to create a vtree for.
+    :param workers: The amount of workers.
+    :param processes: Whether to use a process pool (True) or a thread pool (False).
+    :param min_candidates: Ties of less vertices are evaluated in the current thread.
+    :return: A vtree based on a balanced min-fill ordering.
+    """
+    with ParallelLowestFutureMinfill(workers, processes, min_candidates) as lowest_future_minfill_parallel:
+        return EliminationEngine(literals).vtree(MINFILL, (least_depth_increase, lowest_future_minfill_parallel))
+
+
+def bottomup_balanced_minfill_lookahead(literals: LiteralInfo, depth=2, beam_width=3, stats: dict = None) -> Vtree:
+    """
+    Create a vtree by using a balanced min-fill approach, where the remaining ties are broken by a k-step lookahead
+    instead of the one-step get_lowest_future_minfill. The lookahead scores each tie by the lowest total fill of the
+    next depth eliminations, expanding the beam_width lowest fill vertices at each step (see MinfillLookahead).
+    :param literals: The context to create a vtree for.
+    :param depth: The amount of eliminations to look ahead. depth=1 breaks ties by the current fill only.
+    :param beam_width: The amount of lowest fill vertices to expand at each lookahead step.
+    :param stats: If not None, 'lookahead_time' (seconds) and 'lookahead_states' (nb of evaluated partial elimination
+    states) are stored in this dictionary.
+    :return: A vtree based on a balanced min-fill ordering.
+    """
+    lookahead = MinfillLookahead(depth=depth, beam_width=beam_width)
+    vtree = EliminationEngine(literals, incremental=True).vtree(MINFILL, (least_depth_increase, lookahead))
+    if stats is not None:
+        stats['lookahead_time'] = lookahead.time_spent
+        stats['lookahead_states'] = lookahead.nb_states()
+    return vtree
 
 
 def bottomup_balanced_minfill_shuffle(literals: LiteralInfo) -> Vtree:
@@ -46,34 +67,17 @@ def bottomup_balanced_minfill_shuffle(literals: LiteralInfo) -> Vtree:
     :param literals: The context to create a vtree for.
     :return: A vtree based on a balanced min-fill ordering.
     """
-    logic2cont, cont2logic = conversion_tables(literals)
-    # Randomize
-    continuous_vars = list(cont2logic.keys())
-    random.shuffle(continuous_vars)
-    co_occurrences = list(logic2cont.values())
-    random.shuffle(co_occurrences)
-
-    # Construct int_tree
-    primal = create_interaction_graph_from_literals(continuous_vars, co_occurrences, True, False)
-    int_factory = IntTreeFactory(primal)
-    primal.compute_fills()
-    while primal.nb_fills() > 0:
-        minfills = primal.get_minfills()
-        minfills = int_factory.get_least_depth_increase(minfills)  # balance
-        minfills = primal.get_lowest_future_minfill(minfills)  # balance
-        int_factory.add_node(minfills[0])
-        primal.remove_and_process_node(minfills[0])
-
-    # Randomize some more
-    logic_variables = list(logic2cont.keys())
-    random.shuffle(logic_variables)
-
-    # Construct vtree
-    int_tree = int_factory.get_int_tree()
-    if int_tree is not None:
-        return int_tree.create_vtree(set(logic_variables), logic2cont)
-    else:
-        return balanced(literals)
+    return EliminationEngine(literals).vtree(MINFILL, BALANCED, shuffle=True)
+
+
+def bottomup_balanced_minfill_batch(literals: LiteralInfo, seeds: Iterable[int]) -> List[Tuple[Vtree, List[int]]]:
+    """
+    Create the vtrees of bottomup_balanced_minfill_shuffle for many seeds, sharing the conversion of the literals.
+    :param literals: The context to create the vtrees for.
+    :param seeds: The seeds, the result of a seed equals random.seed(seed) followed by the shuffled strategy.
+    :return: For each distinct integration order, a vtree and the seeds resulting in it (see EliminationEngine).
+    """
+    return EliminationEngine(literals).vtree_batch(seeds, MINFILL, BALANCED)
 
 
 def bottomup_minfill(literals: LiteralInfo) -> Vtree:
@@ -82,19 +86,7 @@ def bottomup_minfill(literals: LiteralInfo) -> Vtree:
     :param literals: The context to create a vtree for.
     :return: A vtree based on a min-fill ordering.
     """
-    logic2cont, cont2logic = conversion_tables(literals)
-    primal = create_interaction_graph_from_literals(cont2logic.keys(), logic2cont.values(), True, False)
-    int_factory = IntTreeFactory(primal)
-
-    primal.compute_fills()
-    while primal.nb_fills() > 0:
-        minfills = primal.get_minfills()
-        #minfills = int_factory.get_least_depth_increase(minfills)
-        #minfills = primal.get_lowest_future_minfill(minfills)
-        var_index = random.randint(0, len(minfills)-1)  # required to simulate min-fill
-        int_factory.add_node(minfills[var_index])
-        primal.remove_and_process_node(minfills[var_index])
-    return int_factory.get_int_tree().create_vtree(logic2cont.keys(), logic2cont)
+    return EliminationEngine(literals).vtree(MINFILL, (random_candidate,))  # random required to simulate min-fill
 
 
 def bottomup_minfill_shuffle(seed, literals: LiteralInfo) -> Vtree:
@@ -105,26 +97,17 @@ def bottomup_minfill_shuffle(seed, literals: LiteralInfo) -> Vtree:
     :return: A vtree based on a min-fill ordering.
     """
     random.seed(a=seed)
-    logic2cont, cont2logic = conversion_tables(literals)
-    continuous_vars = list(cont2logic.keys())
-    random.shuffle(continuous_vars)
-    co_occurrences = list(logic2cont.values())
-    random.shuffle(co_occurrences)
-    primal = create_interaction_graph_from_literals(continuous_vars, co_occurrences, True, False)
-    int_factory = IntTreeFactory(primal)
-
-    primal.compute_fills()
-    while primal.nb_fills() > 0:
-        minfills = primal.get_minfills()
-        #minfills = int_factory.get_least_depth_increase(minfills)
-        #minfills = primal.get_lowest_future_minfill(minfills)
-        var_index = random.randint(0, len(minfills)-1)
-        int_factory.add_node(minfills[var_index])
-        primal.remove_and_process_node(minfills[var_index])
-    logic_variables = list(logic2cont.keys())
-    random.shuffle(logic_variables)
-    result = int_factory.get_int_tree().create_vtree(set(logic_variables), logic2cont)
-    return result
+    return EliminationEngine(literals).vtree(MINFILL, (random_candidate,), shuffle=True)
+
+
+def bottomup_minfill_batch(literals: LiteralInfo, seeds: Iterable[int]) -> List[Tuple[Vtree, List[int]]]:
+    """
+    Create the vtrees of bottomup_minfill_shuffle for many seeds, sharing the conversion of the literals.
+    :param literals: The context to create the vtrees for.
+    :param seeds: The seeds to use, as in bottomup_minfill_shuffle.
+    :return: For each distinct integration order, a vtree and the seeds resulting in it (see EliminationEngine).
+    """
+    return EliminationEngine(literals).vtree_batch(seeds, MINFILL, (random_candidate,))
 
 
 def bottomup_minfill_line_shuffle(seed, literals: LiteralInfo) -> Vtree:
@@ -136,28 +119,7 @@ def bottomup_minfill_line_shuffle(seed, literals: LiteralInfo) -> Vtree:
     :return: A vtree with a line variable integration ordering.
     """
     random.seed(a=seed)
-    logic2cont, cont2logic = conversion_tables(literals)
-    continuous_vars = list(cont2logic.keys())
-    random.shuffle(continuous_vars)
-    co_occurrences = list(logic2cont.values())
-    random.shuffle(co_occurrences)
-    primal = create_interaction_graph_from_literals(continuous_vars, co_occurrences, True, False)
-
-    primal.compute_fills()
-    minfills = primal.get_minfills()
-    int_tree = IntTreeVar(minfills[0])
-    while primal.nb_fills() > 0:
-        minfills = primal.get_minfills()
-        #minfills = int_factory.get_least_depth_increase(minfills)
-        #minfills = primal.get_lowest_future_minfill(minfills)
-        var_index = random.randint(0, len(minfills)-1)
-        int_tree = IntTreeLine(minfills[var_index], int_tree)
-        primal.remove_and_process_node(minfills[var_index])
-
-    logic_variables = list(logic2cont.keys())
-    random.shuffle(logic_variables)
-    result = int_tree.create_vtree(set(logic_variables), logic2cont)
-    return result
+    return EliminationEngine(literals).vtree(MINFILL, (random_candidate,), shuffle=True, shape=LINE)
 
 
 def bottomup_mindegree(literals: LiteralInfo, balanced=True) -> Vtree:
@@ -168,18 +130,7 @@ def bottomup_mindegree(literals: LiteralInfo, balanced=True) -> Vtree:
     prioritised.
     :return: A vtree based on a balanced min-degree ordering.
     """
-    logic2cont, cont2logic = conversion_tables(literals)
-    primal = create_interaction_graph_from_literals(cont2logic.keys(), logic2cont.values(), False, True)
-    int_factory = IntTreeFactory(primal)
-
-    primal.compute_degrees()
-    while primal.nb_degrees() > 0:
-        mindegrees = primal.get_mindegrees()
-        if balanced:
-            mindegrees = int_factory.get_least_depth_increase(mindegrees)  # balanced
-        int_factory.add_node(mindegrees[0])
-        primal.remove_node(mindegrees[0])
-    return int_factory.get_int_tree().create_vtree(logic2cont.keys(), logic2cont)
+    return EliminationEngine(literals).vtree(MINDEGREE, (least_depth_increase,) if balanced else ())
 
 
 def bottomup_min_induced_width(literals: LiteralInfo, balanced=True) -> Vtree:
@@ -190,15 +141,30 @@ def bottomup_min_induced_width(literals: LiteralInfo, balanced=True) -> Vtree:
     depth is prioritised.
     :return: A vtree based on a balanced min-induced-width ordering.
     """
-    logic2cont, cont2logic = conversion_tables(literals)
-    primal = create_interaction_graph_from_literals(cont2logic.keys(), logic2cont.values(), False, True)
-    int_factory = IntTreeFactory(primal)
-
-    primal.compute_degrees()
-    while primal.nb_degrees() > 0:
-        mindegrees = primal.get_mindegrees()
-        if balanced:
-            mindegrees = int_factory.get_least_depth_increase(mindegrees)  # balanced
-        int_factory.add_node(mindegrees[0])
-        primal.remove_and_process_node(mindegrees[0])
-    return int_factory.get_int_tree().create_vtree(logic2cont.keys(), logic2cont)
+    return EliminationEngine(literals).vtree(MIN_INDUCED_WIDTH, (least_depth_increase,) if balanced else ())
+
+
+def bottomup_balanced_weighted_minfill(literals: LiteralInfo, weighting=literal_multiplicity) -> Vtree:
+    """
+    Create a vtree by using a balanced min-fill approach where each fill edge is weighted by the product of the
+    weights of its variables, deferring the elimination of expensive variables.
+    :param literals: The context to create a vtree for.
+    :param weighting: A function mapping the conversion tables (logic2cont, cont2logic) to the weight of each
+    continuous variable. By default, the amount of literals a variable occurs in.
+    :return: A vtree based on a balanced weighted min-fill ordering.
+    """
+    return EliminationEngine(literals, weighting).vtree(MINFILL, BALANCED)
+
+
+def bottomup_weighted_min_induced_width(literals: LiteralInfo, weighting=literal_multiplicity, balanced=True) -> Vtree:
+    """
+    Create a vtree by using a min-induced-width approach where the degree of a variable is the sum of its weight and
+    the weights of its neighbors, deferring the elimination of expensive variables.
+    :param literals: The context to create a vtree for.
+    :param weighting: A function mapping the conversion tables (logic2cont, cont2logic) to the weight of each
+    continuous variable. By default, the amount of literals a variable occurs in.
+    :param balanced: When true, from all minimal nodes, the one that least increases the integration tree depth is
+    prioritised.
+    :return: A vtree based on a weighted min-induced-width ordering.
+    """
+    return EliminationEngine(literals, weighting).vtree(MIN_INDUCED_WIDTH, (least_depth_increase,) if balanced else ())
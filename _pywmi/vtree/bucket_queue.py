@@ -0,0 +1,125 @@
+"""
+    bucket_queue.py - A priority structure for small non-negative integer priorities (e.g. fills or degrees). Items are
+    stored in buckets indexed by their priority, so changing the priority of an item is O(1) and the items with the
+    minimum priority are found in O(|ties|). It offers the part of the ValueSortedDict interface used by PrimalGraph.
+"""
+from typing import Dict, Iterator, Tuple, Callable, Optional
+
+
+class BucketQueue:
+    """
+    A mapping of keys to values, sorted by the (non-negative integer) priority of the values.
+    Within a bucket, keys are sorted in order of insertion. As in ValueSortedDict, setting the value of an existing key
+    moves it to the end of its bucket.
+    """
+
+    def __init__(self, priority: Optional[Callable[[any], int]] = None):
+        """
+        Create an empty bucket queue.
+        :param priority: Function mapping a value to its priority. If None, the values are the priorities.
+        """
+        self._priority_of = priority
+        self._values: Dict[any, any] = dict()
+        self._priorities: Dict[any, int] = dict()
+        self._buckets: Dict[int, Dict[any, None]] = dict()  # Only non-empty buckets are stored.
+        self._min = 0  # Lower bound on the minimum priority, exact when peeked.
+
+    def __len__(self):
+        return len(self._values)
+
+    def __contains__(self, key):
+        return key in self._values
+
+    def __iter__(self) -> Iterator[any]:
+        """ Iterate over the keys in order of priority. """
+        for priority in sorted(self._buckets):
+            yield from list(self._buckets[priority])
+
+    def __getitem__(self, key):
+        return self._values[key]
+
+    def get(self, key, default=None):
+        return self._values.get(key, default)
+
+    def __setitem__(self, key, value):
+        priority = value if self._priority_of is None else self._priority_of(value)
+        assert priority >= 0
+        if key in self._priorities:
+            self._remove_from_bucket(key)
+        self._values[key] = value
+        self._priorities[key] = priority
+        bucket = self._buckets.get(priority)
+        if bucket is None:
+            bucket = self._buckets[priority] = dict()
+        bucket[key] = None
+        if priority < self._min or len(self._values) == 1:
+            self._min = priority
+
+    def update(self, items):
+        """ Set each (key, value) of the given mapping or iterable of pairs. """
+        if isinstance(items, dict):
+            items = items.items()
+        for key, value in items:
+            self[key] = value
+
+    def pop(self, key, *default):
+        """ Remove key and return its value. If key is not present, default is returned if given. """
+        if key not in self._values:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        self._remove_from_bucket(key)
+        del self._priorities[key]
+        return self._values.pop(key)
+
+    def _remove_from_bucket(self, key):
+        priority = self._priorities[key]
+        bucket = self._buckets[priority]
+        del bucket[key]
+        if len(bucket) == 0:
+            del self._buckets[priority]
+
+    def _min_priority(self) -> int:
+        """ The minimum priority. Walks up the buckets, or takes the minimum bucket if that is fewer steps. """
+        assert len(self._buckets) > 0
+        if self._min not in self._buckets:
+            steps = len(self._buckets)
+            priority = self._min + 1
+            while priority not in self._buckets and steps > 0:
+                priority += 1
+                steps -= 1
+            self._min = priority if steps > 0 else min(self._buckets)
+        return self._min
+
+    @property
+    def key(self) -> Callable[[any], int]:
+        """ Function mapping a key to its priority. """
+        return self._priorities.__getitem__
+
+    def peekitem(self, index=0) -> Tuple[any, any]:
+        """ The first (key, value) with the minimum priority. Only index 0 is supported. """
+        assert index == 0
+        if len(self._values) == 0:
+            raise IndexError("peekitem on empty BucketQueue")
+        key = next(iter(self._buckets[self._min_priority()]))
+        return key, self._values[key]
+
+    def irange_key(self, min_key: int, max_key: int) -> Iterator[any]:
+        """ Iterate over the keys with min_key <= priority <= max_key, in order of priority. """
+        if max_key - min_key + 1 <= len(self._buckets):
+            priorities = range(min_key, max_key + 1)
+        else:
+            priorities = sorted(priority for priority in self._buckets if min_key <= priority <= max_key)
+        for priority in priorities:
+            bucket = self._buckets.get(priority)
+            if bucket is not None:
+                yield from list(bucket)
+
+    def keys(self):
+        return list(self)
+
+    def values(self):
+        return [self._values[key] for key in self]
+
+    def items(self):
+        return [(key, self._values[key]) for key in self]
@@ -0,0 +1,171 @@
+"""
+cost_model.py - Contains a static estimator of the integration cost of an integration tree, to compare candidate
+vtrees without compiling and integrating them. The estimate is a log-linear model over structural features of the tree
+(see CostFeatures), which can be calibrated on the times measured by MeasuredFXSDD.
+"""
+import math
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import List, Tuple, Dict, Optional, Iterable, Sequence
+
+import numpy as np
+
+from pywmi.engines.xsdd.literals import LiteralInfo
+from pywmi.engines.xsdd.vtrees.vtree import Vtree
+
+from .elimination_width import OrderEvaluator
+from .int_tree import IntTree, vtree_to_int_tree
+from .topdown_mincut import conversion_tables
+
+
+@dataclass(frozen=True)
+class CostFeatures:
+    """
+    Structural features of an integration tree in the context of the literals (hyperedges over continuous variables).
+    A literal is bound by a node when it has a continuous variable in the subtree of that node, so it is part of the
+    integrand when the variable of that node is integrated. A bound literal crosses a node when it also has a variable
+    outside of that subtree (above the node), so the integration result still depends on it.
+    """
+    width: int  # induced width of the elimination order of the tree
+    depth: int  # depth of the tree
+    max_bound: int  # maximum amount of literals bound by a node
+    sum_bound: int  # amount of literals bound, summed over all nodes
+    max_crossing: int  # maximum amount of literals crossing a node
+    sum_crossing: int  # amount of literals crossing, summed over all nodes
+
+    def vector(self) -> List[float]:
+        """ The regressors of the cost model: an intercept and the features, sums on a logarithmic scale. """
+        return [1.0, self.width, self.depth, self.max_bound, math.log2(1 + self.sum_bound), self.max_crossing,
+                math.log2(1 + self.sum_crossing)]
+
+
+def extract_features(int_tree: IntTree, logic2cont, evaluator: Optional[OrderEvaluator] = None) -> CostFeatures:
+    """
+    Compute the cost features of an integration tree.
+    :param int_tree: The integration tree.
+    :param logic2cont: A mapping from literals to their continuous variables (see conversion_tables).
+    :param evaluator: An evaluator of the interactions of logic2cont, to reuse over many trees of the same problem.
+    :return: The features of int_tree.
+    """
+    if evaluator is None:
+        cont_vars = {var for cont_vars in logic2cont.values() for var in cont_vars}
+        evaluator = OrderEvaluator(cont_vars, logic2cont.values())
+    width = evaluator.width(int_tree.get_elimination_order())
+
+    # Number the nodes in pre-order, so the subtree of a node is the interval [start, end)
+    intervals: List[Tuple[int, int]] = []
+    var_start: Dict[any, int] = dict()
+    stack = [(int_tree, False)]
+    starts = []
+    position = 0
+    while len(stack) > 0:
+        node, expanded = stack.pop()
+        if expanded:
+            intervals.append((starts.pop(), position))
+        else:
+            if node.var is not None:
+                var_start[node.var] = position
+            starts.append(position)
+            position += 1
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(node.get_children()))
+
+    # The variables of a literal lie on one path: the lowest node has the largest number, the highest the smallest
+    lowest, highest = [], []
+    for cont_vars in logic2cont.values():
+        numbers = [var_start[var] for var in cont_vars if var in var_start]
+        if len(numbers) > 0:
+            lowest.append(max(numbers))
+            highest.append(min(numbers))
+    lowest.sort()
+    highest.sort()
+
+    max_bound, sum_bound, max_crossing, sum_crossing = 0, 0, 0, 0
+    for start, end in intervals:
+        bound = bisect_left(lowest, end) - bisect_left(lowest, start)
+        crossing = bound - (bisect_left(highest, end) - bisect_left(highest, start))
+        max_bound, sum_bound = max(max_bound, bound), sum_bound + bound
+        max_crossing, sum_crossing = max(max_crossing, crossing), sum_crossing + crossing
+    return CostFeatures(width, int_tree.depth(), max_bound, sum_bound, max_crossing, sum_crossing)
+
+
+def integration_time(times) -> float:
+    """
+    The time spent on integration in the run of a MeasuredFXSDD, given its _times: the time of compute_volume without
+    the time to create the vtree and the SDD.
+    """
+    total = max(times['compute_volume'])  # compute_volume may recurse
+    return max(total - sum(times['get_vtree']) - sum(times['get_sdd']), 0.0)
+
+
+class CostModel:
+    """
+    Predicts the integration cost (in seconds) of an integration tree as exp(weights . features.vector()). The default
+    weights are not calibrated and only order trees by width first, then by the literals that have to be integrated.
+    """
+    DEFAULT_WEIGHTS = (0.0, 1.0, 0.1, 0.1, 0.05, 0.2, 0.05)
+
+    def __init__(self, weights: Optional[Sequence[float]] = None):
+        self.weights = np.array(weights if weights is not None else self.DEFAULT_WEIGHTS, dtype=float)
+
+    def predict_features(self, features: CostFeatures) -> float:
+        return math.exp(float(np.dot(self.weights, features.vector())))
+
+    def predict(self, int_tree: IntTree, logic2cont, evaluator: Optional[OrderEvaluator] = None) -> float:
+        """ The predicted integration cost of int_tree (see extract_features for the parameters). """
+        return self.predict_features(extract_features(int_tree, logic2cont, evaluator))
+
+    def predict_vtree(self, vtree: Vtree, logic2cont, evaluator: Optional[OrderEvaluator] = None) -> float:
+        """ The predicted integration cost of the integration tree of vtree. """
+        return self.predict(vtree_to_int_tree(vtree, logic2cont), logic2cont, evaluator)
+
+    def cheapest(self, vtrees: Iterable[Vtree], literals: LiteralInfo) -> Vtree:
+        """ The vtree with the lowest predicted integration cost for literals (the first one in case of ties). """
+        logic2cont, cont2logic = conversion_tables(literals)
+        evaluator = OrderEvaluator(cont2logic.keys(), logic2cont.values())
+        return min(vtrees, key=lambda vtree: self.predict_vtree(vtree, logic2cont, evaluator))
+
+    @classmethod
+    def fit(cls, samples: Iterable[Tuple[CostFeatures, float]], ridge=1e-3, min_time=1e-4) -> 'CostModel':
+        """
+        Calibrate a cost model with (ridge) least squares regression on the logarithm of the measured times.
+        :param samples: Pairs of the features of an integration tree and its measured integration time in seconds.
+        :param ridge: The regularization of the weights, keeps the fit stable when features are (nearly) collinear.
+        :param min_time: Times are clipped to at least min_time seconds before taking the logarithm.
+        :return: The fitted cost model.
+        """
+        samples = list(samples)
+        assert len(samples) > 0
+        x = np.array([features.vector() for features, _ in samples], dtype=float)
+        y = np.log(np.maximum(np.array([time for _, time in samples], dtype=float), min_time))
+        penalty = ridge * np.eye(x.shape[1])
+        penalty[0, 0] = 0.0  # the intercept is not regularized
+        weights = np.linalg.solve(x.T @ x + penalty, x.T @ y)
+        return cls(weights)
+
+    @staticmethod
+    def sample(engine) -> Tuple[CostFeatures, float]:
+        """
+        The training sample of a MeasuredFXSDD on which compute_volume has been run (in this process).
+        :param engine: The MeasuredFXSDD engine.
+        :return: The features of the integration tree of its vtree and its integration time.
+        """
+        logic2cont, _ = conversion_tables(engine._results['literals'])
+        return extract_features(engine._results['int_tree'], logic2cont), integration_time(engine._times)
+
+
+def cheapest_of(strategies, model: Optional[CostModel] = None):
+    """
+    Create a vtree strategy that runs all given strategies and picks the vtree with the lowest predicted cost.
+    :param strategies: The vtree strategies to choose from.
+    :param model: The cost model, the default (uncalibrated) model if None.
+    :return: A vtree strategy.
+    """
+    strategies = tuple(strategies)
+    if model is None:
+        model = CostModel()
+
+    def cheapest_strat(literals: LiteralInfo, __strats=strategies, __model=model):
+        return __model.cheapest((strat(literals) for strat in __strats), literals)
+    cheapest_strat.__name__ = "cheapest_of_" + "_".join(strat.__name__ for strat in strategies)
+    return cheapest_strat
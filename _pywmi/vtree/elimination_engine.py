@@ -0,0 +1,285 @@
+"""
+elimination_engine.py - Contains the elimination ordering engine shared by the bottom-up and top-down elimination
+heuristics. An engine computes the conversion tables of a literal context once, and creates as many orderings (and
+their integration trees or vtrees) from them as needed. Each ordering is configured by
+
+    Score - what is minimized when choosing the next vertex to eliminate (fill or degree).
+    tie-breakers - functions (state, candidates) -> candidates, applied in order on the minimal vertices.
+    rng - the random number generator of the random tie-breaker and of the shuffling of the input.
+    shape - the integration tree built from the ordering: LINE, TREE (bottom-up) or TOPDOWN (pseudo tree).
+"""
+import random
+from typing import List, Dict, Optional, Iterable, Sequence, Callable, Tuple, Set
+
+from pywmi.engines.xsdd.literals import LiteralInfo
+from pywmi.engines.xsdd.vtrees.vtree import Vtree, balanced
+
+from .int_tree import IntTree, IntTreeFactory, IntTreeVar, IntTreeLine, IntTreeSplit, IntTreeParallel
+from .primal import PrimalGraph, create_interaction_graph_from_literals
+from .topdown_mincut import conversion_tables
+from .weighted_primal import WeightedPrimalGraph
+
+LINE = 'line'
+TREE = 'tree'
+TOPDOWN = 'topdown'
+
+
+class Score:
+    """ The score minimized by the elimination: the fill or the degree of a vertex. """
+
+    def __init__(self, name: str, fills: bool, process: bool):
+        """
+        :param name: The name of the score.
+        :param fills: Whether to minimize the fill (True) or the degree (False) of the eliminated vertex.
+        :param process: Whether the neighbors of an eliminated vertex are connected (remove_and_process_node) or not
+        (remove_node).
+        """
+        self.__name__ = name
+        self.fills = fills
+        self.process = process
+
+    def nb_remaining(self, primal: PrimalGraph) -> int:
+        return primal.nb_fills() if self.fills else primal.nb_degrees()
+
+    def get_minimal(self, primal: PrimalGraph) -> List[any]:
+        return primal.get_minfills() if self.fills else primal.get_mindegrees()
+
+    def eliminate(self, primal: PrimalGraph, var):
+        if self.process:
+            primal.remove_and_process_node(var)
+        else:
+            primal.remove_node(var)
+
+
+MINFILL = Score('minfill', fills=True, process=True)
+MINDEGREE = Score('mindegree', fills=False, process=False)
+MIN_INDUCED_WIDTH = Score('min_induced_width', fills=False, process=True)
+
+
+class EliminationState:
+    """ The state of an elimination in progress, passed to the tie-breakers. """
+
+    def __init__(self, primal: PrimalGraph, int_factory: IntTreeFactory, rng):
+        self.primal = primal
+        self.int_factory = int_factory
+        self.rng = rng
+        self.ordering: List[any] = []  # the vertices eliminated so far, in order
+
+
+def least_depth_increase(state: EliminationState, candidates: List[any]) -> List[any]:
+    """ Tie-breaker keeping the candidates that least increase the depth of the integration tree (balanced). """
+    return state.int_factory.get_least_depth_increase(candidates)
+
+
+def lowest_future_minfill(state: EliminationState, candidates: List[any]) -> List[any]:
+    """ Tie-breaker keeping the candidates with the lowest minfill after their elimination (balanced). """
+    return state.primal.get_lowest_future_minfill(candidates)
+
+
+def random_candidate(state: EliminationState, candidates: List[any]) -> List[any]:
+    """ Tie-breaker keeping one random candidate. """
+    return [candidates[state.rng.randint(0, len(candidates) - 1)]]
+
+
+TieBreaker = Callable[[EliminationState, List[any]], List[any]]
+BALANCED = (least_depth_increase, lowest_future_minfill)
+
+
+class EliminationEngine:
+    """ Creates elimination orderings, integration trees and vtrees for one literal context. """
+
+    def __init__(self, literals: LiteralInfo, weighting: Optional[Callable[[Dict, Dict], Dict[any, float]]] = None,
+                 **primal_options):
+        """
+        :param literals: The context to create vtrees for.
+        :param weighting: If given, a function mapping the conversion tables (logic2cont, cont2logic) to a weight of
+        each continuous variable (e.g. literal_multiplicity). The scores are then weighted (see WeightedPrimalGraph).
+        :param primal_options: Additional options of the primal graphs (e.g. incremental=True).
+        """
+        self.literals = literals
+        self.logic2cont, self.cont2logic = conversion_tables(literals)
+        self.weights = weighting(self.logic2cont, self.cont2logic) if weighting is not None else None
+        self.primal_options = primal_options
+        self._continuous_vars = list(self.cont2logic.keys())
+        self._co_occurrences = list(self.logic2cont.values())
+        self._logic_vars = list(self.logic2cont.keys())
+
+    def create_primal(self, score: Score = MINFILL, rng=None) -> PrimalGraph:
+        """
+        Create a new primal graph of the continuous variables to eliminate with score.
+        :param rng: If given, the order of the vertices and co-occurrences is shuffled using rng.
+        """
+        continuous_vars, co_occurrences = self._continuous_vars, self._co_occurrences
+        if rng is not None:
+            continuous_vars, co_occurrences = list(continuous_vars), list(co_occurrences)
+            rng.shuffle(continuous_vars)
+            rng.shuffle(co_occurrences)
+        if self.weights is not None:
+            return create_interaction_graph_from_literals(continuous_vars, co_occurrences, score.fills, not score.fills,
+                                                          backend=WeightedPrimalGraph, weights=self.weights,
+                                                          **self.primal_options)
+        return create_interaction_graph_from_literals(continuous_vars, co_occurrences, score.fills, not score.fills,
+                                                      **self.primal_options)
+
+    def int_tree(self, score: Score = MINFILL, tie_breakers: Sequence[TieBreaker] = (), rng=None, shuffle=False,
+                 shape=TREE) -> Optional[IntTree]:
+        """
+        Create an integration tree by eliminating the continuous variables one by one.
+        :param score: The score to minimize by each elimination.
+        :param tie_breakers: Applied in order on the vertices with the minimal score, the first remaining vertex is
+        eliminated.
+        :param rng: The random number generator (random by default).
+        :param shuffle: Whether to shuffle the input order of the primal graph using rng.
+        :param shape: LINE (the ordering), TREE (the bottom-up integration tree) or TOPDOWN (the pseudo tree of the
+        reversed ordering over the induced graph, requires a score that processes the eliminated nodes).
+        :return: The integration tree, None if there are no continuous variables.
+        """
+        assert shape != TOPDOWN or score.process
+        if rng is None:
+            rng = random
+        primal = self.create_primal(score, rng if shuffle else None)
+        int_factory = IntTreeFactory(primal)
+        state = EliminationState(primal, int_factory, rng)
+        if score.fills:
+            primal.compute_fills()
+        else:
+            primal.compute_degrees()
+
+        ordering = state.ordering
+        neighbor_sets = []
+        while score.nb_remaining(primal) > 0:
+            candidates = score.get_minimal(primal)
+            for tie_breaker in tie_breakers:
+                candidates = tie_breaker(state, candidates)
+            selected_var = candidates[0]
+            ordering.append(selected_var)
+            if shape == TOPDOWN:
+                neighbor_sets.append(primal.connected_to[selected_var])
+            int_factory.add_node(selected_var)
+            score.eliminate(primal, selected_var)
+
+        if len(ordering) == 0:
+            return None
+        elif shape == TREE:
+            return int_factory.get_int_tree()
+        elif shape == LINE:
+            int_tree = IntTreeVar(ordering[0])
+            for var in ordering[1:]:
+                int_tree = IntTreeLine(var, int_tree)
+            return int_tree
+        else:
+            assert shape == TOPDOWN
+            return pseudo_tree(ordering, neighbor_sets)
+
+    def vtree(self, score: Score = MINFILL, tie_breakers: Sequence[TieBreaker] = (), rng=None, shuffle=False,
+              shape=TREE) -> Vtree:
+        """
+        Create a vtree respecting the integration tree of int_tree(...) (see int_tree for the parameters). When
+        shuffle is True, the input order of the literals is shuffled as well. If there are no continuous variables, a
+        balanced vtree is returned.
+        """
+        if rng is None:
+            rng = random
+        int_tree = self.int_tree(score, tie_breakers, rng, shuffle, shape)
+        return self._create_vtree(int_tree, rng, shuffle)
+
+    def _create_vtree(self, int_tree: Optional[IntTree], rng, shuffle: bool) -> Vtree:
+        logic_vars = self._logic_vars
+        if shuffle:
+            logic_vars = list(logic_vars)
+            rng.shuffle(logic_vars)
+        if int_tree is None:
+            return balanced(self.literals)
+        return int_tree.create_vtree(logic_vars, self.logic2cont)
+
+    def vtree_batch(self, seeds: Iterable[int], score: Score = MINFILL, tie_breakers: Sequence[TieBreaker] = (),
+                    shuffle=True, shape=TREE) -> List[Tuple[Vtree, List[int]]]:
+        """
+        Create a vtree for each seed (see vtree), each seed using its own random.Random(seed), which gives the same
+        result as random.seed(seed) followed by vtree(...). Seeds that result in the same integration tree (up to the
+        order of the children of a node) share one vtree, so each distinct integration order only has to be integrated
+        once.
+        :return: For each distinct integration tree, in order of the first seed resulting in it: the vtree of that first
+        seed and all the seeds resulting in that integration tree.
+        """
+        results: List[Tuple[Vtree, List[int]]] = []
+        result_index: Dict[any, int] = dict()  # structure id of an integration tree -> index in results
+        structures: Dict[Tuple, int] = dict()
+        for seed in seeds:
+            rng = random.Random(seed)
+            int_tree = self.int_tree(score, tie_breakers, rng, shuffle, shape)
+            key = structure_id(int_tree, structures) if int_tree is not None else None
+            if key in result_index:
+                results[result_index[key]][1].append(seed)
+            else:
+                result_index[key] = len(results)
+                results.append((self._create_vtree(int_tree, rng, shuffle), [seed]))
+        return results
+
+
+def structure_id(int_tree: IntTree, structures: Dict[Tuple, int]) -> int:
+    """
+    Get an identifier of the structure of an integration tree: the variables and the node types, ignoring the order of
+    the children of a node. Trees have the same identifier if and only if they have the same structure, for
+    identifiers computed using the same structures.
+    :param int_tree: The integration tree.
+    :param structures: The identifiers of the structures of the (sub)trees seen so far, extended with those of
+    int_tree.
+    :return: The identifier of the structure of int_tree.
+    """
+    ids: Dict[int, int] = dict()  # id(node) -> structure id
+    for node in int_tree:
+        key = (type(node).__name__, node.var, tuple(sorted(ids.pop(id(child)) for child in node.get_children())))
+        ids[id(node)] = structures.setdefault(key, len(structures))
+    return ids[id(int_tree)]
+
+
+def pseudo_tree(elimination_order: List[any], neighbor_sets: List[Set[any]]) -> IntTree:
+    """
+    Construct the pseudo tree of the reversed elimination order by depth first traversing the induced graph, in time
+    linear in the size of the induced graph.
+    :param elimination_order: The eliminated variables, the first eliminated first (the root is eliminated last).
+    :param neighbor_sets: For each eliminated variable, its neighbors when it was eliminated (with the fill edges of
+    the previous eliminations). These are its neighbors in the induced graph that are eliminated later.
+    :return: The pseudo tree. The children of a variable are its unvisited neighbors in the induced graph that are
+    eliminated earlier, in reversed elimination order.
+    """
+    # For each variable, its neighbors in the induced graph that are eliminated earlier, the last eliminated first
+    lower: Dict[any, List[any]] = {var: [] for var in elimination_order}
+    for var, neighbors in zip(reversed(elimination_order), reversed(neighbor_sets)):
+        for neighbor in neighbors:
+            lower[neighbor].append(var)
+
+    int_trees: Dict[any, IntTree] = dict()
+    parents: Dict[any, any] = dict()  # var -> the var from which the traversal visited it (None for roots)
+    roots = []
+    for root in reversed(elimination_order):
+        if root in parents:
+            continue
+        stack = [(root, None, False)]
+        while len(stack) > 0:
+            var, parent, expanded = stack.pop()
+            if not expanded:
+                if var in parents:  # Because then already covered
+                    continue
+                parents[var] = parent
+                stack.append((var, parent, True))
+                stack.extend((child, var, False) for child in reversed(lower[var]))
+                continue
+
+            trees = [int_trees[child] for child in lower[var] if parents[child] == var]
+            if len(trees) == 0:
+                int_tree = IntTreeVar(var)
+            elif len(trees) == 1:
+                int_tree = IntTreeLine(var, trees[0])
+            elif len(trees) == 2:
+                int_tree = IntTreeSplit(var, trees[0], trees[1])
+            else:
+                int_tree = IntTreeParallel(var, trees)
+            int_trees[var] = int_tree
+        roots.append(int_trees[root])
+
+    if len(roots) == 1:
+        return roots[0]
+    else:
+        return IntTreeParallel(var=None, trees=roots)
@@ -0,0 +1,75 @@
+"""
+elimination_width.py - Contains an evaluator of elimination orderings. It computes the induced width and the depth of
+the elimination tree of an ordering on a compact bitset copy of the interactions, without fill bookkeeping and without
+modifying the primal graph it was created from. Intended to score many candidate orderings of the same graph.
+"""
+from typing import List, Dict, Iterable, Set, Tuple
+
+from .int_primal import popcount, iter_bits
+from .primal import PrimalGraph
+
+
+class OrderEvaluator:
+    """
+    Evaluates elimination orderings of a fixed graph. The graph is interned to dense integers with the adjacency of
+    each vertex stored as a bitset, which is copied (a list of ints) for each evaluated ordering.
+    """
+
+    def __init__(self, vertices: Iterable[any], co_occurrences: Iterable[Set[any]]):
+        """
+        Create an evaluator for the graph over vertices, connecting the vertices that co-occur.
+        :param vertices: The vertices of the graph.
+        :param co_occurrences: Sets of vertices that are pairwise connected (e.g. logic2cont.values()).
+        """
+        self.vertices: List[any] = list(vertices)
+        self.index: Dict[any, int] = {vertex: index for index, vertex in enumerate(self.vertices)}
+        self._adjacency: List[int] = [0] * len(self.vertices)
+        for co_occurrence_set in co_occurrences:
+            clique = 0
+            for vertex in co_occurrence_set:
+                clique |= 1 << self.index[vertex]
+            for index in iter_bits(clique):
+                self._adjacency[index] |= clique & ~(1 << index)
+
+    @classmethod
+    def from_primal(cls, primal: PrimalGraph) -> 'OrderEvaluator':
+        """ Create an evaluator for the current graph of primal (PrimalGraph interface). primal is not modified. """
+        return cls(primal.connected_to, ((vertex, neighbor) for vertex, neighbors in primal.connected_to.items()
+                                         for neighbor in neighbors))
+
+    def evaluate(self, order: Iterable[any]) -> Tuple[int, int]:
+        """
+        Eliminate the vertices in order (first eliminated first).
+        :param order: The vertices to eliminate, vertices that are not in the order are never eliminated.
+        :return: The induced width (the maximum amount of remaining neighbors of an eliminated vertex) and the depth of
+        the elimination tree (the maximum amount of vertices on a path from a vertex to the root).
+        """
+        indices = [self.index[vertex] for vertex in order]
+        position = {index: i for i, index in enumerate(indices)}
+        adjacency = list(self._adjacency)
+        height = [1] * len(adjacency)
+        alive = (1 << len(adjacency)) - 1
+        max_width, max_height = 0, 0
+
+        for index in indices:
+            alive &= ~(1 << index)
+            neighbors = adjacency[index] & alive
+            max_width = max(max_width, popcount(neighbors))
+            max_height = max(max_height, height[index])
+            parent, parent_position = None, len(indices)
+            for neighbor in iter_bits(neighbors):
+                adjacency[neighbor] |= neighbors & ~(1 << neighbor)
+                neighbor_position = position.get(neighbor, len(indices))
+                if neighbor_position < parent_position:
+                    parent, parent_position = neighbor, neighbor_position
+            if parent is not None:
+                height[parent] = max(height[parent], height[index] + 1)
+        return max_width, max_height
+
+    def width(self, order: Iterable[any]) -> int:
+        """ The induced width of the given elimination order (see evaluate). """
+        return self.evaluate(order)[0]
+
+    def depth(self, order: Iterable[any]) -> int:
+        """ The depth of the elimination tree of the given elimination order (see evaluate). """
+        return self.evaluate(order)[1]
@@ -0,0 +1,215 @@
+"""
+exact_elimination.py - Contains an anytime branch-and-bound search for an optimal elimination ordering. The ordering
+minimizes the induced width and, secondary, the depth of the resulting integration tree (IntTree). Intended for primal
+graphs of up to about 60 continuous variables.
+"""
+import math
+import time
+from typing import List, Dict, Tuple, Optional
+
+from pywmi.engines.xsdd.literals import LiteralInfo
+from pywmi.engines.xsdd.vtrees.vtree import Vtree, balanced
+
+from .int_primal import popcount, iter_bits
+from .int_tree import IntTreeFactory
+from .primal import PrimalGraph, create_interaction_graph_from_literals
+from .topdown_mincut import conversion_tables
+
+
+class _OutOfTime(Exception):
+    pass
+
+
+class ExactOrderingSearch:
+    """
+    Branch-and-bound over elimination orderings of a primal graph, minimizing (induced width, depth) lexicographically.
+    The search starts from a greedy min-fill ordering and improves on it until the search space is exhausted (the
+    ordering is then optimal) or the time budget runs out (the best ordering found so far is kept).
+
+    The graph after eliminating a set of vertices does not depend on their order, so a state is the set of remaining
+    vertices together with, for each remaining vertex, the height it must at least get in the integration tree
+    (pending). States that are dominated by an earlier visited state with the same remaining vertices are pruned.
+    """
+
+    def __init__(self, primal: PrimalGraph, time_budget: float = 10.0):
+        """
+        :param primal: The primal graph (interactions) to order the vertices of. It is not modified.
+        :param time_budget: The maximum amount of seconds to spend in search().
+        """
+        self.vertices: List[any] = list(primal.connected_to)
+        index = {vertex: i for i, vertex in enumerate(self.vertices)}
+        self._adjacency: List[int] = [sum(1 << index[neighbor] for neighbor in primal.connected_to[vertex])
+                                      for vertex in self.vertices]
+        self.time_budget = time_budget
+        self.order: Optional[List[any]] = None  # best ordering found so far
+        self.width = math.inf  # induced width of order
+        self.depth = math.inf  # height of the highest root of the integration tree of order
+        self.optimal = False  # whether order is proven optimal
+        self.nb_states = 0  # amount of states expanded by search()
+        self._deadline = None
+        self._memo: Dict[int, List[Tuple[int, int, Tuple[int, ...]]]] = dict()
+
+    def greedy(self) -> List[any]:
+        """ Compute a balanced min-fill ordering (min-fill, ties broken by least height) as initial solution. """
+        adjacency = list(self._adjacency)
+        pending = [0] * len(adjacency)
+        remaining = (1 << len(adjacency)) - 1
+        width, height, order = 0, 0, []
+        while remaining:
+            vertex = min(iter_bits(remaining), key=lambda v: (self._fill(adjacency, v), pending[v]))
+            width = max(width, popcount(adjacency[vertex]))
+            height = max(height, pending[vertex] + 1)
+            adjacency, pending = self._eliminate(adjacency, pending, vertex)
+            remaining &= ~(1 << vertex)
+            order.append(vertex)
+        self._record(order, width, height)
+        return self.order
+
+    def search(self) -> List[any]:
+        """
+        Search for an optimal ordering within the time budget. When the budget runs out, the best ordering found so far
+        is returned and optimal remains False.
+        :return: The best found elimination ordering.
+        """
+        if self.order is None:
+            self.greedy()
+        self._deadline = time.perf_counter() + self.time_budget
+        self._memo = dict()
+        try:
+            self._branch(self._adjacency, (1 << len(self.vertices)) - 1, [0] * len(self.vertices), 0, 0, [])
+            self.optimal = True
+        except _OutOfTime:
+            pass
+        finally:
+            self._memo = dict()
+        return self.order
+
+    def _record(self, order: List[int], width: int, height: int):
+        if (width, height) < (self.width, self.depth):
+            self.order = [self.vertices[vertex] for vertex in order]
+            self.width = width
+            self.depth = height
+
+    def _branch(self, adjacency: List[int], remaining: int, pending: List[int], width: int, height: int,
+                order: List[int]):
+        if remaining == 0:
+            self._record(order, width, height)
+            return
+        if time.perf_counter() > self._deadline:
+            raise _OutOfTime()
+        self.nb_states += 1
+
+        # Bound
+        lower_width = max(width, self._minor_min_width(adjacency, remaining))
+        lower_depth = max(height, max(pending[vertex] + 1 for vertex in iter_bits(remaining)))
+        if (lower_width, lower_depth) >= (self.width, self.depth):
+            return
+        if self._is_dominated(remaining, width, height, pending):
+            return
+
+        # Branch, most promising (least fill) first
+        candidates = sorted(iter_bits(remaining), key=lambda v: (self._fill(adjacency, v), pending[v]))
+        for vertex in candidates:
+            new_width = max(width, popcount(adjacency[vertex]))
+            if new_width > self.width:
+                continue
+            new_adjacency, new_pending = self._eliminate(adjacency, pending, vertex)
+            order.append(vertex)
+            self._branch(new_adjacency, remaining & ~(1 << vertex), new_pending, new_width,
+                         max(height, pending[vertex] + 1), order)
+            order.pop()
+
+    def _is_dominated(self, remaining: int, width: int, height: int, pending: List[int]) -> bool:
+        """ Whether an earlier state with the same remaining vertices is at least as good. Else, store this state. """
+        state_pending = tuple(pending[vertex] for vertex in iter_bits(remaining))
+        states = self._memo.setdefault(remaining, [])
+        for other_width, other_height, other_pending in states:
+            if other_width <= width and other_height <= height and \
+                    all(other <= own for other, own in zip(other_pending, state_pending)):
+                return True
+        states[:] = [(other_width, other_height, other_pending) for other_width, other_height, other_pending in states
+                     if not (width <= other_width and height <= other_height and
+                             all(own <= other for own, other in zip(state_pending, other_pending)))]
+        states.append((width, height, state_pending))
+        return False
+
+    @staticmethod
+    def _eliminate(adjacency: List[int], pending: List[int], vertex: int) -> Tuple[List[int], List[int]]:
+        """ The adjacency and pending heights after eliminating vertex. """
+        neighbors = adjacency[vertex]
+        new_height = pending[vertex] + 1
+        new_adjacency = list(adjacency)
+        new_pending = list(pending)
+        for neighbor in iter_bits(neighbors):
+            new_adjacency[neighbor] = (adjacency[neighbor] | neighbors) & ~(1 << neighbor) & ~(1 << vertex)
+            new_pending[neighbor] = max(pending[neighbor], new_height)
+        new_adjacency[vertex] = 0
+        return new_adjacency, new_pending
+
+    @staticmethod
+    def _fill(adjacency: List[int], vertex: int) -> int:
+        neighbors = adjacency[vertex]
+        return sum(popcount(neighbors & ~adjacency[neighbor]) - 1 for neighbor in iter_bits(neighbors))
+
+    @staticmethod
+    def _minor_min_width(adjacency: List[int], remaining: int) -> int:
+        """
+        Lower bound on the induced width of the remaining graph (minor-min-width): repeatedly contract a min-degree
+        vertex into the neighbor it shares the fewest neighbors with, the bound is the max of the min-degrees.
+        """
+        graph = {vertex: adjacency[vertex] & remaining for vertex in iter_bits(remaining)}
+        lower_bound = 0
+        while len(graph) > lower_bound + 1:
+            vertex = min(graph, key=lambda v: popcount(graph[v]))
+            neighbors = graph.pop(vertex)
+            lower_bound = max(lower_bound, popcount(neighbors))
+            if neighbors == 0:
+                continue
+            target = min(iter_bits(neighbors), key=lambda v: popcount(graph[v] & neighbors))
+            vertex_bit, target_bit = 1 << vertex, 1 << target
+            for neighbor in iter_bits(neighbors):
+                graph[neighbor] &= ~vertex_bit
+            merged = (graph[target] | neighbors) & ~target_bit
+            graph[target] = merged
+            for neighbor in iter_bits(merged):
+                graph[neighbor] |= target_bit
+        return lower_bound
+
+
+def bottomup_exact_elimination(literals: LiteralInfo, time_budget: float = 10.0, max_vars=60,
+                               stats: dict = None) -> Vtree:
+    """
+    Create a vtree from an elimination ordering with minimal induced width and, secondary, minimal depth. The ordering
+    is searched by branch-and-bound (ExactOrderingSearch) within the time budget, starting from a balanced min-fill
+    ordering which is used when no better ordering is found.
+    :param literals: The context to create a vtree for.
+    :param time_budget: The maximum amount of seconds to spend on the search.
+    :param max_vars: When there are more continuous variables than this, only the greedy ordering is used.
+    :param stats: If not None, 'width', 'depth', 'optimal' and 'states' (nb of expanded search states) are stored in
+    this dictionary.
+    :return: A vtree based on the best found elimination ordering.
+    """
+    logic2cont, cont2logic = conversion_tables(literals)
+    primal = create_interaction_graph_from_literals(cont2logic.keys(), logic2cont.values(), False, False)
+    int_factory = IntTreeFactory(primal)
+
+    search = ExactOrderingSearch(primal, time_budget)
+    if len(search.vertices) <= max_vars:
+        order = search.search()
+    else:
+        order = search.greedy()
+    for var in order:
+        int_factory.add_node(var)
+
+    if stats is not None:
+        stats['width'] = search.width
+        stats['depth'] = search.depth
+        stats['optimal'] = search.optimal
+        stats['states'] = search.nb_states
+
+    # Construct vtree
+    int_tree = int_factory.get_int_tree()
+    if int_tree is not None:
+        return int_tree.create_vtree(set(logic2cont.keys()), logic2cont)
+    else:
+        return balanced(literals)
@@ -0,0 +1,137 @@
+"""
+incremental_elimination.py - Contains a vtree heuristic that reuses the integration order of a previously solved,
+smaller problem of the same family (e.g. size n of tpg_star, tpg_path, xor, ...) for the next problem (size n+1).
+Continuous variables are matched by name. The vertices whose neighborhood did not change keep their place in the
+previous order, only the new vertices and the vertices around them are ordered again by balanced min-fill, where the
+ties are broken by the previous order. Only when the induced width of the repaired order grows too much, the order is
+recomputed from scratch.
+"""
+from typing import Dict, FrozenSet, Optional, Tuple
+
+from pywmi.engines.xsdd.literals import LiteralInfo
+from pywmi.engines.xsdd.vtrees.vtree import Vtree, balanced
+
+from .int_tree import IntTree, IntTreeFactory
+from .primal import PrimalGraph, create_interaction_graph_from_literals
+from .topdown_mincut import conversion_tables
+
+# The eliminated vertices, in elimination order, mapped to their neighbors at the time of their elimination
+Eliminations = Dict[any, FrozenSet[any]]
+
+
+def _eliminate(primal: PrimalGraph, int_factory: IntTreeFactory, var, eliminations: Eliminations) -> int:
+    """ Eliminate var from primal, adding it to int_factory and eliminations. Returns the induced width. """
+    eliminations[var] = frozenset(primal.connected_to[var])
+    int_factory.add_node(var)
+    primal.remove_and_process_node(var)
+    return len(eliminations[var])
+
+
+def _balanced_minfill(primal: PrimalGraph, int_factory: IntTreeFactory, eliminations: Eliminations) -> int:
+    """ Eliminate all remaining vertices of primal using balanced min-fill. Returns the induced width. """
+    max_width = 0
+    while primal.nb_fills() > 0:
+        minfills = primal.get_minfills()
+        minfills = int_factory.get_least_depth_increase(minfills)  # balanced
+        minfills = primal.get_lowest_future_minfill(minfills)  # balanced
+        max_width = max(max_width, _eliminate(primal, int_factory, minfills[0], eliminations))
+    return max_width
+
+
+def extend_order(previous: Eliminations, primal: PrimalGraph) -> Tuple[Eliminations, IntTreeFactory, int]:
+    """
+    Repair the elimination order of a smaller problem into an elimination order of primal. First, the vertices of the
+    previous order are eliminated in that order, skipping the vertices whose neighbors differ from their neighbors in
+    the previous problem (they are near new or changed variables, or near a skipped vertex). Then the skipped and new
+    vertices are eliminated by balanced min-fill, where the ties are broken by the position in the previous order
+    instead of by the (expensive) get_lowest_future_minfill. Ties among new variables only still use
+    get_lowest_future_minfill.
+    :param previous: The eliminations of the smaller problem.
+    :param primal: The primal graph of the new problem. It is modified (all vertices are eliminated).
+    :return: The eliminations of the new order, the factory holding its integration tree and the induced width of the
+    order.
+    """
+    int_factory = IntTreeFactory(primal)
+    primal.compute_fills()
+    eliminations, max_width = dict(), 0
+
+    # Unchanged neighbors: the elimination creates the same fill edges as in the previous problem
+    for var, neighbors in previous.items():
+        if primal.connected_to.get(var) == neighbors:
+            max_width = max(max_width, _eliminate(primal, int_factory, var, eliminations))
+
+    position = {var: i for i, var in enumerate(previous)}
+    while primal.nb_fills() > 0:
+        minfills = primal.get_minfills()
+        minfills = int_factory.get_least_depth_increase(minfills)  # balanced
+        known = [var for var in minfills if var in position]
+        if len(known) > 0:
+            selected_var = min(known, key=position.__getitem__)
+        else:
+            selected_var = primal.get_lowest_future_minfill(minfills)[0]  # balanced
+        max_width = max(max_width, _eliminate(primal, int_factory, selected_var, eliminations))
+    return eliminations, int_factory, max_width
+
+
+def extend_int_tree(previous: Eliminations, primal: PrimalGraph) -> Optional[IntTree]:
+    """
+    Extend the elimination order of a smaller problem to an integration tree of the given primal graph (see
+    extend_order).
+    :param previous: The eliminations of the smaller problem.
+    :param primal: The primal graph of the new problem. It is modified (all vertices are eliminated).
+    :return: An integration tree over all vertices of primal.
+    """
+    _, int_factory, _ = extend_order(previous, primal)
+    return int_factory.get_int_tree()
+
+
+class IncrementalMinfill:
+    """
+    A vtree strategy that remembers the elimination order of the last problem it was called on, and repairs that order
+    for the next problem (extend_order) instead of running balanced min-fill from scratch. Intended for sweeps over
+    the sizes of a problem family with one instance of this class per family.
+    """
+
+    def __init__(self, tolerance=1):
+        """
+        :param tolerance: The order is recomputed from scratch when the repaired order has an induced width of more
+        than the induced width of the last order computed from scratch + tolerance.
+        """
+        self.__name__ = "incremental_balanced_minfill"
+        self.tolerance = tolerance
+        self.eliminations: Optional[Eliminations] = None
+        self.width: Optional[int] = None  # of the last order computed from scratch
+        self.nb_repaired = 0  # amount of calls that reused the previous order
+        self.nb_recomputed = 0  # amount of calls that computed the order from scratch
+
+    def reset(self):
+        """ Forget the previous order, e.g. before a sweep over another problem family. """
+        self.eliminations = None
+        self.width = None
+
+    def __call__(self, literals: LiteralInfo) -> Vtree:
+        logic2cont, cont2logic = conversion_tables(literals)
+        primal = create_interaction_graph_from_literals(cont2logic.keys(), logic2cont.values(), True, False)
+
+        int_factory = None
+        if self.eliminations is not None:
+            eliminations, int_factory, width = extend_order(self.eliminations, primal)
+            if width > self.width + self.tolerance:
+                int_factory = None
+                primal = create_interaction_graph_from_literals(cont2logic.keys(), logic2cont.values(), True, False)
+            else:
+                self.nb_repaired += 1
+        if int_factory is None:
+            int_factory = IntTreeFactory(primal)
+            primal.compute_fills()
+            eliminations = dict()
+            self.width = _balanced_minfill(primal, int_factory, eliminations)
+            self.nb_recomputed += 1
+        self.eliminations = eliminations
+
+        # Construct vtree
+        int_tree = int_factory.get_int_tree()
+        if int_tree is not None:
+            return int_tree.create_vtree(set(logic2cont.keys()), logic2cont)
+        else:
+            return balanced(literals)
@@ -0,0 +1,325 @@
+"""
+    int_primal.py - An array backed alternative to PrimalGraph. The vertices are interned to dense integers and the
+    adjacency of each vertex is stored as a bitset (a python int), which makes the set operations of the min-fill
+    computations word-parallel. IntPrimalGraph exposes the same interface as PrimalGraph.
+
+    Both backends compute the same fills and degrees, but they can order vertices with equal values differently, so
+    switching backends can change the selected vertices (and thus the vtree, not its quality on average). PrimalGraph
+    updates the fills of the neighbors of a removed vertex in the iteration order of its neighbor set, which depends
+    on the hashes of the vertices (for strings, on PYTHONHASHSEED). IntPrimalGraph updates them in index order.
+"""
+import math
+from itertools import islice
+from collections.abc import Mapping
+from typing import List, Tuple, Dict, Set, Iterable, Iterator, Optional
+from sortedcollections import ValueSortedDict
+
+from .bucket_queue import BucketQueue
+
+_MISSING = object()  # Trail value of a key that was not present.
+
+
+def popcount(bitset: int) -> int:
+    """ The amount of bits set in the given bitset. """
+    return bin(bitset).count("1")
+
+
+def iter_bits(bitset: int) -> Iterator[int]:
+    """ Iterate over the indices of the bits set in the given bitset, lowest index first. """
+    while bitset:
+        lowest = bitset & -bitset
+        yield lowest.bit_length() - 1
+        bitset ^= lowest
+
+
+class _ConnectedTo(Mapping):
+    """ Read-only view that decodes the bitset adjacency of an IntPrimalGraph into sets of vertices. """
+
+    def __init__(self, graph: 'IntPrimalGraph'):
+        self._graph = graph
+
+    def __getitem__(self, vertex) -> Set[any]:
+        graph = self._graph
+        index = graph.index[vertex]
+        if not (graph.alive >> index) & 1:
+            raise KeyError(vertex)
+        return graph.decode(graph.adjacency[index])
+
+    def __iter__(self):
+        vertices = self._graph.vertices
+        return (vertices[index] for index in iter_bits(self._graph.alive))
+
+    def __len__(self):
+        return popcount(self._graph.alive)
+
+    def __contains__(self, vertex):
+        index = self._graph.index.get(vertex)
+        return index is not None and (self._graph.alive >> index) & 1 == 1
+
+
+class IntPrimalGraph:
+    """
+    Nodes should not be connected to themselves.
+    Same interface as PrimalGraph, but the vertices are interned to dense integers (in order of the given vertices) and
+    each adjacency set is a bitset. connected_to is a read-only view, use add_edge(s) to modify the graph.
+    """
+
+    def __init__(self, vertices: Iterable[any], compute_fills=True, compute_degrees=True, incremental=False,
+                 lazy_fills=False, bucket_queue=False):
+        """
+        Create a Primal graph representing the interactions between vertices.
+        For min-fill or min-induced-width, use remove_and_process_node() instead of use remove_node()
+        :param vertices: The vertices of the graph
+        :param compute_fills; Whether this will be used to compute fills.
+        :param compute_degrees: Whether this will be used to compute degrees.
+        :param incremental: Whether to keep the fills of all vertices exact. Like PrimalGraph, only the fills of the
+        neighbors of a removed node are recomputed by default, so the fills of the vertices adjacent to two of those
+        neighbors can be outdated after remove_and_process_node(). With incremental, these fills are updated as well.
+        :param lazy_fills: Ignored, the fill edges are never stored (accepted for compatibility with PrimalGraph).
+        :param bucket_queue: Whether to keep the fills and degrees in a BucketQueue instead of a ValueSortedDict.
+        """
+        sorted_dict = BucketQueue if bucket_queue else ValueSortedDict
+        self.vertices: List[any] = list(vertices)
+        self.index: Dict[any, int] = {vertex: index for index, vertex in enumerate(self.vertices)}
+        self.adjacency: List[int] = [0] * len(self.vertices)
+        self.alive: int = (1 << len(self.vertices)) - 1  # bitset of the vertices that are not yet removed
+        self.connected_to = _ConnectedTo(self)
+        self._fills: ValueSortedDict[int, int] = sorted_dict() if compute_fills else None
+        self._incremental = incremental and compute_fills
+        self._degrees: ValueSortedDict[int, int] = sorted_dict() if compute_degrees else None
+        # Undo log of (container, key, old value) recorded while a checkpoint is active, see checkpoint().
+        self._trail: Optional[List[Tuple[any, any, any]]] = None
+        self._nb_checkpoints = 0
+
+    def encode(self, vertices: Iterable[any]) -> int:
+        """ The bitset representing the given vertices. """
+        bitset = 0
+        for vertex in vertices:
+            bitset |= 1 << self.index[vertex]
+        return bitset
+
+    def decode(self, bitset: int) -> Set[any]:
+        """ The set of vertices represented by the given bitset. """
+        return {self.vertices[index] for index in iter_bits(bitset)}
+
+    def nb_fills(self):
+        """ The amount of vertices for which their fills are stored. """
+        assert self._fills is not None
+        return len(self._fills)
+
+    def nb_degrees(self):
+        """ The amount of vertices for which their degrees are stored. """
+        assert self._degrees is not None
+        return len(self._degrees)
+
+    def get_fill(self, node) -> List[Tuple[any, set]]:
+        """ Get fill edges of node  (for each neighbor, the other neighbors that still require a connection)  """
+        adjacency = self.adjacency
+        neighbors = adjacency[self.index[node]]
+        fills = []
+        for neighbor in iter_bits(neighbors):
+            unconnected = neighbors & ~adjacency[neighbor] & ~(1 << neighbor)
+            if unconnected:
+                fills.append((self.vertices[neighbor], self.decode(unconnected)))
+        return fills
+
+    def add_edge(self, a, b):
+        """ Add edge between a and b. """
+        assert a != b
+        index_a, index_b = self.index[a], self.index[b]
+        self._set(self.adjacency, index_a, self.adjacency[index_a] | 1 << index_b)
+        self._set(self.adjacency, index_b, self.adjacency[index_b] | 1 << index_a)
+
+    def add_edges(self, node_set: Set[any]):
+        """ Add edges between all the nodes in the node_set. """
+        clique = self.encode(node_set)
+        for index in iter_bits(clique):
+            self._set(self.adjacency, index, self.adjacency[index] | clique & ~(1 << index))
+
+    def _fill_of(self, index: int) -> int:
+        """ The amount of fills of the vertex with the given index (each missing edge counted in both directions). """
+        adjacency = self.adjacency
+        neighbors = adjacency[index]
+        fill = 0
+        for neighbor in iter_bits(neighbors):
+            fill += popcount(neighbors & ~adjacency[neighbor]) - 1  # -1: neighbor itself is never connected to itself
+        return fill
+
+    def compute_fills(self, of_nodes=None):
+        """ Compute the minfill values for each vertex in of_nodes or all vertices if of_nodes is None. """
+        assert self._fills is not None
+        indices = iter_bits(self.alive) if of_nodes is None else (self.index[vertex] for vertex in of_nodes)
+        self._compute_fills(indices)
+
+    def _compute_fills(self, indices: Iterable[int]):
+        for index in indices:
+            self._set(self._fills, index, self._fill_of(index))
+
+    def compute_degrees(self, of_nodes=None):
+        """ Compute the degrees for each vertex in of_nodes or all vertices if of_nodes is None. """
+        assert self._degrees is not None
+        indices = iter_bits(self.alive) if of_nodes is None else (self.index[vertex] for vertex in of_nodes)
+        self._compute_degrees(indices)
+
+    def _compute_degrees(self, indices: Iterable[int]):
+        for index in indices:
+            self._set(self._degrees, index, popcount(self.adjacency[index]))
+
+    def checkpoint(self) -> int:
+        """
+        Start recording the mutations of this graph on a trail, so they can be undone by rollback().
+        Checkpoints can be nested, each checkpoint must be ended by a rollback to its mark.
+        :return: A mark to pass to rollback().
+        """
+        if self._trail is None:
+            self._trail = []
+        self._nb_checkpoints += 1
+        return len(self._trail)
+
+    def rollback(self, mark: int):
+        """
+        Undo all mutations since the checkpoint that returned mark.
+        :param mark: The mark returned by the matching checkpoint().
+        """
+        assert self._trail is not None and self._nb_checkpoints > 0
+        trail = self._trail
+        while len(trail) > mark:
+            container, key, old = trail.pop()
+            if old is _MISSING:
+                container.pop(key)
+            else:
+                container[key] = old
+        self._nb_checkpoints -= 1
+        if self._nb_checkpoints == 0:
+            self._trail = None
+
+    def _set(self, container, key, value):
+        """ container[key] = value, recorded on the trail. """
+        if self._trail is not None:
+            old = container[key] if isinstance(container, list) else container.get(key, _MISSING)
+            self._trail.append((container, key, old))
+        container[key] = value
+
+    def _pop(self, container, key):
+        """ container.pop(key), recorded on the trail. """
+        value = container.pop(key)
+        if self._trail is not None:
+            self._trail.append((container, key, value))
+
+    def _remove_vertex(self, index: int) -> int:
+        """ Clear the adjacency of the vertex with the given index and mark it removed. Returns its neighbors. """
+        neighbors = self.adjacency[index]
+        self._set(self.adjacency, index, 0)
+        self._set(vars(self), 'alive', self.alive & ~(1 << index))  # vars(self), so alive is restored by rollback
+        if self._fills is not None:
+            self._pop(self._fills, index)
+        if self._degrees is not None and index in self._degrees:
+            self._pop(self._degrees, index)
+        return neighbors
+
+    def remove_and_process_node(self, a):
+        """ Remove node a, connect each of its neighbors with each other and recompute minfills """
+        index = self.index[a]
+        adjacency = self.adjacency
+        neighbors = self._remove_vertex(index)
+
+        # connect neighbors (the neighbors of a become a clique, a itself is no longer present)
+        connected = 0  # the neighbors that gained a fill edge
+        for neighbor in iter_bits(neighbors):
+            old_adjacency = adjacency[neighbor]
+            new_adjacency = (old_adjacency | neighbors) & ~(1 << neighbor) & ~(1 << index)
+            if new_adjacency & ~old_adjacency:
+                connected |= 1 << neighbor
+            self._set(adjacency, neighbor, new_adjacency)
+
+        if self._fills is not None:
+            self._compute_fills(iter_bits(neighbors))  # recompute fills
+            if self._incremental:
+                self._update_second_neighbor_fills(neighbors, connected)
+        if self._degrees is not None:
+            self._compute_degrees(iter_bits(neighbors))
+
+    def _update_second_neighbor_fills(self, neighbors: int, connected: int):
+        """
+        Update the fills changed by the fill edges among neighbors, outside of neighbors. Only a vertex adjacent to
+        two connected neighbors can have gained an edge among its neighbors.
+        """
+        adjacency = self.adjacency
+        second_neighbors = 0
+        for neighbor in iter_bits(connected):
+            second_neighbors |= adjacency[neighbor]
+        for other in iter_bits(second_neighbors & ~neighbors):
+            if popcount(adjacency[other] & connected) >= 2:
+                fill = self._fill_of(other)
+                if fill != self._fills[other]:
+                    self._set(self._fills, other, fill)
+
+    def remove_node(self, a):
+        """ Remove all connections from and to node a. """
+        index = self.index[a]
+        adjacency = self.adjacency
+        neighbors = self._remove_vertex(index)
+        for neighbor in iter_bits(neighbors):
+            self._set(adjacency, neighbor, adjacency[neighbor] & ~(1 << index))
+        # Recompute degrees
+        if self._degrees is not None:
+            self._compute_degrees(iter_bits(neighbors))
+        # Recompute fills
+        if self._fills is not None:
+            self._compute_fills(iter_bits(neighbors))
+
+    def get_minfills(self) -> List[any]:
+        """ Get all vertices with the minimum nb of fills. """
+        assert self._fills is not None and len(self._fills) > 0
+        return self._get_minimal(self._fills)
+
+    def get_fill_count(self, vertex) -> int:
+        """ Get the nb of fills of vertex. """
+        assert self._fills is not None
+        return self._fills[self.index[vertex]]
+
+    def get_lowest_fills(self, amount: int) -> List[Tuple[any, int]]:
+        """ Get the (at most) amount vertices with the lowest nb of fills, with their fill, in order of fill. """
+        assert self._fills is not None
+        return [(self.vertices[index], self._fills[index]) for index in islice(self._fills, amount)]
+
+    def get_mindegrees(self) -> List[any]:
+        """ Get all vertices with the minimum degree """
+        assert self.nb_degrees() > 0
+        return self._get_minimal(self._degrees)
+
+    def _get_minimal(self, values: ValueSortedDict) -> List[any]:
+        """ The vertices with the minimal value in values (in order of values). """
+        _, minimum = values.peekitem(0)
+        minimal = []
+        for index in values.irange_key(minimum, minimum):
+            minimal.append(self.vertices[index])
+        return minimal
+
+    def get_lowest_future_minfill(self, vertices) -> List[any]:
+        """ Get the subset of vertices which, when removed, result in the lowest next minfill. """
+        if len(vertices) == 1:
+            return vertices
+
+        lowest_minfill = math.inf
+        lowest_minfill_vertices = []
+        for vertex in vertices:
+            mark = self.checkpoint()
+            self.remove_and_process_node(vertex)
+            _, new_minfill = self._fills.peekitem(0)
+            restored = {key for container, key, _ in self._trail[mark:] if container is self._fills}
+            self.rollback(mark)
+            # As PrimalGraph, reinsert the restored fills in a fixed order (the updated fills of incremental first,
+            # then the neighbors and the vertex last). This keeps the order of the vertices with equal fills.
+            index = self.index[vertex]
+            neighbors = list(iter_bits(self.adjacency[index]))
+            for key in [*sorted(restored.difference(neighbors, (index,))), *neighbors, index]:
+                self._set(self._fills, key, self._fills[key])
+
+            if new_minfill < lowest_minfill:
+                lowest_minfill = new_minfill
+                lowest_minfill_vertices = [vertex]
+            elif new_minfill == lowest_minfill:
+                lowest_minfill_vertices.append(vertex)
+
+        return lowest_minfill_vertices
@@ -11,83 +11,161 @@ pseudo tree in the literature of Variable Elimination and AND/OR graphs.
     IntTreeParallel - an intermediate node of the tree which can have multiple children, also contains a variable which
         can only be eliminated after the variables of all the children.
 """
+import heapq
 import math
+from bisect import bisect_left
 from abc import ABC, abstractmethod
-from typing import List, Tuple, Set, Optional, Dict
+from typing import List, Tuple, Set, Optional, Dict, Iterator, Union, Callable, Iterable
 
 from pywmi.engines.xsdd.vtrees.vtree import Vtree, VtreeSplit, VtreeVar
 
+from .elimination_width import OrderEvaluator
+from .int_primal import iter_bits
 from .primal import PrimalGraph
 
 
 class IntTree(ABC):
     """
     Integration tree representing a variable ordering in tree form.
+    A tree is not modified after construction, so the amount of continuous variables and the depth of each node are
+    computed once, on first use, and cached.
+    All traversals use an explicit stack instead of recursion, so (line-shaped) trees of any depth are supported.
     """
+    __slots__ = ('var', '_con_count', '_depth')
 
     def __init__(self):
         self.var = None
+        self._con_count: Optional[int] = None
+        self._depth: Optional[int] = None
 
-    @abstractmethod
     def con_count(self) -> int:
         """ The amount of continuous variables present in this Integration order tree. """
-        pass
+        if self._con_count is None:
+            for node in self._iter_post_order(lambda n: n._con_count is not None):
+                node._con_count = node._compute_con_count()
+        return self._con_count
 
-    @abstractmethod
-    def get_con_vars(self) -> set:
+    def get_con_vars(self) -> Set[any]:
         """ Get all the continuous variables in this tree. """
-        pass
+        return {node.var for node in self if node.var is not None}
 
     @abstractmethod
     def get_children(self) -> List['IntTree']:
         """ Get a list of child nodes or None """
         pass
 
-    @abstractmethod
     def depth(self) -> int:
         """ Get the maximum depth of this tree (amount of nodes till the leaf, including the leaf and this node) """
+        if self._depth is None:
+            for node in self._iter_post_order(lambda n: n._depth is not None):
+                node._depth = node._compute_depth()
+        return self._depth
+
+    @abstractmethod
+    def _compute_con_count(self) -> int:
+        """ Compute con_count(), given that it is cached for all children. """
+        pass
+
+    @abstractmethod
+    def _compute_depth(self) -> int:
+        """ Compute depth(), given that it is cached for all children. """
         pass
 
-    def get_induced_width(self, primal: PrimalGraph) -> int:
-        """ Get the induced width of this tree in the context of the primal graph (interactions) """
+    def get_elimination_order(self) -> List[any]:
+        """ The variables of this tree in elimination order (leaf to root). """
+        return [node.var for node in self if node.var is not None]
+
+    def get_induced_width(self, primal: Union[PrimalGraph, OrderEvaluator]) -> int:
+        """
+        Get the induced width of this tree in the context of the primal graph (interactions). primal is not modified.
+        To evaluate many trees over the same interactions, pass an OrderEvaluator instead of a primal graph.
+        """
         # Induced width is the max amount of neighbors in the process of removing and processing nodes from primal
         # in the order of this integration tree
-        max_induced_width = 0
-        primal.compute_fills()
-
-        for node in self:  # DFS, leaf to root
-            if node.var is not None:
-                width = len(primal.connected_to[node.var])
-                max_induced_width = max(max_induced_width, width)
-                primal.remove_and_process_node(node.var)
+        evaluator = primal if isinstance(primal, OrderEvaluator) else OrderEvaluator.from_primal(primal)
+        return evaluator.width(self.get_elimination_order())
 
-        return max_induced_width
+    def create_vtree(self, literals: set, logic2cont, partition='greedy') -> Vtree:
+        """
+        Create a vtree that respects the integration order of this tree.
+        :param partition: The method used to split the children of an IntTreeParallel in two balanced sets: 'greedy'
+        (default), 'kk' (Karmarkar-Karp differencing), 'exact' (dynamic programming) or 'auto' (see IntTreeParallel).
+        """
+        index = _LiteralIndex(self, literals, logic2cont, partition)
+        # Stack of tasks: (tree, free literals) to create the vtree of tree over its literals, or
+        # (None, (amount, combine)) to combine the last amount of created vtrees into one.
+        tasks: List[Tuple[Optional[IntTree], any]] = [(self, index.free)]
+        vtrees: List[Vtree] = []
+        while len(tasks) > 0:
+            tree, task = tasks.pop()
+            if tree is None:
+                amount, combine = task
+                children = vtrees[len(vtrees) - amount:]
+                del vtrees[len(vtrees) - amount:]
+                vtrees.append(combine(*children))
+            else:
+                step = tree._create_vtree_step(task, index)
+                if isinstance(step, tuple):
+                    sub_tasks, combine = step
+                    tasks.append((None, (len(sub_tasks), combine)))
+                    tasks.extend(reversed(sub_tasks))
+                else:
+                    vtrees.append(step)
+        return vtrees[0]
 
     @abstractmethod
-    def create_vtree(self, literals: set, logic2cont) -> Vtree:
-        """ Create a vtree that respects the integration order of this tree. """
+    def _create_vtree_step(self, free: List[any], index: '_LiteralIndex') \
+            -> Union[Vtree, Tuple[List[Tuple['IntTree', List[any]]], Callable[..., Vtree]]]:
+        """
+        One step of create_vtree. The literals of this step are the bound literals, which have continuous variables in
+        this tree (index.bound(self)), and the free literals, which have not.
+        Returns either the vtree over the literals, or a list of (child tree, free literals of the child) and a function
+        combining the vtrees of those children into the vtree over the literals.
+        """
         pass
 
+    def _iter_post_order(self, skip=None) -> Iterator['IntTree']:
+        """
+        Depth first iteration over the nodes of the integration tree, children before parents.
+        :param skip: If given, a function deciding for a node whether it (and its subtree) is left out.
+        """
+        stack = [(self, False)]
+        while len(stack) > 0:
+            node, expanded = stack.pop()
+            if expanded:
+                yield node
+            elif skip is None or not skip(node):
+                stack.append((node, True))
+                stack.extend((child, False) for child in reversed(node.get_children()))
+
     def __iter__(self):
         """ Depth first iteration over all nodes of the integration tree (starting from leafs iterating upwards) """
-        # Report on children, Depth First
-        for child in self.get_children():
-            yield from child
-        # Report on itself
-        yield self
+        return self._iter_post_order()
 
     def to_dot(self):
         return 'digraph GP {\n' + '\n'.join(self._to_dot()) + '\n}'
 
-    @abstractmethod
     def _to_dot(self):
-        pass
+        stack = [self]
+        while len(stack) > 0:
+            node = stack.pop()
+            if isinstance(node, str):
+                yield node
+                continue
+            yield node._dot_label()
+            for child in reversed(node.get_children()):
+                stack.append(child)
+                stack.append(f'{id(node)} -> {id(child)}')
+
+    def _dot_label(self) -> str:
+        return f'{id(self)} [label="{self.var}"]'
 
 
 class IntTreeVar(IntTree):
     """
     IntTreeVar - a leaf node of the tree, containing a variable.
     """
+    __slots__ = ()
 
     def __init__(self, var):
         """
@@ -98,33 +176,29 @@ class IntTreeVar(IntTree):
         assert var is not None
         self.var = var
 
-    def con_count(self):
+    def _compute_con_count(self):
         return 1
 
-    def get_con_vars(self):
-        return {self.var}
-
     def get_children(self) -> List['IntTree']:
         return []
 
-    def depth(self):
+    def _compute_depth(self):
         return 1
 
-    def create_vtree(self, literals: set, logic2cont):
-        literals_map = [(lit, logic2cont[lit]) for lit in literals]
-        exists_nonvar = any((self.var not in c_set for (lit, c_set) in literals_map))
+    def _create_vtree_step(self, free: List[any], index: '_LiteralIndex'):
+        exists_nonvar = len(free) > 0
 
         if exists_nonvar:
             # Throw all non 'var' literals in one partition and all 'var' literals in the other.
-            vtree_left = Vtree.create_balanced([lit for (lit, c_set) in literals_map if self.var not in c_set], True)
-            vtree_right = Vtree.create_balanced([lit for (lit, c_set) in literals_map if self.var in c_set], True)
+            vtree_left = Vtree.create_balanced(free, True)
+            vtree_right = Vtree.create_balanced(index.bound(self), True)
             return VtreeSplit(vtree_left, vtree_right)
         else:
             # If no non 'vars', balance out all literals
-            return Vtree.create_balanced(list(literals), True)
+            return Vtree.create_balanced(index.bound(self), True)
 
-    def _to_dot(self):
-        yield f'{id(self)} [label="{self.var}"];'
+    def _dot_label(self):
+        return f'{id(self)} [label="{self.var}"];'
 
 
 class IntTreeSplit(IntTree):
@@ -132,6 +206,7 @@ class IntTreeSplit(IntTree):
     IntTreeSplit - an intermediate node of the tree which has two children. contains a variable which can only be
         eliminated after the variables of the children.
     """
+    __slots__ = ('left', 'right')
 
     def __init__(self, var, left: IntTree, right: IntTree):
         """
@@ -147,74 +222,23 @@ class IntTreeSplit(IntTree):
         self.left = left
         self.right = right
 
-    def con_count(self):
+    def _compute_con_count(self):
         return int(self.var is not None) + self.left.con_count() + self.right.con_count()
 
-    def get_con_vars(self):
-        if self.var is None:
-            return self.left.get_con_vars() | self.right.get_con_vars()
-        else:
-            return {self.var} | self.left.get_con_vars() | self.right.get_con_vars()
-
     def get_children(self) -> List['IntTree']:
         return [self.left, self.right]
 
-    def depth(self):
+    def _compute_depth(self):
         return 1 + max(self.left.depth(), self.right.depth())
 
-    def create_vtree(self, literals: set, logic2cont):
-        literals_map = [(lit, logic2cont[lit]) for lit in literals]
-
+    def _create_vtree_step(self, free: List[any], index: '_LiteralIndex'):
         # Divide all literals, without self.vars in cont-set, with left-cont in left and right-cont in right
         # Balance out the remaining variables (both with and without self.vars in cont-set)
-        left_cons = self.left.get_con_vars()
-        right_cons = self.right.get_con_vars()
-        left_literals = []
-        right_literals = []
-        #var_literals = {}  # TODO: Ensure splitting var_literals
-        remaining_literals = []
-        for (lit, c_set) in literals_map:
-            # if self.var in c_set:
-            #     remaining_literals.append(lit)
-            #     #var_literals |= lit
-            #     continue
-            in_left = len(c_set & left_cons) > 0
-            in_right = len(c_set & right_cons) > 0
-            assert not in_left or not in_right, f"Left: {c_set & left_cons} and Right: {c_set & right_cons}"
-
-            if in_left:
-                left_literals.append(lit)
-            elif in_right:
-                right_literals.append(lit)
-            else:
-                remaining_literals.append(lit)
-
-        # Equally Divide the remaining_variables
-        if len(remaining_literals) > 0:
-            if len(left_literals) < len(right_literals):
-                too_little, too_many = left_literals, right_literals
-            else:
-                too_little, too_many = right_literals, left_literals
-            needed_to_balance = min(len(too_many) - len(too_little), len(remaining_literals))
-            too_little.extend(remaining_literals[:needed_to_balance])
-            del remaining_literals[:needed_to_balance]
-
-            if len(remaining_literals) > 0:
-                # Divide the remaining variables equally
-                add_to_left = math.floor(len(remaining_literals)/2)
-                left_literals.extend(remaining_literals[:add_to_left])
-                right_literals.extend(remaining_literals[add_to_left:])
-
-        return VtreeSplit(
-            self.left.create_vtree(set(left_literals), logic2cont),
-            self.right.create_vtree(set(right_literals), logic2cont))
-
-    def _to_dot(self):
-        yield f'{id(self)} [label="{self.var}"]'
-        yield f'{id(self)} -> {id(self.left)}'
-        yield from self.left._to_dot()
-        yield f'{id(self)} -> {id(self.right)}'
-        yield from self.right._to_dot()
+        # The bound literals of the children go to that child, the literals of this node (self.var) and the free
+        # literals remain.
+        left_free, right_free = _divide_remaining(index.nb_bound(self.left), index.nb_bound(self.right),
+                                                  index.at(self) + free)
+        return [(self.left, left_free), (self.right, right_free)], VtreeSplit
 
 
 class IntTreeParallel(IntTree):
@@ -223,7 +247,12 @@ class IntTreeParallel(IntTree):
     When creating a vtree, the children are partitioned into two balanced sets which are stored as the children of an
     IntTreeSplit. The constructor requires the user to provide a weight for each tree. This weight is used in the
     balancing of the two sets.
+    With the 'auto' partition method, the optimal partition is computed (exact) if there are at most EXACT_MAX_TREES
+    children with a total integer weight of at most EXACT_MAX_WEIGHT, otherwise the greedy heuristic is used.
     """
+    __slots__ = ('trees', 'weights')
+    EXACT_MAX_TREES = 24
+    EXACT_MAX_WEIGHT = 10000
 
     def __init__(self, var, trees: List[IntTree], weights=None):
         """
@@ -241,63 +270,101 @@ class IntTreeParallel(IntTree):
         self.trees = trees
         self.weights = weights
 
-    def con_count(self):
+    def _compute_con_count(self):
         return int(self.var is not None) + sum(tree.con_count() for tree in self.trees)
 
-    def get_con_vars(self):
-        if self.var is None:
-            return set().union(*(tree.get_con_vars() for tree in self.trees))
-        else:
-            return {self.var}.union(*(tree.get_con_vars() for tree in self.trees))
-
     def get_children(self) -> List['IntTree']:
         return self.trees
 
-    def depth(self):
+    def _compute_depth(self):
         return 1 + max(tree.depth() for tree in self.trees)
 
-    def create_vtree(self, literals: set, logic2cont):
+    def _create_vtree_step(self, free: List[any], index: '_LiteralIndex'):
         assert len(self.trees) > 0
+        # The new nodes below are not in the index, the literals of this node (self.var) are passed on as free.
+        free = index.at(self) + free
         if len(self.trees) == 1:
-            return self.trees[0].create_vtree(literals, logic2cont)
+            return [(self.trees[0], free)], _identity
         elif len(self.trees) == 2:
-            return IntTreeSplit(self.var, self.trees[0], self.trees[1]).create_vtree(literals, logic2cont)
+            return IntTreeSplit(self.var, self.trees[0], self.trees[1])._create_vtree_step(free, index)
         else:
             # Create balanced partitioning of trees based on the amount of literals in each tree.
-            cont_literal_vars = [logic2cont.get(literal) for literal in literals]
-            cont_tree_vars = [tree.get_con_vars() for tree in self.trees]
-
-            # Collect weights
-            weights = self.weights
-            if weights is None:
-                def get_lit_count(conts_tree):
-                    return sum(len(cont_vars & conts_tree) != 0 for cont_vars in cont_literal_vars)
-                weights = [get_lit_count(conts_tree) for conts_tree in cont_tree_vars]
-
-            # Partition
-            values = list(zip(weights, self.trees))
-            left_partition, right_partition = self._partition_trees(values)
-
-            left_trees = [tree for w, tree in left_partition]
-            left_weights = [w for w, tree in left_partition]
-            left_parallel_tree = IntTreeParallel(None, left_trees, left_weights)
-
-            right_trees = [tree for w, tree in right_partition]
-            right_weights = [w for w, tree in right_partition]
-            right_parallel_tree = IntTreeParallel(None, right_trees, right_weights)
+            # The counts are computed once, the binary vtree over all children is planned in one pass.
+            counts = [index.nb_bound(tree) for tree in self.trees]
+            weights = self.weights if self.weights is not None else counts
+
+            # Repeatedly partition a group of children (indices) in two, dividing the free literals of the group.
+            # A shape is the index of a child (task) or a tuple (left shape, right shape).
+            sub_tasks = []
+            shapes = dict()  # id(group) -> shape
+            root_group = list(range(len(self.trees)))
+            stack = [(root_group, free, False)]
+            while len(stack) > 0:
+                group, group_free, expanded = stack.pop()
+                if len(group) == 1:
+                    shapes[id(group)] = len(sub_tasks)
+                    sub_tasks.append((self.trees[group[0]], group_free))
+                elif expanded:
+                    left_group, right_group = group_free
+                    shapes[id(group)] = shapes.pop(id(left_group)), shapes.pop(id(right_group))
+                else:
+                    if len(group) == 2:
+                        left_group, right_group = group[:1], group[1:]
+                    else:
+                        values = [(weights[i], i) for i in group]
+                        left_partition, right_partition = self._partition_trees(values, index.partition)
+                        left_group = [i for w, i in left_partition]
+                        right_group = [i for w, i in right_partition]
+                    left_free, right_free = _divide_remaining(sum(counts[i] for i in left_group),
+                                                              sum(counts[i] for i in right_group), group_free)
+                    stack.append((group, (left_group, right_group), True))
+                    stack.append((right_group, right_free, False))
+                    stack.append((left_group, left_free, False))
+            shape = shapes[id(root_group)]
+            return sub_tasks, lambda *vtrees: _split_by_shape(shape, vtrees)
+
+    def _partition_trees(self, values: List[Tuple[int, int]], method='greedy') \
+            -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]:
+        """
+        Partitions the given trees (values) in two balanced, non-empty sets.
+        :param values: The list of trees to partition. Each element in this list is a tuple of the weight and the index
+        of the tree.
+        :param method: 'greedy', 'kk', 'exact' or 'auto'. 'exact' falls back to 'greedy' for non-integer weights.
+        :return: A partitioning of the trees in two balanced sets.
+        """
+        if method == 'auto':
+            small = len(values) <= self.EXACT_MAX_TREES and sum(w for w, _ in values) <= self.EXACT_MAX_WEIGHT
+            method = 'exact' if small else 'greedy'
+        if method == 'exact' and not all(isinstance(w, int) for w, _ in values):
+            method = 'greedy'
+
+        if method == 'greedy':
+            left_partition, right_partition = self._partition_greedy(values)
+        elif method == 'kk':
+            left_partition, right_partition = self._partition_kk(values)
+        elif method == 'exact':
+            left_partition, right_partition = self._partition_exact(values)
+        else:
+            raise ValueError(f"Unknown partition method {method}")
 
-            # Recursively solve
-            split = IntTreeSplit(self.var, left_parallel_tree, right_parallel_tree)
-            return split.create_vtree(literals, logic2cont)
+        # Both sets must contain a tree (e.g. when all weights are 0)
+        if len(left_partition) == 0:
+            left_partition.append(right_partition.pop())
+        elif len(right_partition) == 0:
+            right_partition.append(left_partition.pop())
+        return left_partition, right_partition
 
-    def _partition_trees(self, values: List[Tuple[int, IntTree]]) -> Tuple[List[Tuple[int, IntTree]], List[Tuple[int, IntTree]]]:
+    @staticmethod
+    def _partition_greedy(values: List[Tuple[int, int]]) \
+            -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]:
         """
         Partitions the given trees (values) in two roughly balanced sets.
         Greedy algorithm from https://en.wikipedia.org/wiki/Partition_problem.
         "This greedy approach is known to give a ​7⁄6-approximation to the optimal solution of the optimization version;
         that is, if the greedy algorithm outputs two sets A and B, then max(∑A, ∑B) ≤ 7/6 OPT,
         where OPT is the size of the larger set in the best possible partition."
-        :param values: The list of trees to partition. Each element in this list is a tuple of the weight and tree.
+        :param values: The list of trees to partition. Each element in this list is a tuple of the weight and the index
+        of the tree.
         The weight is used in the 'roughly balanced' part.
         :return: A partitioning of the trees in two balanced sets (greedy heuristic).
         """
@@ -314,11 +381,60 @@ class IntTreeParallel(IntTree):
                 right_weight += x[0]
         return left_partition, right_partition
 
-    def _to_dot(self):
-        yield f'{id(self)} [label="{self.var}"]'
-        for tree in self.trees:
-            yield f'{id(self)} -> {id(tree)}'
-            yield from tree._to_dot()
+    @staticmethod
+    def _partition_kk(values: List[Tuple[int, int]]) \
+            -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]:
+        """
+        Partitions the given trees (values) in two balanced sets using the Karmarkar-Karp differencing heuristic
+        (https://en.wikipedia.org/wiki/Largest_differencing_method). The two largest differences are repeatedly
+        committed to opposite sets, which usually gives a much smaller difference than the greedy heuristic.
+        :param values: The list of trees to partition. Each element in this list is a tuple of the weight and the index
+        of the tree.
+        :return: A partitioning of the trees in two balanced sets.
+        """
+        # heap of (-difference, counter, heavier set, lighter set)
+        heap = [(-x[0], i, [x], []) for i, x in enumerate(values)]
+        heapq.heapify(heap)
+        counter = len(heap)
+        while len(heap) > 1:
+            diff1, _, heavy1, light1 = heapq.heappop(heap)
+            diff2, _, heavy2, light2 = heapq.heappop(heap)
+            # Put the heavy side of the second with the light side of the first
+            heavy1.extend(light2)
+            light1.extend(heavy2)
+            heapq.heappush(heap, (diff1 - diff2, counter, heavy1, light1))
+            counter += 1
+        _, _, heavy, light = heap[0]
+        return light, heavy
+
+    @staticmethod
+    def _partition_exact(values: List[Tuple[int, int]]) \
+            -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]:
+        """
+        Partitions the given trees (values) in two sets minimizing the weight of the heaviest set, by dynamic
+        programming over the reachable subset sums. O(len(values) * total weight), the weights must be integers.
+        :param values: The list of trees to partition. Each element in this list is a tuple of the weight and the index
+        of the tree.
+        :return: A partitioning of the trees in two optimally balanced sets.
+        """
+        total = sum(w for w, _ in values)
+        # reachable sum -> (previous sum, index of value added) of the first way it was reached
+        reached: Dict[int, Optional[Tuple[int, int]]] = {0: None}
+        for index, (weight, _) in enumerate(values):
+            for subset_sum in list(reached):
+                new_sum = subset_sum + weight
+                if new_sum not in reached and new_sum <= total // 2:
+                    reached[new_sum] = (subset_sum, index)
+
+        # The largest sum not exceeding half the total is the lightest set
+        subset_sum = max(reached)
+        in_left = [False] * len(values)
+        while reached[subset_sum] is not None:
+            subset_sum, index = reached[subset_sum]
+            in_left[index] = True
+        left_partition = [x for x, left in zip(values, in_left) if left]
+        right_partition = [x for x, left in zip(values, in_left) if not left]
+        return left_partition, right_partition
 
 
 class IntTreeLine(IntTree):
@@ -326,6 +442,7 @@ class IntTreeLine(IntTree):
     IntTreeLine - a node in the tree with one child, also contains a variable which can only be eliminated
     after the variables of the child.
     """
+    __slots__ = ('line',)
 
     def __init__(self, var, line: IntTree):
         """
@@ -340,41 +457,144 @@ class IntTreeLine(IntTree):
         self.var = var
         self.line = line
 
-    def con_count(self):
+    def _compute_con_count(self):
         return int(self.var is not None) + self.line.con_count()
 
-    def get_con_vars(self):
-        return {self.var} | self.line.get_con_vars()
-
     def get_children(self) -> List['IntTree']:
         return [self.line]
 
-    def depth(self):
+    def _compute_depth(self):
         return 1 + self.line.depth()
 
-    def create_vtree(self, literals: set, logic2cont):
-        literals_map = [(lit, logic2cont[lit]) for lit in literals]
-
-        lower_cont = self.line.get_con_vars()
-        left_literals = []
-        right_literals = []
-        for (lit, c_set) in literals_map:
-            if len(lower_cont & c_set) == 0:
-                left_literals.append(lit)
-            else:
-                right_literals.append(lit)
+    def _create_vtree_step(self, free: List[any], index: '_LiteralIndex'):
+        # The literals without variables in line are the free literals and the literals of this node (self.var)
+        left_literals = index.at(self) + free
 
-        if len(left_literals) != 0 and len(right_literals) != 0:
+        if len(left_literals) != 0 and index.nb_bound(self.line) != 0:
             vtree_left = Vtree.create_balanced(left_literals, True)
-            vtree_right = self.line.create_vtree(set(right_literals), logic2cont)
-            return VtreeSplit(vtree_left, vtree_right)
+            return [(self.line, [])], lambda vtree_right: VtreeSplit(vtree_left, vtree_right)
         else:
-            return self.line.create_vtree(literals, logic2cont)
+            return [(self.line, left_literals)], _identity
+
+
+def _identity(vtree: Vtree) -> Vtree:
+    return vtree
+
+
+def _split_by_shape(shape, vtrees: Tuple[Vtree, ...]) -> Vtree:
+    """ Combine vtrees into one, following shape (an index in vtrees or a tuple (left shape, right shape)). """
+    stack = [(shape, False)]
+    combined = []
+    while len(stack) > 0:
+        shape, expanded = stack.pop()
+        if isinstance(shape, int):
+            combined.append(vtrees[shape])
+        elif expanded:
+            right = combined.pop()
+            combined.append(VtreeSplit(combined.pop(), right))
+        else:
+            stack.append((shape, True))
+            stack.append((shape[1], False))
+            stack.append((shape[0], False))
+    return combined[0]
+
+
+def _divide_remaining(nb_left: int, nb_right: int, remaining_literals: List[any]) -> Tuple[List[any], List[any]]:
+    """
+    Divide the remaining literals over the left and right side of a split, which already have nb_left and nb_right
+    literals, such that both sides become as balanced as possible.
+    :return: The remaining literals for the left and for the right side.
+    """
+    left_free = []
+    right_free = []
+    # Equally Divide the remaining_variables
+    if len(remaining_literals) > 0:
+        if nb_left < nb_right:
+            too_little, nb_too_little, nb_too_many = left_free, nb_left, nb_right
+        else:
+            too_little, nb_too_little, nb_too_many = right_free, nb_right, nb_left
+        needed_to_balance = min(nb_too_many - nb_too_little, len(remaining_literals))
+        too_little.extend(remaining_literals[:needed_to_balance])
+        remaining_literals = remaining_literals[needed_to_balance:]
+
+        if len(remaining_literals) > 0:
+            # Divide the remaining variables equally
+            add_to_left = math.floor(len(remaining_literals)/2)
+            left_free.extend(remaining_literals[:add_to_left])
+            right_free.extend(remaining_literals[add_to_left:])
+    return left_free, right_free
+
+
+class _LiteralIndex:
+    """
+    Index used by create_vtree to assign literals to subtrees of an integration tree without set intersections.
+    The nodes are numbered in pre-order, so the subtree of a node is an interval of numbers. Each literal is mapped to
+    the lowest node of its continuous variables. As the continuous variables of a literal lie on one path from the root,
+    the literal has variables in a subtree (is bound) if and only if that lowest node is in the subtree. The literals
+    are sorted by the number of their lowest node, so the bound literals of a subtree are a slice.
+    """
+
+    def __init__(self, tree: IntTree, literals: Iterable[any], logic2cont, partition='greedy'):
+        self.partition = partition  # The partition method of create_vtree
+        self._intervals: Dict[int, Tuple[int, int]] = dict()  # id(node) -> [start, end) of its subtree
+        var_intervals: Dict[any, Tuple[int, int]] = dict()
+        stack = [(tree, False)]
+        position = 0
+        while len(stack) > 0:
+            node, expanded = stack.pop()
+            if expanded:
+                interval = self._intervals[id(node)][0], position
+                self._intervals[id(node)] = interval
+                if node.var is not None:
+                    var_intervals[node.var] = interval
+            else:
+                self._intervals[id(node)] = position, None
+                position += 1
+                stack.append((node, True))
+                stack.extend((child, False) for child in reversed(node.get_children()))
+
+        self.free: List[any] = []  # The literals without continuous variables in tree
+        bound: List[Tuple[int, any]] = []  # (number of lowest node, literal)
+        for lit in literals:
+            intervals = [var_intervals[var] for var in logic2cont[lit] if var in var_intervals]
+            if len(intervals) == 0:
+                self.free.append(lit)
+            else:
+                lowest = max(start for start, end in intervals)
+                assert all(start <= lowest < end for start, end in intervals), \
+                    f"The variables of {lit} are not on one path of the integration tree"
+                bound.append((lowest, lit))
+        bound.sort(key=lambda x: x[0])
+        self._positions = [position for position, lit in bound]
+        self._literals = [lit for position, lit in bound]
+
+    def _slice(self, start: int, end: int) -> Tuple[int, int]:
+        return bisect_left(self._positions, start), bisect_left(self._positions, end)
+
+    def bound(self, tree: IntTree) -> List[any]:
+        """ The literals with continuous variables in tree (a subtree of the indexed tree, or a new node over those) """
+        interval = self._intervals.get(id(tree))
+        if interval is None:
+            return [lit for child in tree.get_children() for lit in self.bound(child)]
+        start, end = self._slice(*interval)
+        return self._literals[start:end]
+
+    def nb_bound(self, tree: IntTree) -> int:
+        """ The amount of literals with continuous variables in tree. """
+        interval = self._intervals.get(id(tree))
+        if interval is None:
+            return sum(self.nb_bound(child) for child in tree.get_children())
+        start, end = self._slice(*interval)
+        return end - start
+
+    def at(self, tree: IntTree) -> List[any]:
+        """ The literals for which tree is the lowest node of their continuous variables (empty for new nodes). """
+        interval = self._intervals.get(id(tree))
+        if interval is None:
+            return []
+        start, end = self._slice(interval[0], interval[0] + 1)
+        return self._literals[start:end]
 
-    def _to_dot(self):
-        yield f'{id(self)} [label="{self.var}"]'
-        yield f'{id(self)} -> {id(self.line)}'
-        yield from self.line._to_dot()
 
 class IntTreeFactory:
     """ Factory used to construct a balanced integration tree (IntTree) """
@@ -383,61 +603,91 @@ class IntTreeFactory:
         assert graph is not None
         """ The primal graph at the beginning of the process, displaying all the interactions between the variables. """
         self.connected_to = {node: targets.copy() for node, targets in graph.connected_to.items()}
-        # Store integration tree roots with the variables that occur within each root and the height of each root.
-        self.roots = []  # type: List[Tuple[IntTree, Set[any], int]]
+        # Store integration tree roots with the height of each root, by sequence number. The sequence numbers order
+        # the roots: a merged root takes the place (sequence number) of the first root it merges.
+        self._roots: Dict[int, Tuple[IntTree, int]] = dict()
+        self._next_seq = 0
+        # Union-find over the added variables: each set contains the variables of one root.
+        self._parent: Dict[any, any] = dict()
+        self._size: Dict[any, int] = dict()  # representative -> size of its set
+        self._seq_of: Dict[any, int] = dict()  # representative -> sequence number of its root
+        self._rep_of: Dict[int, any] = dict()  # sequence number of a root -> representative
+
+    @property
+    def roots(self) -> List[Tuple[IntTree, int]]:
+        """ The current integration tree roots (tree, height), in order. """
+        return [self._roots[seq] for seq in sorted(self._roots)]
+
+    def _find(self, var):
+        """ The representative of the set of var (path compression). """
+        rep = var
+        while self._parent[rep] != rep:
+            rep = self._parent[rep]
+        while self._parent[var] != rep:
+            self._parent[var], var = rep, self._parent[var]
+        return rep
+
+    def _connected_roots(self, node) -> Set[int]:
+        """ The sequence numbers of the roots that contain a neighbor of node. """
+        return {self._seq_of[self._find(neighbor)] for neighbor in self.connected_to[node] if neighbor in self._parent}
+
+    def _merge(self, node, seqs: List[int], tree: IntTree, height: int):
+        """ Replace the roots seqs by the root tree (at the place of seqs[0]), with node added to its variables. """
+        self._parent[node] = node
+        self._size[node] = 1
+        reps = [node] + [self._rep_of.pop(seq) for seq in seqs]
+        rep = max(reps, key=self._size.__getitem__)  # union by size
+        for other in reps:
+            if other is not rep:
+                self._parent[other] = rep
+                self._size[rep] += self._size.pop(other)
+                self._seq_of.pop(other, None)
+        for seq in seqs[1:]:
+            del self._roots[seq]
+
+        seq = seqs[0] if len(seqs) > 0 else self._next_seq
+        if len(seqs) == 0:
+            self._next_seq += 1
+        self._roots[seq] = tree, height
+        self._seq_of[rep] = seq
+        self._rep_of[seq] = rep
 
     def add_node(self, node):
         """ Add the given node (variable) of the primal graph to the integration tree. """
         assert node is not None
-        # Root x (index) is relevant if any of the neighbors of node are present in x.
-        neighbors = self.connected_to[node]
-        connected_root_indices = [index for index, (tree, conts, height) in enumerate(self.roots)
-                                  if any(neighbor in conts for neighbor in neighbors)] # TODO: if neighbors & conts != empty?
+        # Root x is relevant if any of the neighbors of node are present in x.
+        connected_seqs = sorted(self._connected_roots(node))
 
         # Connect node to roots
-        if len(connected_root_indices) == 0:  #  leaf
-            self.roots.append((IntTreeVar(node), {node}, 1))
-
-        elif len(connected_root_indices) == 1:  # line
-            index = connected_root_indices[0]
-            curr_tree, conts, height = self.roots[index]
-            conts.add(node)
-            new_tree = IntTreeLine(node, curr_tree)
-            self.roots[index] = new_tree, conts, height + 1
-
-        elif len(connected_root_indices) == 2:  # split
-            i1, i2 = min(connected_root_indices), max(connected_root_indices)
-            curr_tree1, conts, height1 = self.roots[i1]
-            curr_tree2, conts2, height2 = self.roots[i2]
-            conts.update(conts2)
-            conts.add(node)
+        if len(connected_seqs) == 0:  #  leaf
+            self._merge(node, connected_seqs, IntTreeVar(node), 1)
+
+        elif len(connected_seqs) == 1:  # line
+            curr_tree, height = self._roots[connected_seqs[0]]
+            self._merge(node, connected_seqs, IntTreeLine(node, curr_tree), height + 1)
+
+        elif len(connected_seqs) == 2:  # split
+            curr_tree1, height1 = self._roots[connected_seqs[0]]
+            curr_tree2, height2 = self._roots[connected_seqs[1]]
             new_tree = IntTreeSplit(node, curr_tree1, curr_tree2)
-            new_height = max(height1, height2) + 1
-            self.roots[i1] = new_tree, conts, new_height
-            self.roots.pop(i2)
+            self._merge(node, connected_seqs, new_tree, max(height1, height2) + 1)
 
         else:  # parallel
-            new_cont = set().union(*(self.roots[index][1] for index in connected_root_indices))
-            new_cont.add(node)
-            trees = [self.roots[index][0] for index in connected_root_indices]
-            new_tree = IntTreeParallel(node, trees)
-            new_height = max(self.roots[index][2] for index in connected_root_indices) + 1
-            connected_root_indices.sort()  # Required because indices change if deleted in improper order
-            self.roots[connected_root_indices[0]] = new_tree, new_cont, new_height
-            # Clear other roots
-            for index in reversed(connected_root_indices[1:]):
-                self.roots.pop(index)
+            trees = [self._roots[seq][0] for seq in connected_seqs]
+            new_height = max(self._roots[seq][1] for seq in connected_seqs) + 1
+            self._merge(node, connected_seqs, IntTreeParallel(node, trees), new_height)
 
     def get_int_tree(self) -> Optional[IntTree]:
         """ Get the current roots as one integration tree. """
-        if len(self.roots) == 0:
+        roots = self.roots
+        if len(roots) == 0:
             return None
-        elif len(self.roots) == 1:
-            return self.roots[0][0]
-        elif len(self.roots) == 2:
-            return IntTreeSplit(None, self.roots[0][0], self.roots[1][0])
+        elif len(roots) == 1:
+            return roots[0][0]
+        elif len(roots) == 2:
+            return IntTreeSplit(None, roots[0][0], roots[1][0])
         else:
-            trees = list(map(lambda x: x[0], self.roots))
+            trees = list(map(lambda x: x[0], roots))
             return IntTreeParallel(None, trees)
 
     def get_least_depth_increase(self, nodes: List[any]) -> List[any]:
@@ -459,35 +709,17 @@ class IntTreeFactory:
 
     def current_depth(self):
         """ The depth of the integration tree if it was formed now (get_int_tree()). """
-        if len(self.roots) == 1:
-            return self.roots[0][2]
+        if len(self._roots) == 1:
+            return next(iter(self._roots.values()))[1]
         else:
-            return max(root[2] for root in self.roots) + 1
+            return max(height for tree, height in self._roots.values()) + 1
 
     def get_new_height(self, node) -> int:
         """ The new height of an integration root when node was to be added. """
         assert node is not None
-        # Root x (index) is relevant if any of the neighbors of node are present in x.
-        neighbors = self.connected_to[node]
-        connected_root_indices = [index for index, (tree, conts, height) in enumerate(self.roots)
-                                  if any(neighbor in conts for neighbor in neighbors)]
-
-        # new root
-        if len(connected_root_indices) == 0:
-            return 1
-        # extend line
-        elif len(connected_root_indices) == 1:
-            _, _, height = self.roots[connected_root_indices[0]]
-            return height + 1
-        # create split
-        elif len(connected_root_indices) == 2:
-            i1, i2 = connected_root_indices[0], connected_root_indices[1]
-            _, _, height1 = self.roots[i1]
-            _, _, height2 = self.roots[i2]
-            return max(height1, height2) + 1
-        # Create multiple parallel
-        else:
-            return max(self.roots[index][2] for index in connected_root_indices) + 1
+        # Root x is relevant if any of the neighbors of node are present in x.
+        # new root, or extend line, create split or create multiple parallel
+        return max((self._roots[seq][1] for seq in self._connected_roots(node)), default=0) + 1
 
 
 def vtree_to_int_tree(vtree: Vtree, logic2cont) -> IntTree:
@@ -501,7 +733,7 @@ def vtree_to_int_tree(vtree: Vtree, logic2cont) -> IntTree:
         vars = logic2cont[vtree.var]
         assert len(vars) > 0
         if len(vars) == 1:
-            return IntTreeVar(vars[0])
+            return IntTreeVar(next(iter(vars)))
         else:
             int_tree = None
             for x in vars:
@@ -509,61 +741,69 @@ def vtree_to_int_tree(vtree: Vtree, logic2cont) -> IntTree:
             return int_tree
     else:
         assert isinstance(vtree, VtreeSplit)
-        # Collect variables
-        var_dict: Dict[int, Set[str]] = dict()
-        for node in vtree.all_nodes():
+        # Number the continuous variables (in order of the leafs), sets of variables are bitsets (ints) from here on
+        cont_vars: List[any] = []
+        numbers: Dict[any, int] = dict()
+        var_masks: Dict[int, int] = dict()  # id(vtree node) -> the continuous variables of its literals
+        nodes: List[Vtree] = []  # in pre-order
+        stack = [vtree]
+        while len(stack) > 0:
+            node = stack.pop()
+            nodes.append(node)
             if isinstance(node, VtreeVar):
-                var_set = set()
-                for x in node.all_vars():
-                    var_set.update(logic2cont[x])
-                var_dict[id(node)] = var_set
+                mask = 0
+                for x in logic2cont[node.var]:
+                    if x not in numbers:
+                        numbers[x] = len(cont_vars)
+                        cont_vars.append(x)
+                    mask |= 1 << numbers[x]
+                var_masks[id(node)] = mask
             else:
                 assert isinstance(node, VtreeSplit)
-                var_dict[id(node)] = var_dict[id(node.primes)] | var_dict[id(node.subs)]
-
-        # Compute variable overlaps
-        overlap_dict: Dict[int, Set[str]] = dict()
-
-        def _mark_overlap(vtree_node: Vtree, excluded: Set[str]):
-            if isinstance(vtree_node, VtreeVar):
-                overlap_dict[id(vtree_node)] = var_dict[id(vtree_node)] - excluded
+                stack.append(node.subs)
+                stack.append(node.primes)
+        for node in reversed(nodes):
+            if isinstance(node, VtreeSplit):
+                var_masks[id(node)] = var_masks[id(node.primes)] | var_masks[id(node.subs)]
+
+        # Compute variable overlaps, excluding the variables that overlap in an ancestor
+        overlaps: Dict[int, List[any]] = dict()
+        excluded = {id(vtree): 0}
+        for node in nodes:
+            node_excluded = excluded.pop(id(node))
+            if isinstance(node, VtreeVar):
+                overlap = var_masks[id(node)] & ~node_excluded
             else:
-                assert isinstance(vtree_node, VtreeSplit)
-                overlap_dict[id(vtree_node)] = var_dict[id(vtree_node.primes)] & var_dict[id(vtree_node.subs)] - excluded
-                excluded |= var_dict[id(vtree_node.primes)] & var_dict[id(vtree_node.subs)]
-                _mark_overlap(vtree_node.primes, excluded.copy())
-                _mark_overlap(vtree_node.subs, excluded)
-        _mark_overlap(vtree, set())
+                overlap = var_masks[id(node.primes)] & var_masks[id(node.subs)]
+                excluded[id(node.primes)] = excluded[id(node.subs)] = node_excluded | overlap
+                overlap &= ~node_excluded
+            overlaps[id(node)] = [cont_vars[i] for i in iter_bits(overlap)]
 
         # Convert overlap into int_tree
         int_trees: Dict[int, IntTree] = dict()
-        for node in vtree.all_nodes():
-            if isinstance(node, VtreeVar) and len(overlap_dict[id(node)]):
-                int_tree = None
-                for x in overlap_dict[id(node)]:
-                    int_tree = IntTreeLine(x, int_tree) if int_tree is not None else IntTreeVar(x)
-                int_trees[id(node)] = int_tree
-            elif isinstance(node, VtreeSplit):
-                p = int_trees.get(id(node.primes))
-                s = int_trees.get(id(node.subs))
-
-                if p is None and s is None and len(overlap_dict[id(node)]):
-                    int_tree = None
-                    for x in overlap_dict[id(node)]:
-                        int_tree = IntTreeLine(x, int_tree) if int_tree is not None else IntTreeVar(x)
-                    int_trees[id(node)] = int_tree
-                elif (p is not None and s is None) or (p is None and s is not None):
-                    int_tree = p or s
-                    for x in overlap_dict[id(node)]:
-                        int_tree = IntTreeLine(x, int_tree)
-                    int_trees[id(node)] = int_tree
-                elif p is not None and s is not None:
-                    if len(overlap_dict[id(node)]) == 0:
-                        int_trees[id(node)] = IntTreeSplit(var=None, left=p, right=s)
-                    else:
-                        int_tree = None
-                        for x in overlap_dict[id(node)]:
-                            int_tree = IntTreeLine(x, int_tree) if int_tree is not None else IntTreeSplit(var=x, left=p, right=s)
-                        int_trees[id(node)] = int_tree
+        for node in reversed(nodes):
+            overlap = overlaps[id(node)]
+            if isinstance(node, VtreeVar):
+                if len(overlap) > 0:
+                    int_trees[id(node)] = _line(overlap[1:], IntTreeVar(overlap[0]))
+                continue
+            p = int_trees.get(id(node.primes))
+            s = int_trees.get(id(node.subs))
+            if p is None and s is None:
+                if len(overlap) > 0:
+                    int_trees[id(node)] = _line(overlap[1:], IntTreeVar(overlap[0]))
+            elif p is None or s is None:
+                int_trees[id(node)] = _line(overlap, p or s)
+            elif len(overlap) == 0:
+                int_trees[id(node)] = IntTreeSplit(var=None, left=p, right=s)
+            else:
+                int_trees[id(node)] = _line(overlap[1:], IntTreeSplit(var=overlap[0], left=p, right=s))
         return int_trees[id(vtree)]
 
+
+def _line(variables: List[any], int_tree: IntTree) -> IntTree:
+    """ Extend int_tree with a line of the given variables (the last variable becomes the root). """
+    for x in variables:
+        int_tree = IntTreeLine(x, int_tree)
+    return int_tree
+
@@ -0,0 +1,96 @@
+"""
+    lookahead.py - Break min-fill ties by looking several eliminations ahead. Each tied vertex is scored by its own fill
+    plus the lowest total fill of the next eliminations, found by a beam search over the vertices with the lowest fill.
+"""
+import math
+import time
+from typing import List, Dict, Tuple, FrozenSet, Optional
+
+from .primal import PrimalGraph
+
+
+class MinfillLookahead:
+    """
+    k-step lookahead over the eliminations of a primal graph. The primal graph must support checkpoint()/rollback().
+    The score of a partial elimination state only depends on the set of eliminated vertices, so scores are memoized on
+    that set and reused across the steps of the elimination loop. This is exact when the fills of the primal graph are
+    exact (PrimalGraph or IntPrimalGraph with incremental=True), otherwise it is an approximation.
+    Can be used as tie-breaker of the EliminationEngine, which binds it to the primal graph of each elimination.
+    """
+
+    def __init__(self, primal: Optional[PrimalGraph] = None, depth=2, beam_width=3):
+        """
+        :param primal: The primal graph of the elimination loop, notify each elimination using removed(). None when used
+        as tie-breaker.
+        :param depth: The amount of eliminations to look ahead, including the elimination of the tied vertex itself.
+        :param beam_width: The amount of lowest fill vertices to expand at each following elimination.
+        """
+        assert depth >= 1 and beam_width >= 1
+        self.primal = primal
+        self.depth = depth
+        self.beam_width = beam_width
+        self.time_spent = 0.0  # seconds spent in get_lowest_lookahead_fill
+        self._nb_states = 0
+        self._eliminated: FrozenSet[any] = frozenset()
+        self._memo: Dict[Tuple[FrozenSet[any], int], int] = dict()
+
+    def nb_states(self) -> int:
+        """ The amount of evaluated partial elimination states. """
+        return self._nb_states
+
+    def removed(self, vertex):
+        """
+        Notify that vertex is eliminated from the primal graph by the elimination loop. The memoized states that do
+        not extend the eliminated vertices can no longer be reached, and are discarded.
+        """
+        eliminated = self._eliminated = self._eliminated | {vertex}
+        self._memo = {key: fill for key, fill in self._memo.items() if key[0] >= eliminated}
+
+    def __call__(self, state, candidates: List[any]) -> List[any]:
+        """ The tie-breaker of the EliminationEngine, see get_lowest_lookahead_fill. """
+        if state.primal is not self.primal:
+            self.primal = state.primal
+            self._eliminated = frozenset()
+            self._memo = dict()
+        for vertex in state.ordering[len(self._eliminated):]:
+            self.removed(vertex)
+        return self.get_lowest_lookahead_fill(candidates)
+
+    def get_lowest_lookahead_fill(self, vertices: List[any]) -> List[any]:
+        """ Get the subset of vertices with the lowest total fill over the next depth eliminations. """
+        if len(vertices) == 1:
+            return vertices
+
+        start = time.process_time()
+        try:
+            lowest_fill = math.inf
+            lowest_fill_vertices = []
+            for vertex in vertices:
+                fill = self._get_cost(self._eliminated, vertex, self.primal.get_fill_count(vertex), self.depth)
+                if fill < lowest_fill:
+                    lowest_fill = fill
+                    lowest_fill_vertices = [vertex]
+                elif fill == lowest_fill:
+                    lowest_fill_vertices.append(vertex)
+            return lowest_fill_vertices
+        finally:
+            self.time_spent += time.process_time() - start
+
+    def _get_cost(self, eliminated: FrozenSet[any], vertex, fill: int, depth: int) -> int:
+        """ The fill of eliminating vertex plus the lowest total fill of the following depth - 1 eliminations. """
+        if depth == 1:
+            return fill
+        eliminated = eliminated | {vertex}
+        key = (eliminated, depth - 1)
+        future_fill = self._memo.get(key)
+        if future_fill is None:
+            mark = self.primal.checkpoint()
+            self.primal.remove_and_process_node(vertex)
+            future_fill = 0
+            if self.primal.nb_fills() > 0:
+                future_fill = min(self._get_cost(eliminated, next_vertex, next_fill, depth - 1)
+                                  for next_vertex, next_fill in self.primal.get_lowest_fills(self.beam_width))
+            self.primal.rollback(mark)
+            self._memo[key] = future_fill
+            self._nb_states += 1
+        return fill + future_fill
@@ -0,0 +1,265 @@
+"""
+parallel_ties.py - Evaluates the lowest future minfill tie-breaker (see PrimalGraph.get_lowest_future_minfill) for
+many tied vertices in a thread or process pool. Instead of eliminating and rolling back each tied vertex on the primal
+graph, the workers use a compact, read-only snapshot of the graph (bitset adjacencies) and each worker only copies
+the adjacencies it changes (copy-on-write). Thread workers share the snapshot of the tie. Process workers receive a
+snapshot of the whole graph once (when the pool starts) and keep it up to date by replaying the eliminations, so a
+tie only sends the eliminated vertices and the lowest fills. The results are merged in the order of the tied
+vertices, so the outcome does not depend on the amount of workers.
+"""
+import math
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Dict, Tuple, Optional
+
+from .int_primal import IntPrimalGraph, iter_bits, popcount
+from .weighted_primal import WeightedPrimalGraph
+
+
+class GraphSnapshot:
+    """
+    The part of a primal graph needed to compute the future minfill of a set of vertices: the adjacency (bitsets) of
+    the vertices within two steps of them, their weights and the lowest stored fills.
+    """
+
+    def __init__(self, adjacency: Dict[int, int], lowest_fills: List[Tuple[any, int]],
+                 weights: Optional[Dict[int, float]]):
+        """
+        :param adjacency: The bitset adjacency of each vertex (by index) within two steps of the evaluated vertices.
+        :param lowest_fills: (fill, index) of the vertices with the lowest stored fills, in order of fill, index -1 for
+        vertices outside of adjacency. At least one more than the size of the largest closed neighborhood of an
+        evaluated vertex, or all vertices.
+        :param weights: The weight of each vertex in adjacency, None if the graph is not weighted.
+        """
+        self.adjacency = adjacency
+        self.lowest_fills = lowest_fills
+        self.weights = weights
+
+    def _fill(self, neighbors: int, neighbor_adjacency) -> float:
+        """ The fill of a vertex with the given neighbors, neighbor_adjacency(index) is the adjacency of a neighbor. """
+        fill = 0
+        for neighbor in iter_bits(neighbors):
+            missing = neighbors & ~neighbor_adjacency(neighbor) & ~(1 << neighbor)
+            if self.weights is None:
+                fill += popcount(missing)
+            else:
+                fill += self.weights[neighbor] * sum(self.weights[target] for target in iter_bits(missing))
+        return fill
+
+    def future_minfill(self, index: int) -> float:
+        """ The minfill of the graph after eliminating the vertex with the given index (remove_and_process_node). """
+        neighbors = self.adjacency[index]
+        removed = neighbors | (1 << index)
+        # The fills of the vertices outside of the closed neighborhood are not recomputed by the primal graph
+        minfill = next((fill for fill, other in self.lowest_fills if other < 0 or not (removed >> other) & 1), math.inf)
+
+        changed: Dict[int, int] = dict()  # copy-on-write adjacencies after the elimination
+        for neighbor in iter_bits(neighbors):
+            changed[neighbor] = (self.adjacency[neighbor] | neighbors) & ~(1 << neighbor) & ~(1 << index)
+
+        def adjacency_after(other):
+            return changed[other] if other in changed else self.adjacency[other] & ~(1 << index)
+
+        for neighbor in iter_bits(neighbors):
+            minfill = min(minfill, self._fill(changed[neighbor], adjacency_after))
+        return minfill
+
+
+def _future_minfills(snapshot: GraphSnapshot, indices: List[int]) -> List[float]:
+    """ The task of a thread worker: the future minfill of each index. """
+    return [snapshot.future_minfill(index) for index in indices]
+
+
+_replica: Optional[GraphSnapshot] = None  # The snapshot of the whole graph in a process worker
+_replica_eliminated = 0  # The amount of eliminations replayed on _replica
+
+
+def _init_replica(snapshot: GraphSnapshot):
+    """ The initializer of a process worker, stores the snapshot of the whole graph. """
+    global _replica, _replica_eliminated
+    _replica, _replica_eliminated = snapshot, 0
+
+
+def _replica_future_minfills(eliminated: List[int], lowest_fills: List[Tuple[any, int]], indices: List[int]) \
+        -> List[float]:
+    """
+    The task of a process worker: the future minfill of each index, after replaying the eliminations that are new to
+    this worker on its replica.
+    :param eliminated: The indices of all vertices eliminated since the pool started, in order.
+    :param lowest_fills: The lowest stored fills of the primal graph (see GraphSnapshot).
+    """
+    global _replica_eliminated
+    adjacency = _replica.adjacency
+    for index in eliminated[_replica_eliminated:]:
+        neighbors = adjacency.pop(index)
+        for neighbor in iter_bits(neighbors):
+            adjacency[neighbor] = (adjacency[neighbor] | neighbors) & ~(1 << neighbor) & ~(1 << index)
+    _replica_eliminated = len(eliminated)
+    _replica.lowest_fills = lowest_fills
+    return [_replica.future_minfill(index) for index in indices]
+
+
+def _graph_index(primal) -> Dict[any, int]:
+    """ The index of each remaining vertex of primal in the snapshot of the whole graph. """
+    if isinstance(primal, IntPrimalGraph):
+        return {primal.vertices[i]: i for i in iter_bits(primal.alive)}
+    return {vertex: i for i, vertex in enumerate(primal.connected_to)}
+
+
+def create_graph_snapshot(primal, index: Dict[any, int]) -> GraphSnapshot:
+    """
+    Create a snapshot of the whole graph, without lowest fills (see _replica_future_minfills).
+    :param index: The index of each vertex of primal (see _graph_index).
+    """
+    if isinstance(primal, IntPrimalGraph):
+        adjacency = {i: primal.adjacency[i] for i in index.values()}
+    else:
+        adjacency = dict()
+        for vertex, i in index.items():
+            bitset = 0
+            for neighbor in primal.connected_to[vertex]:
+                bitset |= 1 << index[neighbor]
+            adjacency[i] = bitset
+    weights = None
+    if isinstance(primal, WeightedPrimalGraph):
+        weights = {i: primal.weight(vertex) for vertex, i in index.items()}
+    return GraphSnapshot(adjacency, [], weights)
+
+
+def _lowest_fills_amount(primal, vertices: List[any]) -> int:
+    """ The amount of lowest fills needed to evaluate vertices (see GraphSnapshot). """
+    return max(len(primal.connected_to[vertex]) for vertex in vertices) + 2
+
+
+def create_snapshot(primal, vertices: List[any]) -> Tuple[GraphSnapshot, List[int]]:
+    """
+    Create the snapshot of primal needed to evaluate the future minfill of vertices.
+    :return: The snapshot and the index of each vertex in it.
+    """
+    if isinstance(primal, IntPrimalGraph):
+        index = primal.index
+        region = 0
+        for vertex in vertices:
+            closed = primal.adjacency[index[vertex]] | (1 << index[vertex])
+            region |= closed
+            for neighbor in iter_bits(closed):
+                region |= primal.adjacency[neighbor]
+        adjacency = {i: primal.adjacency[i] for i in iter_bits(region)}
+        region_vertices = [primal.vertices[i] for i in iter_bits(region)]
+    else:
+        # Intern the vertices within two steps of vertices
+        index: Dict[any, int] = dict()
+        region_vertices = []
+        for vertex in vertices:
+            for near in [vertex, *primal.connected_to[vertex]]:
+                for other in [near, *primal.connected_to[near]]:
+                    if other not in index:
+                        index[other] = len(region_vertices)
+                        region_vertices.append(other)
+        adjacency = dict()
+        for i, vertex in enumerate(region_vertices):
+            bitset = 0
+            for neighbor in primal.connected_to[vertex]:
+                if neighbor in index:
+                    bitset |= 1 << index[neighbor]
+            adjacency[i] = bitset
+
+    weights = None
+    if isinstance(primal, WeightedPrimalGraph):
+        weights = {index[vertex]: primal.weight(vertex) for vertex in region_vertices}
+    amount = max(popcount(adjacency[index[vertex]]) for vertex in vertices) + 2
+    lowest_fills = [(fill, index[vertex]) if vertex in index else (fill, -1)
+                    for vertex, fill in primal.get_lowest_fills(amount)]
+    return GraphSnapshot(adjacency, lowest_fills, weights), [index[vertex] for vertex in vertices]
+
+
+def _lowest(vertices: List[any], minfills: List[float]) -> List[any]:
+    """ The vertices with the lowest minfill, in the order of vertices. """
+    lowest_minfill = min(minfills)
+    return [vertex for vertex, minfill in zip(vertices, minfills) if minfill == lowest_minfill]
+
+
+def get_lowest_future_minfill(primal, vertices: List[any]) -> List[any]:
+    """
+    Get the subset of vertices which, when removed, result in the lowest next minfill, evaluated on a snapshot. Equal
+    to primal.get_lowest_future_minfill(vertices) for PrimalGraph, WeightedPrimalGraph and IntPrimalGraph, which only
+    recompute the fills of the neighbors of a removed vertex when not incremental.
+    :param primal: The primal graph.
+    :param vertices: The vertices to evaluate.
+    :return: The vertices with the lowest future minfill, in the order of vertices.
+    """
+    if len(vertices) == 1:
+        return vertices
+    if getattr(primal, '_incremental', False):  # Also updates the fills of common neighbors, not in the snapshot
+        return primal.get_lowest_future_minfill(vertices)
+    snapshot, indices = create_snapshot(primal, vertices)
+    return _lowest(vertices, _future_minfills(snapshot, indices))
+
+
+class ParallelLowestFutureMinfill:
+    """
+    Tie-breaker of the EliminationEngine, the lowest_future_minfill tie-breaker evaluated in a thread or process pool.
+    The pool is started at the first large tie and must be shut down (close, or use the tie-breaker as context
+    manager). A process pool is bound to the primal graph of that tie, a new primal graph restarts the pool.
+
+    Only the future minfill is computed in the pool, not a combined (depth increase, future minfill) score. It follows
+    least_depth_increase in the tie-breaker chain, which runs in the calling thread: the depth increase is a cheap
+    union-find lookup in the IntTreeFactory, and filtering the ties on it first leaves fewer candidates to send to the
+    pool.
+    """
+
+    def __init__(self, workers: int = 4, processes=True, min_candidates=16):
+        """
+        :param workers: The amount of workers, every tie is split in this amount of tasks.
+        :param processes: Whether to use a process pool (True) or a thread pool (False).
+        :param min_candidates: Less candidates are evaluated in the current thread.
+        """
+        self.workers = workers
+        self.processes = processes
+        self.min_candidates = min_candidates
+        self._executor: Optional[Executor] = None
+        self._primal = None  # The primal graph replicated in the process workers
+        self._index: Optional[Dict[any, int]] = None  # The index of each vertex in the replicas
+        self._nb_eliminated = 0  # The amount of eliminations of the primal graph before the pool started
+
+    def close(self):
+        """ Shut down the pool. """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor, self._primal, self._index = None, None, None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _chunks(self, indices: List[int]) -> List[List[int]]:
+        size = math.ceil(len(indices) / self.workers)
+        return [indices[start:start + size] for start in range(0, len(indices), size)]
+
+    def __call__(self, state, candidates: List[any]) -> List[any]:
+        primal = state.primal
+        if len(candidates) < self.min_candidates or getattr(primal, '_incremental', False):
+            return get_lowest_future_minfill(primal, candidates)
+
+        if not self.processes:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers)
+            snapshot, indices = create_snapshot(primal, candidates)
+            chunks = self._chunks(indices)
+            results = self._executor.map(_future_minfills, [snapshot] * len(chunks), chunks)  # shared, not copied
+        else:
+            if self._primal is not primal:
+                self.close()
+                self._primal, self._index = primal, _graph_index(primal)
+                self._nb_eliminated = len(state.ordering)
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_replica,
+                                                     initargs=(create_graph_snapshot(primal, self._index),))
+            index = self._index
+            eliminated = [index[vertex] for vertex in state.ordering[self._nb_eliminated:]]
+            lowest_fills = [(fill, index[vertex])
+                            for vertex, fill in primal.get_lowest_fills(_lowest_fills_amount(primal, candidates))]
+            chunks = self._chunks([index[vertex] for vertex in candidates])
+            results = self._executor.map(_replica_future_minfills, [eliminated] * len(chunks),
+                                         [lowest_fills] * len(chunks), chunks)
+        return _lowest(candidates, [minfill for chunk in results for minfill in chunk])
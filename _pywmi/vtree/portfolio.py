@@ -0,0 +1,79 @@
+"""
+portfolio.py - Contains a vtree strategy that runs a portfolio of vtree strategies (and several seeds of the randomized
+ones) in parallel processes under a wall-clock budget, and returns the vtree with the best integration tree: the lowest
+induced width, then the lowest depth.
+"""
+import time
+from concurrent.futures import wait, FIRST_COMPLETED
+from typing import List, Tuple, Optional, Callable, Iterable
+
+from pywmi.engines.xsdd.literals import LiteralInfo
+from pywmi.engines.xsdd.vtrees.vtree import Vtree, balanced
+
+from _pywmi.util.process import run_in_process
+
+from .elimination_width import OrderEvaluator
+from .int_tree import vtree_to_int_tree, IntTree
+from .random_vtree import seeded
+from .topdown_mincut import conversion_tables
+
+
+def width_depth(int_tree: IntTree, evaluator: OrderEvaluator) -> Tuple[int, int]:
+    """ The default score of a portfolio: the induced width and depth of the integration tree (lower is better). """
+    return evaluator.width(int_tree.get_elimination_order()), int_tree.depth()
+
+
+def _run_candidates(literals: LiteralInfo, candidates: List[Callable[[LiteralInfo], Vtree]], budget: float,
+                    max_workers: int) -> List[Tuple[int, Vtree]]:
+    """
+    Run each candidate strategy on literals in its own (forked) process, at most max_workers at a time.
+    :return: The (index of the candidate, vtree) of the candidates that finished within budget seconds.
+    """
+    deadline = time.time() + budget
+    pending = list(reversed(range(len(candidates))))
+    running = dict()  # future -> index of candidate
+    results = []
+    while len(pending) + len(running) > 0 and time.time() < deadline:
+        while len(pending) > 0 and len(running) < max_workers:
+            index = pending.pop()
+            running[run_in_process(candidates[index], deadline - time.time(), literals)] = index
+        done, _ = wait(running, timeout=max(deadline - time.time(), 0), return_when=FIRST_COMPLETED)
+        for future in done:
+            index = running.pop(future)
+            if future.exception() is None:
+                results.append((index, future.result()))
+    # The processes still running are stopped at the deadline by their timeout
+    return results
+
+
+def portfolio(strategies: Iterable[Callable[[LiteralInfo], Vtree]],
+              randomized: Iterable[Callable[[LiteralInfo], Vtree]] = (), seeds: Iterable[int] = range(5),
+              budget=10.0, max_workers=4, score: Optional[Callable[[IntTree, OrderEvaluator], any]] = None):
+    """
+    Create a vtree strategy that races a portfolio of strategies.
+    :param strategies: The deterministic vtree strategies to run once.
+    :param randomized: The randomized vtree strategies (using random), run once for each seed (see seeded).
+    :param seeds: The seeds of the randomized strategies.
+    :param budget: The wall-clock time in seconds after which the unfinished strategies are stopped.
+    :param max_workers: The maximum amount of strategies that run at the same time.
+    :param score: A function mapping an integration tree and an evaluator of the interactions to a score, the vtree
+        with the lowest score is returned. Ties are broken by the order of the candidates. (width, depth) by default.
+    :return: A vtree strategy. If no strategy finishes within budget, a balanced vtree is returned.
+    """
+    strategies, randomized, seeds = tuple(strategies), tuple(randomized), tuple(seeds)
+    candidates = list(strategies) + [seeded(seed, strat) for strat in randomized for seed in seeds]
+    if score is None:
+        score = width_depth
+
+    def portfolio_strat(literals: LiteralInfo, __candidates=candidates, __budget=budget, __max_workers=max_workers,
+                        __score=score):
+        results = _run_candidates(literals, __candidates, __budget, __max_workers)
+        if len(results) == 0:
+            return balanced(literals)
+        logic2cont, cont2logic = conversion_tables(literals)
+        evaluator = OrderEvaluator(cont2logic.keys(), logic2cont.values())
+        _, _, vtree = min((__score(vtree_to_int_tree(vtree, logic2cont), evaluator), index, vtree)
+                          for index, vtree in results)
+        return vtree
+    portfolio_strat.__name__ = "portfolio_" + "_".join(strat.__name__ for strat in strategies + randomized)
+    return portfolio_strat
@@ -3,25 +3,55 @@
     min-fills/min degrees and process the removal of a node.
 """
 import math
-from typing import List, Tuple, Dict, Set, Iterable
+from itertools import islice
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Tuple, Dict, Set, Iterable, Optional
 from sortedcollections import ValueSortedDict
 
+from .bucket_queue import BucketQueue
+
+_MISSING = object()  # Trail value of a key that was not present.
+
 
 class PrimalGraph:
     """ Nodes should not be connected to themselves. """
 
-    def __init__(self, vertices: Iterable[any], compute_fills=True, compute_degrees=True):
+    def __init__(self, vertices: Iterable[any], compute_fills=True, compute_degrees=True, incremental=False,
+                 lazy_fills=False, bucket_queue=False):
         """
         Create a Primal graph representing the interactions between vertices.
         For min-fill or min-induced-width, use remove_and_process_node() instead of use remove_node()
         :param vertices: The vertices of the graph
         :param compute_fills; Whether this will be used to compute fills.
         :param compute_degrees: Whether this will be used to compute degrees.
+        :param incremental: Whether to maintain the fills incrementally. Instead of recomputing the fill edges of each
+        neighbor of a removed node, only the fill counts changed by the added fill edges and the removed node are
+        updated. This keeps the fills of all vertices exact and the fill edges are only computed when a node is
+        removed. All edges must be added before compute_fills().
+        :param lazy_fills: Whether to only store the amount of fills of each vertex. The fill edges are then computed
+        when a node is removed, rather than stored for every vertex. Implied by incremental.
+        :param bucket_queue: Whether to keep the fills and degrees in a BucketQueue instead of a ValueSortedDict. This
+        makes each update O(1) instead of O(log n).
         """
+        sorted_dict = BucketQueue if bucket_queue else ValueSortedDict
         self.connected_to: Dict[any, Set[any]] = {vertex: set() for vertex in vertices}
-        self._fills: ValueSortedDict[any, Tuple[int, List[Tuple[any, Set[any]]]]] = ValueSortedDict(lambda n: n[0]) if \
-            compute_fills else None
-        self._degrees: ValueSortedDict[any, int] = ValueSortedDict() if compute_degrees else None
+        self._incremental = incremental and compute_fills
+        self._store_fill_edges = compute_fills and not (incremental or lazy_fills)
+        if not compute_fills:
+            self._fills = None
+        elif not self._store_fill_edges:
+            self._fills: ValueSortedDict[any, int] = sorted_dict()
+        else:
+            self._fills: ValueSortedDict[any, Tuple[int, List[Tuple[any, Set[any]]]]] = \
+                sorted_dict(lambda n: n[0])
+        self._degrees: ValueSortedDict[any, int] = sorted_dict() if compute_degrees else None
+        # Incremental only: for each vertex, the amount of edges among its neighbors (counted in both directions).
+        self._neighbor_edges: Dict[any, int] = dict()
+        # Undo log of (container, key, old value) recorded while a checkpoint is active, see checkpoint().
+        self._trail: Optional[List[Tuple[any, any, any]]] = None
+        # For each active checkpoint, the vertices whose connections have been saved on the trail since.
+        self._saved_connections: List[Set[any]] = []
 
     def nb_fills(self):
         """ The amount of vertices for which their fills are stored. """
@@ -38,7 +68,7 @@ class PrimalGraph:
         neighbors = self.connected_to.get(node)
 
         # connect neighbors
-        if self._fills is not None:
+        if self._store_fill_edges:
             _, edges = self._fills.get(node)
             return edges
         else:
@@ -52,14 +82,77 @@ class PrimalGraph:
     def add_edge(self, a, b):
         """ Add edge between a and b. """
         assert a != b
-        self.connected_to[a].add(b)
-        self.connected_to[b].add(a)
+        self._connect(a, {b})
+        self._connect(b, {a})
 
     def add_edges(self, node_set: Set[any]):
         """ Add edges between all the nodes in the node_set. """
         for node in node_set:
-            self.connected_to[node].update(node_set)
-            self.connected_to[node].discard(node)
+            self._connect(node, node_set)
+            self._disconnect(node, node)
+
+    def checkpoint(self) -> int:
+        """
+        Start recording the mutations of this graph on a trail, so they can be undone by rollback().
+        Checkpoints can be nested, each checkpoint must be ended by a rollback to its mark.
+        :return: A mark to pass to rollback().
+        """
+        if self._trail is None:
+            self._trail = []
+        self._saved_connections.append(set())
+        return len(self._trail)
+
+    def rollback(self, mark: int):
+        """
+        Undo all mutations since the checkpoint that returned mark. Note that vertices with a restored fill (or degree)
+        are sorted last among the vertices with the same fill.
+        :param mark: The mark returned by the matching checkpoint().
+        """
+        assert self._trail is not None and len(self._saved_connections) > 0
+        trail = self._trail
+        while len(trail) > mark:
+            container, key, old = trail.pop()
+            if old is _MISSING:
+                container.pop(key)
+            else:
+                container[key] = old
+        self._saved_connections.pop()
+        if len(self._saved_connections) == 0:
+            self._trail = None
+
+    def _set(self, mapping, key, value):
+        """ mapping[key] = value, recorded on the trail. """
+        if self._trail is not None:
+            self._trail.append((mapping, key, mapping.get(key, _MISSING)))
+        mapping[key] = value
+
+    def _pop(self, mapping, key):
+        """ mapping.pop(key), recorded on the trail. """
+        value = mapping.pop(key)
+        if self._trail is not None:
+            self._trail.append((mapping, key, value))
+        return value
+
+    def _save_connections(self, vertex):
+        """
+        Record a copy of connected_to[vertex] on the trail, once per checkpoint. The rollback restores the copy, so
+        the restored connections iterate in the same order as a copy made before the mutations would.
+        """
+        if self._trail is not None and vertex not in self._saved_connections[-1]:
+            self._saved_connections[-1].add(vertex)
+            self._trail.append((self.connected_to, vertex, self.connected_to[vertex].copy()))
+
+    def _connect(self, vertex, targets: Set[any]):
+        """ connected_to[vertex] |= targets, recorded on the trail. """
+        self._save_connections(vertex)
+        self.connected_to[vertex] |= targets
+
+    def _disconnect(self, vertex, target):
+        """ connected_to[vertex].discard(target), recorded on the trail. """
+        connections = self.connected_to[vertex]
+        if target in connections:
+            self._save_connections(vertex)
+            connections.remove(target)
 
     def compute_fills(self, of_nodes=None):
         """ Compute the minfill values for each vertex in of_nodes or all vertices if of_nodes is None. """
@@ -67,6 +160,18 @@ class PrimalGraph:
         if of_nodes is None:
             of_nodes = self.connected_to.keys()
 
+        if not self._store_fill_edges:
+            # The missing edges among the neighbors are all pairs of neighbors minus the edges among the neighbors.
+            for vertex in of_nodes:
+                connections = self.connected_to.get(vertex)
+                neighbor_edges = sum(len(connections & self.connected_to[connected_vertex])
+                                     for connected_vertex in connections)
+                degree = len(connections)
+                self._set(self._fills, vertex, degree * (degree - 1) - neighbor_edges)
+                if self._incremental:
+                    self._set(self._neighbor_edges, vertex, neighbor_edges)
+            return
+
         for vertex in of_nodes:
             connections = self.connected_to.get(vertex)
             fill = 0
@@ -78,7 +183,32 @@ class PrimalGraph:
                 if len(unconnected) > 0:
                     fill += len(unconnected)
                     edges.append((connected_vertex, unconnected))
-            self._fills[vertex] = (fill, edges)
+            self._set(self._fills, vertex, (fill, edges))
+
+    def _update_fill_count(self, vertex):
+        """ Incremental only: update the fill of vertex (each missing edge among its neighbors, counted twice). """
+        degree = len(self.connected_to[vertex])
+        self._set(self._fills, vertex, degree * (degree - 1) - self._neighbor_edges[vertex])
+
+    def _add_neighbor_edges(self, vertex, amount: int):
+        """ Incremental only: add amount to the neighbor edge count of vertex. """
+        self._set(self._neighbor_edges, vertex, self._neighbor_edges[vertex] + amount)
+
+    def _add_fill_edge(self, a, b, changed: Set[any]):
+        """
+        Incremental only: add edge between a and b, updating the neighbor edge counts. The vertices with an affected
+        fill are added to changed.
+        """
+        common = self.connected_to[a] & self.connected_to[b]
+        self._connect(a, {b})
+        self._connect(b, {a})
+        # a-b is a new edge among the neighbors of each common neighbor, the common neighbors are new edges among the
+        # neighbors of a and b.
+        self._add_neighbor_edges(a, 2 * len(common))
+        self._add_neighbor_edges(b, 2 * len(common))
+        for vertex in common:
+            self._add_neighbor_edges(vertex, 2)
+        changed.update(common)
 
     def compute_degrees(self, of_nodes=None):
         """ Compute the degrees for each vertex in of_nodes or all vertices if of_nodes is None. """
@@ -87,65 +217,113 @@ class PrimalGraph:
             of_nodes = self.connected_to.keys()
 
         for vertex in of_nodes:
-            self._degrees[vertex] = len(self.connected_to[vertex])
+            self._set(self._degrees, vertex, len(self.connected_to[vertex]))
+
+    def _remove_degree(self, a, neighbors):
+        """ Remove the degree of a and recompute the degrees of its (former) neighbors. """
+        if self._degrees is not None:
+            if a in self._degrees:
+                self._pop(self._degrees, a)
+            self.compute_degrees(neighbors)
 
     def remove_and_process_node(self, a):
         """ Remove node a, connect each of its neighbors with each other and recompute minfills """
+        if self._incremental:
+            self._remove_and_process_node_incremental(a)
+            return
+
         # remove node
-        neighbors = self.connected_to.pop(a)
+        edges = self.get_fill(a) if self._fills is not None else None  # computed before a is removed
+        neighbors = self._pop(self.connected_to, a)
 
         # connect neighbors
         if self._fills is not None:
-            _, edges = self._fills.pop(a)
+            self._pop(self._fills, a)
             for neighbor in neighbors:
-                self.connected_to[neighbor].discard(a)
+                self._disconnect(neighbor, a)
             for vertex, new_targets in edges:
-                self.connected_to[vertex] |= new_targets
+                self._connect(vertex, new_targets)
             self.compute_fills(neighbors)  # recompute fills
         else:
             for neighbor in neighbors:
-                self.connected_to[neighbor] |= neighbors
-                self.connected_to[neighbor].discard(a)
+                self._connect(neighbor, neighbors)
+                self._disconnect(neighbor, a)
+                self._disconnect(neighbor, neighbor)
 
         # Compute degrees
-        if self._degrees is not None:
-            self.compute_degrees(neighbors)
+        self._remove_degree(a, neighbors)
+
+    def _remove_and_process_node_incremental(self, a):
+        neighbors = self.connected_to[a]
+        changed = set(neighbors)
+
+        # connect neighbors, one fill edge at a time.
+        for vertex in neighbors:
+            for target in neighbors - self.connected_to[vertex]:
+                if target != vertex:
+                    self._add_fill_edge(vertex, target, changed)
+
+        # remove node. Its neighbors now form a clique, so each loses the edges to the other len(neighbors) - 1.
+        self._pop(self.connected_to, a)
+        self._pop(self._neighbor_edges, a)
+        self._pop(self._fills, a)
+        changed.discard(a)
+        removed_edges = 2 * (len(neighbors) - 1)
+        for neighbor in neighbors:
+            self._disconnect(neighbor, a)
+            self._add_neighbor_edges(neighbor, -removed_edges)
+        for vertex in changed:
+            self._update_fill_count(vertex)
+
+        # Compute degrees
+        self._remove_degree(a, neighbors)
 
     def remove_node(self, a):
         """ Remove all connections from and to node a. """
         # Remove connection
-        neighbors = self.connected_to.pop(a)
+        neighbors = self._pop(self.connected_to, a)
         for neighbor in neighbors:
-            self.connected_to[neighbor].discard(a)
+            self._disconnect(neighbor, a)
         # Recompute degrees
-        if self._degrees is not None:
-            self.compute_degrees(neighbors)
+        self._remove_degree(a, neighbors)
         # Recompute fills
         if self._fills is not None:
-            self._fills.pop(a)
-            self.compute_fills(neighbors)
+            self._pop(self._fills, a)
+            if self._incremental:
+                # Each neighbor loses the edges between a and their common neighbors.
+                self._pop(self._neighbor_edges, a)
+                for neighbor in neighbors:
+                    self._add_neighbor_edges(neighbor, -2 * len(self.connected_to[neighbor] & neighbors))
+                    self._update_fill_count(neighbor)
+            else:
+                self.compute_fills(neighbors)
+
+    def _get_min_fill(self) -> int:
+        """ The minimum nb of fills. """
+        vertex, _ = self._fills.peekitem(0)
+        return self._fills.key(vertex)
 
     def get_minfills(self) -> List[any]:
         """ Get all vertices with the minimum nb of fills. """
         assert self._fills is not None and len(self._fills) > 0
-        _, (minfill, _) = self._fills.peekitem(0)
-        endIndex = len(self._fills)
-        for index, (fill, edges) in enumerate(self._fills.values()):
-            if fill != minfill:
-                endIndex = index
-                break
-        return list(self._fills.keys())[:endIndex]
+        minfill = self._get_min_fill()
+        return list(self._fills.irange_key(minfill, minfill))
+
+    def get_fill_count(self, vertex) -> int:
+        """ Get the nb of fills of vertex. """
+        assert self._fills is not None
+        return self._fills.key(vertex)
+
+    def get_lowest_fills(self, amount: int) -> List[Tuple[any, int]]:
+        """ Get the (at most) amount vertices with the lowest nb of fills, with their fill, in order of fill. """
+        assert self._fills is not None
+        return [(vertex, self._fills.key(vertex)) for vertex in islice(self._fills, amount)]
 
     def get_mindegrees(self) -> List[any]:
         """ Get all vertices with the minimum degree """
         assert self.nb_degrees() > 0
         _, mindegree = self._degrees.peekitem(0)
-        endIndex = len(self._degrees)
-        for index, degree in enumerate(self._degrees.values()):
-            if degree != mindegree:
-                endIndex = index
-                break
-        return list(self._degrees.keys())[:endIndex]
+        return list(self._degrees.irange_key(mindegree, mindegree))
 
     def get_lowest_future_minfill(self, vertices) -> List[any]:
         """ Get the subset of vertices which, when removed, result in the lowest next minfill. """
@@ -155,35 +333,56 @@ class PrimalGraph:
         lowest_minfill = math.inf
         lowest_minfill_vertices = []
         for vertex in vertices:
-            neighbors = self.connected_to[vertex]
-
-            # Backup
-            connected_to_partial_backup = {neighbor: self.connected_to[neighbor].copy() for neighbor in neighbors}
-            connected_to_partial_backup[vertex] = neighbors
-            fills_partial_backup = {neighbor: self._fills[neighbor] for neighbor in neighbors}
-            fills_partial_backup[vertex] = self._fills[vertex]
-
-            # Compute
+            mark = self.checkpoint()
             self.remove_and_process_node(vertex)
-            _, (new_minfill, _) = self._fills.peekitem(0)
+            new_minfill = self._get_min_fill()
+            self.rollback(mark)
+            # The rollback restores the fills in reverse order, reinsert them neighbors first and vertex last. This
+            # keeps the order of the vertices with equal fills (and thus the selected vertices) unchanged.
+            for restored in [*self.connected_to[vertex], vertex]:
+                self._set(self._fills, restored, self._fills[restored])
+
             if new_minfill < lowest_minfill:
                 lowest_minfill = new_minfill
                 lowest_minfill_vertices = [vertex]
             elif new_minfill == lowest_minfill:
                 lowest_minfill_vertices.append(vertex)
 
-            # Restore
-            self.connected_to.update(connected_to_partial_backup)
-            self._fills.update(fills_partial_backup)
-
         return lowest_minfill_vertices
 
 
+# The class used by create_interaction_graph_from_literals, e.g. PrimalGraph or int_primal.IntPrimalGraph.
+env_primal_backend = ContextVar('env_primal_backend', default=PrimalGraph)
+
+
+@contextmanager
+def use_primal_backend(backend):
+    """
+    Construct the primal graphs of create_interaction_graph_from_literals using backend within this context. Backends
+    can break ties between vertices with equal fills or degrees differently (see int_primal), so the orderings (and
+    vtrees) of the heuristics can differ between backends.
+    """
+    token = env_primal_backend.set(backend)
+    try:
+        yield backend
+    finally:
+        env_primal_backend.reset(token)
+
+
 def create_interaction_graph_from_literals(vertices: Iterable[any],
                                            co_occurrences: Iterable[Set[any]],
                                            compute_fills: bool,
-                                           compute_degrees: bool) -> PrimalGraph:
-    primal = PrimalGraph(vertices, compute_fills=compute_fills, compute_degrees=compute_degrees)
+                                           compute_degrees: bool,
+                                           backend=None,
+                                           **options) -> PrimalGraph:
+    """
+    Create a primal graph over vertices, connecting the vertices that co-occur.
+    :param backend: The primal graph class to use (PrimalGraph interface). If None, env_primal_backend is used.
+    :param options: Additional options passed to the backend (e.g. incremental=True for PrimalGraph).
+    """
+    if backend is None:
+        backend = env_primal_backend.get()
+    primal = backend(vertices, compute_fills=compute_fills, compute_degrees=compute_degrees, **options)
     for co_occurrence_set in co_occurrences:
         primal.add_edges(co_occurrence_set)
     return primal
@@ -0,0 +1,181 @@
+"""
+treedepth.py - Contains a vtree heuristic that minimizes the depth of the integration tree (tree-depth) by recursive
+separator decomposition of the primal graph. The variables of a separator form a line on top of the integration trees
+of the components that remain after removing the separator. Small components are decomposed exactly, large components
+are split by a breadth-first-search level separator.
+"""
+import math
+from typing import List, Dict, Tuple, Optional
+
+from pywmi.engines.xsdd.literals import LiteralInfo
+from pywmi.engines.xsdd.vtrees.vtree import Vtree, balanced
+
+from .int_primal import popcount, iter_bits
+from .int_tree import IntTree, IntTreeVar, IntTreeLine, IntTreeSplit, IntTreeParallel
+from .primal import PrimalGraph, create_interaction_graph_from_literals
+from .topdown_mincut import conversion_tables
+
+
+class TreeDepthDecomposition:
+    """
+    Decomposes a primal graph into an integration tree of low depth. Each connected component is given a separator,
+    eliminated last (a line), while the components that remain after removing the separator are decomposed recursively.
+    Components of at most exact_size vertices are decomposed optimally (single vertex separators, memoized).
+    """
+
+    def __init__(self, primal: PrimalGraph, exact_size=16):
+        """
+        :param primal: The primal graph (interactions) to decompose. It is not modified.
+        :param exact_size: The maximum amount of vertices of a component to decompose optimally.
+        """
+        self.vertices: List[any] = list(primal.connected_to)
+        index = {vertex: i for i, vertex in enumerate(self.vertices)}
+        self._adjacency: List[int] = [sum(1 << index[neighbor] for neighbor in primal.connected_to[vertex])
+                                      for vertex in self.vertices]
+        self.exact_size = exact_size
+        self._memo: Dict[int, Tuple[int, Optional[int]]] = dict()  # component -> (tree-depth, root)
+
+    def get_int_tree(self) -> Optional[IntTree]:
+        """ Get an integration tree of low depth covering all vertices of the primal graph. """
+        trees = [self._decompose(component) for component in self._components((1 << len(self.vertices)) - 1)]
+        self._memo = dict()
+        if len(trees) == 0:
+            return None
+        elif len(trees) == 1:
+            return trees[0]
+        elif len(trees) == 2:
+            return IntTreeSplit(None, trees[0], trees[1])
+        else:
+            return IntTreeParallel(None, trees)
+
+    def _decompose(self, component: int) -> IntTree:
+        """ The integration tree of a connected component. """
+        separator = self._get_separator(component)
+        rest = component
+        for vertex in separator:
+            rest &= ~(1 << vertex)
+        trees = [self._decompose(sub_component) for sub_component in self._components(rest)]
+
+        # Lowest separator vertex joins the trees, the others form a line on top
+        var = self.vertices[separator[-1]]
+        if len(trees) == 0:
+            int_tree = IntTreeVar(var)
+        elif len(trees) == 1:
+            int_tree = IntTreeLine(var, trees[0])
+        elif len(trees) == 2:
+            int_tree = IntTreeSplit(var, trees[0], trees[1])
+        else:
+            int_tree = IntTreeParallel(var, trees)
+        for vertex in reversed(separator[:-1]):
+            int_tree = IntTreeLine(self.vertices[vertex], int_tree)
+        return int_tree
+
+    def _get_separator(self, component: int) -> List[int]:
+        """ The separator of a connected component, from the last to the first eliminated vertex. """
+        if popcount(component) <= self.exact_size:
+            _, root = self._exact_depth(component)
+            return [root]
+        return self._level_separator(component)
+
+    def _exact_depth(self, component: int) -> Tuple[int, Optional[int]]:
+        """ The tree-depth of a connected component and a root vertex achieving it. """
+        size = popcount(component)
+        if size == 1:
+            return 1, component.bit_length() - 1
+        result = self._memo.get(component)
+        if result is not None:
+            return result
+
+        # The tree-depth of a path of n vertices is ceil(log2(n + 1)), and the component contains a shortest path
+        # through all breadth-first-search levels
+        start = self._bfs_levels(component, component & -component)[-1]
+        lower_bound = math.ceil(math.log2(len(self._bfs_levels(component, start & -start)) + 1))
+        best_depth, best_root = size + 1, None
+        # Vertices of high degree separate the most, try those first
+        candidates = sorted(iter_bits(component), key=lambda v: -popcount(self._adjacency[v] & component))
+        for root in candidates:
+            depth = 1
+            for sub_component in self._components(component & ~(1 << root)):
+                depth = max(depth, 1 + self._exact_depth(sub_component)[0])
+                if depth >= best_depth:
+                    break
+            if depth < best_depth:
+                best_depth, best_root = depth, root
+                if best_depth <= lower_bound:
+                    break
+        self._memo[component] = best_depth, best_root
+        return best_depth, best_root
+
+    def _level_separator(self, component: int) -> List[int]:
+        """
+        A separator of a large connected component: the breadth-first-search level (from a pseudo-peripheral vertex)
+        that best balances the vertices below and above it, preferring small levels. Vertices of the level without
+        neighbors above it are moved below. The separator is sorted by decreasing degree.
+        """
+        start = self._bfs_levels(component, component & -component)[-1]
+        levels = self._bfs_levels(component, start & -start)
+        size = popcount(component)
+
+        best_score, best_separator = None, None
+        below = 0
+        for index, level in enumerate(levels):
+            above = size - below - popcount(level)
+            larger_side = max(below, above)
+            score = (larger_side > 2 * size / 3, popcount(level) if larger_side <= 2 * size / 3 else larger_side)
+            if best_score is None or score < best_score:
+                above_vertices = component & ~level
+                for lower_level in levels[:index]:
+                    above_vertices &= ~lower_level
+                separator = 0
+                for vertex in iter_bits(level):
+                    if self._adjacency[vertex] & above_vertices:
+                        separator |= 1 << vertex
+                best_score, best_separator = score, separator if separator else level
+            below += popcount(level)
+        return sorted(iter_bits(best_separator), key=lambda v: -popcount(self._adjacency[v] & component))
+
+    def _bfs_levels(self, component: int, start: int) -> List[int]:
+        """ The breadth-first-search levels (bitsets) of component starting from the vertices in start. """
+        levels = []
+        visited = start
+        frontier = start
+        while frontier:
+            levels.append(frontier)
+            reached = 0
+            for vertex in iter_bits(frontier):
+                reached |= self._adjacency[vertex]
+            frontier = reached & component & ~visited
+            visited |= frontier
+        return levels
+
+    def _components(self, vertices: int) -> List[int]:
+        """ The connected components (bitsets) of the subgraph induced by the given vertices. """
+        components = []
+        while vertices:
+            component = vertices & -vertices
+            frontier = component
+            while frontier:
+                reached = 0
+                for vertex in iter_bits(frontier):
+                    reached |= self._adjacency[vertex]
+                frontier = reached & vertices & ~component
+                component |= frontier
+            components.append(component)
+            vertices &= ~component
+        return components
+
+
+def topdown_min_depth(literals: LiteralInfo, exact_size=16) -> Vtree:
+    """
+    Create a vtree by minimizing the depth of the integration tree, using recursive separator decomposition.
+    :param literals: The context to create a vtree for.
+    :param exact_size: Components of at most this amount of continuous variables are decomposed optimally.
+    :return: A vtree based on a minimal depth integration tree.
+    """
+    logic2cont, cont2logic = conversion_tables(literals)
+    primal = create_interaction_graph_from_literals(cont2logic.keys(), logic2cont.values(), False, False)
+    int_tree = TreeDepthDecomposition(primal, exact_size).get_int_tree()
+    if int_tree is not None:
+        return int_tree.create_vtree(set(logic2cont.keys()), logic2cont)
+    else:
+        return balanced(literals)
@@ -0,0 +1,237 @@
+"""
+vtree_cache.py - Contains a cache of vtrees keyed by a canonical form of the literal structure (the hypergraph of
+literals and their continuous variables, see conversion_tables). Problems that only differ in their weights, or in the
+names of their variables, share the same canonical form and therefore the same vtree. The cache keeps the most
+recently used vtrees in memory and can be backed by a file (shelve) to reuse vtrees across runs.
+"""
+import hashlib
+import shelve
+from collections import OrderedDict
+from typing import List, Tuple, Dict, Optional, Callable, Set
+
+from pywmi.engines.xsdd.literals import LiteralInfo
+from pywmi.engines.xsdd.vtrees.vtree import Vtree, VtreeSplit, VtreeVar
+
+from .topdown_mincut import conversion_tables
+
+# (amount of literals, amount of continuous variables, edges (literal, continuous variable)) in canonical numbering
+CanonicalForm = Tuple[int, int, Tuple[Tuple[int, int], ...]]
+
+
+def _refine(colors: List[int], neighbors: List[List[int]]) -> List[int]:
+    """ Color refinement: split colors by the multiset of neighbor colors until stable. Colors are kept invariant. """
+    nb_colors = len(set(colors))
+    while True:
+        signatures = [(colors[v], tuple(sorted(colors[n] for n in neighbors[v]))) for v in range(len(colors))]
+        numbering = {signature: i for i, signature in enumerate(sorted(set(signatures)))}
+        colors = [numbering[signature] for signature in signatures]
+        if len(numbering) == nb_colors:
+            return colors
+        nb_colors = len(numbering)
+
+
+def _individualize(colors: List[int], vertex: int, neighbors: List[List[int]]) -> List[int]:
+    """ Give vertex a color of its own (lower than the rest of its color class) and refine. """
+    target = colors[vertex]
+    return _refine([2 * color + int(color == target and v != vertex) for v, color in enumerate(colors)], neighbors)
+
+
+def _target_cell(colors: List[int]) -> List[int]:
+    """ The vertices of the smallest non-singleton color class (the lowest color among those), empty if discrete. """
+    class_sizes = dict()
+    for color in colors:
+        class_sizes[color] = class_sizes.get(color, 0) + 1
+    candidates = [(size, color) for color, size in class_sizes.items() if size > 1]
+    if len(candidates) == 0:
+        return []
+    target = min(candidates)[1]
+    return [v for v, color in enumerate(colors) if color == target]
+
+
+def _orbit_closure(vertices: List[int], automorphisms: List[List[int]]) -> Set[int]:
+    """ The union of the orbits of vertices under the group generated by automorphisms. """
+    closure = set(vertices)
+    todo = list(vertices)
+    while todo:
+        vertex = todo.pop()
+        for automorphism in automorphisms:
+            image = automorphism[vertex]
+            if image not in closure:
+                closure.add(image)
+                todo.append(image)
+    return closure
+
+
+def canonical_form(logic2cont: Dict[any, set]) -> Tuple[CanonicalForm, List[any], List[any]]:
+    """
+    Compute a canonical form of the hypergraph of literals and continuous variables by individualization-refinement:
+    a depth first search that individualizes each vertex of the smallest non-singleton color class in turn (and
+    refines the colors) until the coloring is discrete. Each discrete coloring numbers the vertices, the canonical form
+    is the smallest resulting hypergraph. Branches that are mapped onto explored branches by the automorphisms found
+    along the way (leaves with equal forms) are pruned. Two hypergraphs have the same canonical form if and only if
+    they are isomorphic.
+    :param logic2cont: A mapping from literals to their set of continuous variables.
+    :return: The canonical form, the literals in canonical order and the continuous variables in canonical order.
+    """
+    literals = list(logic2cont.keys())
+    cont_vars = list(dict.fromkeys(cvar for cvars in logic2cont.values() for cvar in cvars))
+    nb_literals = len(literals)
+    index = {cvar: nb_literals + i for i, cvar in enumerate(cont_vars)}
+    neighbors = [[index[cvar] for cvar in logic2cont[lit]] for lit in literals] + [[] for _ in cont_vars]
+    for i, lit in enumerate(literals):
+        for n in neighbors[i]:
+            neighbors[n].append(i)
+
+    def certificate(colors: List[int]) -> CanonicalForm:
+        literal_position = {v: colors[v] for v in range(nb_literals)}  # literals have the lowest colors
+        cont_position = {v: colors[v] - nb_literals for v in range(nb_literals, len(neighbors))}
+        edges = tuple(sorted((literal_position[v], cont_position[n]) for v in range(nb_literals) for n in neighbors[v]))
+        return nb_literals, len(cont_vars), edges
+
+    best_form, best_colors, best_path = None, None, None
+    automorphisms: List[List[int]] = []
+    root = _refine([int(v >= nb_literals) for v in range(len(neighbors))], neighbors)
+    # Search tree nodes: (colors, individualized vertices, target cell, explored vertices of the cell)
+    stack = [(root, (), _target_cell(root), [])]
+    while len(stack) > 0:
+        colors, path, cell, explored = stack[-1]
+        if len(cell) == 0:  # discrete
+            stack.pop()
+            form = certificate(colors)
+            if best_form is None or form < best_form:
+                best_form, best_colors, best_path = form, colors, path
+            elif form == best_form:
+                # vertex of best_colors -> vertex with the same color, which fixes their common path
+                vertex_of_color = {color: v for v, color in enumerate(colors)}
+                automorphisms.append([vertex_of_color[color] for color in best_colors])
+                # The current branch of the deepest common ancestor is mapped onto its explored branch of best
+                common = 0
+                while common < min(len(path), len(best_path)) and path[common] == best_path[common]:
+                    common += 1
+                del stack[common + 1:]
+            continue
+
+        stabilizer = [automorphism for automorphism in automorphisms if all(automorphism[v] == v for v in path)]
+        pruned = _orbit_closure(explored, stabilizer)
+        vertex = next((v for v in cell if v not in pruned), None)
+        if vertex is None:
+            stack.pop()
+        else:
+            explored.append(vertex)
+            child = _individualize(colors, vertex, neighbors)
+            stack.append((child, path + (vertex,), _target_cell(child), []))
+
+    literal_order = sorted(range(nb_literals), key=lambda v: best_colors[v])
+    cont_order = sorted(range(nb_literals, len(neighbors)), key=lambda v: best_colors[v])
+    return best_form, [literals[v] for v in literal_order], [cont_vars[v - nb_literals] for v in cont_order]
+
+
+def fingerprint(form: CanonicalForm) -> str:
+    """ A hash of a canonical form, used as key of the cache. """
+    return hashlib.sha1(repr(form).encode()).hexdigest()
+
+
+def _encode_vtree(vtree: Vtree, position: Dict[any, int]):
+    """ Convert a vtree into nested tuples of canonical literal positions. """
+    if isinstance(vtree, VtreeVar):
+        return position[vtree.var]
+    else:
+        assert isinstance(vtree, VtreeSplit)
+        return _encode_vtree(vtree.primes, position), _encode_vtree(vtree.subs, position)
+
+
+def _decode_vtree(encoded, literals: List[any]) -> Vtree:
+    """ Convert nested tuples of canonical literal positions into a vtree over the given literals. """
+    if isinstance(encoded, tuple):
+        return VtreeSplit(_decode_vtree(encoded[0], literals), _decode_vtree(encoded[1], literals))
+    else:
+        return VtreeVar(literals[encoded])
+
+
+class VtreeCache:
+    """
+    A least recently used cache of vtrees, keyed by the name of the strategy and the canonical form of the literals.
+    Vtrees are stored in terms of canonical literal positions so they can be relabeled to any isomorphic problem.
+    """
+
+    def __init__(self, maxsize=128, filename: Optional[str] = None):
+        """
+        :param maxsize: The maximum amount of vtrees kept in memory.
+        :param filename: If given, the file of a shelve in which all vtrees are stored as well (persistent).
+        """
+        self.maxsize = maxsize
+        self.filename = filename
+        self._entries: OrderedDict = OrderedDict()  # key -> (canonical form, encoded vtree)
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, key: str, form: CanonicalForm):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        elif self.filename is not None:
+            with shelve.open(self.filename, 'c') as shelf:
+                entry = shelf.get(key)
+            if entry is not None:
+                self._store_memory(key, entry)
+        if entry is not None and entry[0] == form:
+            return entry[1]
+        return None
+
+    def _store_memory(self, key: str, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _store(self, key: str, entry):
+        self._store_memory(key, entry)
+        if self.filename is not None:
+            with shelve.open(self.filename, 'c') as shelf:
+                shelf[key] = entry
+
+    def get_vtree(self, literals: LiteralInfo, strategy: Callable[[LiteralInfo], Vtree], name: str) -> Vtree:
+        """
+        Get the vtree of strategy for the given literals, computing and storing it if it is not yet cached.
+        :param literals: The context to create a vtree for.
+        :param strategy: The vtree strategy to use on a miss.
+        :param name: The name of the strategy, part of the key. Strategies with a different behaviour (e.g. another
+            seed) must have a different name.
+        """
+        logic2cont, _ = conversion_tables(literals)
+        form, literal_order, _ = canonical_form(logic2cont)
+        key = f"{name}:{fingerprint(form)}"
+        encoded = self._lookup(key, form)
+        if encoded is not None:
+            self.hits += 1
+            return _decode_vtree(encoded, literal_order)
+
+        self.misses += 1
+        vtree = strategy(literals)
+        position = {lit: i for i, lit in enumerate(literal_order)}
+        self._store(key, (form, _encode_vtree(vtree, position)))
+        return vtree
+
+    def clear(self):
+        """ Clear the in-memory vtrees (the backing file is kept). """
+        self._entries.clear()
+
+
+def cached(strategy, cache: Optional[VtreeCache] = None, name: Optional[str] = None):
+    """
+    Wrap a vtree strategy such that vtrees are reused for problems with the same literal structure.
+    :param strategy: The vtree strategy to wrap.
+    :param cache: The cache to use. If None, a new in-memory cache is created.
+    :param name: The name of the strategy in the cache, the name of the strategy function by default.
+    :return: A vtree strategy.
+    """
+    if cache is None:
+        cache = VtreeCache()
+    if name is None:
+        name = strategy.__name__
+
+    def cached_strat(literals: LiteralInfo, __strat=strategy, __cache=cache, __name=name):
+        return __cache.get_vtree(literals, __strat, __name)
+    cached_strat.__name__ = name
+    cached_strat.cache = cache
+    return cached_strat
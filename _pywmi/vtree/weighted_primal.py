@@ -0,0 +1,66 @@
+"""
+weighted_primal.py - A primal graph in which the continuous variables have a weight, the cost of integrating them.
+The fill and degree of a vertex are weighted: min-fill prefers eliminations whose fill edges connect cheap variables
+and min-degree prefers eliminations with a cheap integrand (the vertex and its neighbors). Use it as backend of
+create_interaction_graph_from_literals.
+"""
+from typing import Dict, Iterable
+
+from .primal import PrimalGraph
+
+
+def literal_multiplicity(logic2cont, cont2logic) -> Dict[any, float]:
+    """ Weigh each continuous variable by the amount of literals it occurs in (see conversion_tables). """
+    return {cvar: float(len(lits)) for cvar, lits in cont2logic.items()}
+
+
+class WeightedPrimalGraph(PrimalGraph):
+    """
+    A primal graph with weighted fills and degrees. A fill edge between a and b costs weight(a) * weight(b), the
+    weighted degree of a vertex is its weight plus the weights of its neighbors (the variables of the integrand when
+    integrating the vertex). Only supports the default (non-incremental, non-lazy) fill computation. The weighted fills
+    and degrees are floats, so they can not be kept in a BucketQueue.
+    """
+
+    def __init__(self, vertices: Iterable[any], compute_fills=True, compute_degrees=True, weights: Dict = None,
+                 default_weight=1.0, **options):
+        """
+        :param weights: The weight of each vertex, vertices without weight get default_weight.
+        See PrimalGraph for the other parameters.
+        """
+        assert not options.get('bucket_queue', False), "Weighted fills and degrees do not fit in a BucketQueue"
+        super().__init__(vertices, compute_fills, compute_degrees, **options)
+        assert not compute_fills or self._store_fill_edges, "Weighted fills require the default fill computation"
+        self.weights = weights if weights is not None else dict()
+        self.default_weight = default_weight
+
+    def weight(self, vertex) -> float:
+        return self.weights.get(vertex, self.default_weight)
+
+    def compute_fills(self, of_nodes=None):
+        """ Compute the weighted fill (the weight of the missing edges among the neighbors) of each vertex. """
+        assert self._fills is not None
+        if of_nodes is None:
+            of_nodes = self.connected_to.keys()
+
+        for vertex in of_nodes:
+            connections = self.connected_to.get(vertex)
+            fill = 0.0
+            edges = []
+            for connected_vertex in connections:
+                unconnected = connections - self.connected_to[connected_vertex]
+                unconnected.discard(connected_vertex)
+                if len(unconnected) > 0:
+                    fill += self.weight(connected_vertex) * sum(self.weight(target) for target in unconnected)
+                    edges.append((connected_vertex, unconnected))
+            self._set(self._fills, vertex, (fill, edges))
+
+    def compute_degrees(self, of_nodes=None):
+        """ Compute the weighted degree (its weight plus the weights of its neighbors) of each vertex. """
+        assert self._degrees is not None
+        if of_nodes is None:
+            of_nodes = self.connected_to.keys()
+
+        for vertex in of_nodes:
+            degree = self.weight(vertex) + sum(self.weight(neighbor) for neighbor in self.connected_to[vertex])
+            self._set(self._degrees, vertex, degree)
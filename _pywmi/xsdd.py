@@ -9,8 +9,8 @@ from pywmi.engines.xsdd import FactorizedXsddEngine as FXSDD
 from pywmi.engines.xsdd.engine_factorized import FactorizedIntegrator
 from pywmi.engines.xsdd.draw import sdd_to_dot, SddToDot, walk
 
+from _pywmi.vtree.elimination_width import OrderEvaluator
 from _pywmi.vtree.int_tree import vtree_to_int_tree
-from _pywmi.vtree.primal import create_interaction_graph_from_literals
 from _pywmi.vtree.topdown_mincut import conversion_tables
 
 
@@ -109,8 +109,7 @@ class MeasuredFXSDD(FXSDD):
         int_tree = vtree_to_int_tree(vtree, logic2cont)
         self._results['int_tree'] = int_tree
         self._results['depth'] = int_tree.depth()
-        primal = create_interaction_graph_from_literals(cont2logic.keys(), logic2cont.values(), True, False)
-        self._results['width'] = int_tree.get_induced_width(primal)
+        self._results['width'] = int_tree.get_induced_width(OrderEvaluator(cont2logic.keys(), logic2cont.values()))
 
         return sdd
     
@@ -0,0 +1,32 @@
+from _pywmi.vtree.primal import PrimalGraph
+
+
+def random_edges(rng, nb_vertices, density=0.3):
+    """ The edges (a, b) of a random graph over range(nb_vertices), each pair is an edge with probability density. """
+    return [(a, b) for a in range(nb_vertices) for b in range(a + 1, nb_vertices) if rng.random() < density]
+
+
+def create_graph(nb_vertices, edges, backend=PrimalGraph, compute_fills=False, compute_degrees=False, **options):
+    """
+    Create a primal graph over range(nb_vertices).
+    :param nb_vertices: The amount of vertices.
+    :param edges: The edges (a, b) of the graph.
+    :param backend: The primal graph class (PrimalGraph, IntPrimalGraph or WeightedPrimalGraph).
+    :param compute_fills: Whether to compute the fills (after adding the edges).
+    :param compute_degrees: Whether to compute the degrees (after adding the edges).
+    :param options: The other options of the backend, e.g. incremental or weights.
+    :return: The primal graph.
+    """
+    primal = backend(range(nb_vertices), compute_fills=compute_fills, compute_degrees=compute_degrees, **options)
+    for a, b in edges:
+        primal.add_edge(a, b)
+    if compute_fills:
+        primal.compute_fills()
+    if compute_degrees:
+        primal.compute_degrees()
+    return primal
+
+
+def random_graph(rng, nb_vertices, density=0.3, backend=PrimalGraph, **options):
+    """ Create a random primal graph over range(nb_vertices) (see random_edges and create_graph for the options). """
+    return create_graph(nb_vertices, random_edges(rng, nb_vertices, density), backend, **options)
@@ -0,0 +1,66 @@
+import random
+
+import pytest
+from sortedcollections import ValueSortedDict
+
+from _pywmi.vtree.bucket_queue import BucketQueue
+from _pywmi.vtree.primal import PrimalGraph
+
+
+def test_same_as_value_sorted_dict():
+    rng = random.Random(0)
+    queue, reference = BucketQueue(), ValueSortedDict()
+    for _ in range(3000):
+        key = rng.randint(0, 30)
+        operation = rng.random()
+        if operation < 0.6:
+            value = rng.randint(0, 12)
+            queue[key] = value
+            reference[key] = value
+        elif operation < 0.8:
+            assert queue.pop(key, None) == reference.pop(key, None)
+        elif len(reference) > 0:
+            assert queue.peekitem(0) == reference.peekitem(0)
+            low, high = sorted((rng.randint(0, 12), rng.randint(0, 12)))
+            assert list(queue.irange_key(low, high)) == list(reference.irange_key(low, high))
+        assert list(queue) == list(reference)
+        assert len(queue) == len(reference)
+        assert all(queue.key(key) == reference[key] for key in reference)
+
+
+def test_priority_function():
+    queue = BucketQueue(priority=lambda value: value[0])
+    queue.update({"a": (2, "edges"), "b": (0, "edges"), "c": (2, "edges")})
+    assert queue.peekitem() == ("b", (0, "edges"))
+    assert queue.key("a") == 2
+    assert list(queue) == ["b", "a", "c"]
+    with pytest.raises(KeyError):
+        queue.pop("d")
+
+
+@pytest.mark.parametrize("compute_fills", [True, False])
+def test_primal_graph_same_selection(compute_fills):
+    rng = random.Random(1)
+    for _ in range(50):
+        nb_vertices = rng.randint(2, 14)
+        edges = [(a, b) for a in range(nb_vertices) for b in range(a + 1, nb_vertices) if rng.random() < 0.3]
+        graphs = []
+        for bucket_queue in (False, True):
+            primal = PrimalGraph(range(nb_vertices), compute_fills, not compute_fills, bucket_queue=bucket_queue)
+            for a, b in edges:
+                primal.add_edge(a, b)
+            if compute_fills:
+                primal.compute_fills()
+            else:
+                primal.compute_degrees()
+            graphs.append(primal)
+        default, bucket = graphs
+        while (default.nb_fills() if compute_fills else default.nb_degrees()) > 0:
+            if compute_fills:
+                candidates = default.get_minfills()
+                assert bucket.get_minfills() == candidates
+            else:
+                candidates = default.get_mindegrees()
+                assert bucket.get_mindegrees() == candidates
+            for primal in graphs:
+                primal.remove_and_process_node(candidates[0])
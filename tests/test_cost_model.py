@@ -0,0 +1,115 @@
+import random
+from collections import defaultdict
+
+import numpy as np
+from pywmi.engines.xsdd.vtrees.vtree import VtreeVar, VtreeSplit
+
+from _pywmi.vtree import cost_model
+from _pywmi.vtree.cost_model import CostFeatures, CostModel, extract_features, integration_time, cheapest_of
+from _pywmi.vtree.elimination_width import OrderEvaluator
+from _pywmi.vtree.int_tree import IntTreeFactory
+from _pywmi.vtree.primal import create_interaction_graph_from_literals
+
+
+def random_int_tree(rng):
+    nb_vars = rng.randint(1, 10)
+    logic2cont = {f"l{i}": set(rng.sample(range(nb_vars), rng.randint(1, min(3, nb_vars))))
+                  for i in range(rng.randint(1, 12))}
+    cont_vars = sorted({var for cont_vars in logic2cont.values() for var in cont_vars})
+    primal = create_interaction_graph_from_literals(cont_vars, logic2cont.values(), False, False)
+    int_factory = IntTreeFactory(primal)
+    for var in rng.sample(cont_vars, len(cont_vars)):
+        int_factory.add_node(var)
+        primal.remove_and_process_node(var)
+    return int_factory.get_int_tree(), logic2cont
+
+
+def brute_force_features(int_tree, logic2cont):
+    bound, crossing = [], []
+    for node in int_tree:
+        below = node.get_con_vars()
+        bound.append(sum(1 for cont_vars in logic2cont.values() if cont_vars & below))
+        crossing.append(sum(1 for cont_vars in logic2cont.values() if cont_vars & below and cont_vars - below))
+    cont_vars = {var for cont_vars in logic2cont.values() for var in cont_vars}
+    width = OrderEvaluator(cont_vars, logic2cont.values()).width(int_tree.get_elimination_order())
+    return CostFeatures(width, int_tree.depth(), max(bound), sum(bound), max(crossing), sum(crossing))
+
+
+def test_extract_features():
+    rng = random.Random(0)
+    for _ in range(200):
+        int_tree, logic2cont = random_int_tree(rng)
+        assert extract_features(int_tree, logic2cont) == brute_force_features(int_tree, logic2cont)
+
+
+def test_fit_recovers_weights():
+    rng = random.Random(1)
+    weights = [-3.0, 0.8, 0.2, 0.1, 0.3, 0.05, 0.4]
+    samples = []
+    for _ in range(100):
+        features = CostFeatures(*(rng.randint(0, 20) for _ in range(6)))
+        samples.append((features, CostModel(weights).predict_features(features)))
+    model = CostModel.fit(samples, ridge=1e-9, min_time=1e-12)
+    assert np.allclose(model.weights, weights, atol=1e-4)
+
+
+def test_default_model_prefers_lower_width():
+    model = CostModel()
+    narrow, wide = CostFeatures(2, 5, 3, 10, 2, 5), CostFeatures(3, 5, 3, 10, 2, 5)
+    assert model.predict_features(narrow) < model.predict_features(wide)
+
+
+def tables(logic2cont):
+    """ conversion_tables for test problems, which are given as logic2cont. """
+    cont2logic = defaultdict(set)
+    for lit, cont_vars in logic2cont.items():
+        for var in cont_vars:
+            cont2logic[var].add(lit)
+    return logic2cont, cont2logic
+
+
+class FakeEngine:
+    """ The measurements of a MeasuredFXSDD after compute_volume. """
+    def __init__(self, times, literals, int_tree):
+        self._times = times
+        self._results = {'literals': literals, 'int_tree': int_tree}
+
+
+def test_integration_time():
+    # compute_volume recursed: the outer call includes the inner one
+    assert integration_time({'compute_volume': [3.0, 5.0], 'get_vtree': [0.5], 'get_sdd': [0.25, 0.25]}) == 4.0
+    assert integration_time({'compute_volume': [1.0], 'get_vtree': [0.75], 'get_sdd': [0.5]}) == 0.0
+
+
+def test_fit_on_samples(monkeypatch):
+    monkeypatch.setattr(cost_model, "conversion_tables", tables)
+    rng = random.Random(2)
+    weights = [-6.0, 0.5, 0.1, 0.2, 0.1, 0.3, 0.05]
+    engines = []
+    for _ in range(100):
+        int_tree, logic2cont = random_int_tree(rng)
+        time = CostModel(weights).predict(int_tree, logic2cont)
+        engines.append(FakeEngine({'compute_volume': [time + 0.5], 'get_vtree': [0.2], 'get_sdd': [0.3]},
+                                  logic2cont, int_tree))
+    samples = [CostModel.sample(engine) for engine in engines]
+    for (features, _), engine in zip(samples, engines):
+        assert features == extract_features(engine._results['int_tree'], engine._results['literals'])
+    model = CostModel.fit(samples, ridge=1e-9, min_time=1e-12)
+    assert np.allclose([model.predict_features(features) for features, _ in samples],
+                       [time for _, time in samples], rtol=1e-4)
+
+
+def test_cheapest_of(monkeypatch):
+    monkeypatch.setattr(cost_model, "conversion_tables", tables)
+    logic2cont = {"a": {"x"}, "b": {"x", "y"}, "c": {"y", "z"}, "d": {"z"}}
+    chain = VtreeSplit(VtreeSplit(VtreeVar("a"), VtreeVar("b")), VtreeSplit(VtreeVar("c"), VtreeVar("d")))
+    crossed = VtreeSplit(VtreeSplit(VtreeVar("a"), VtreeVar("d")), VtreeSplit(VtreeVar("b"), VtreeVar("c")))
+    model = CostModel()
+    assert model.predict_vtree(chain, logic2cont) < model.predict_vtree(crossed, logic2cont)
+
+    def strategy(vtree):
+        return lambda literals: vtree
+    assert cheapest_of([strategy(crossed), strategy(chain)], model)(logic2cont) is chain
+    assert cheapest_of([strategy(chain), strategy(crossed)], model)(logic2cont) is chain
+    copy = VtreeSplit(VtreeSplit(VtreeVar("a"), VtreeVar("b")), VtreeSplit(VtreeVar("c"), VtreeVar("d")))
+    assert cheapest_of([strategy(copy), strategy(chain)], model)(logic2cont) is copy
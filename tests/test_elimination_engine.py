@@ -0,0 +1,51 @@
+import random
+
+from _pywmi.vtree.elimination_engine import pseudo_tree, structure_id
+from _pywmi.vtree.int_tree import IntTreeVar, IntTreeLine, IntTreeSplit, IntTreeParallel
+from _pywmi.vtree.primal import PrimalGraph
+
+
+def ancestors(int_tree):
+    """ The variables above each variable of int_tree. """
+    result = dict()
+    stack = [(int_tree, frozenset())]
+    while len(stack) > 0:
+        node, above = stack.pop()
+        if node.var is not None:
+            assert node.var not in result
+            result[node.var] = above
+            above = above | {node.var}
+        stack.extend((child, above) for child in node.get_children())
+    return result
+
+
+def test_pseudo_tree_contains_induced_edges():
+    rng = random.Random(0)
+    for _ in range(200):
+        nb_vertices = rng.randint(1, 14)
+        primal = PrimalGraph(range(nb_vertices), compute_fills=False, compute_degrees=False)
+        for a in range(nb_vertices):
+            for b in range(a + 1, nb_vertices):
+                if rng.random() < 0.25:
+                    primal.add_edge(a, b)
+        order = rng.sample(range(nb_vertices), nb_vertices)
+        neighbor_sets = []
+        for vertex in order:
+            neighbor_sets.append(set(primal.connected_to[vertex]))
+            primal.remove_and_process_node(vertex)
+
+        above = ancestors(pseudo_tree(order, neighbor_sets))
+        assert set(above) == set(order)
+        for vertex, neighbors in zip(order, neighbor_sets):
+            assert neighbors <= above[vertex]
+
+
+def test_structure_id():
+    structures = dict()
+    first = IntTreeSplit("s", IntTreeVar("a"), IntTreeLine("l", IntTreeVar("b")))
+    swapped = IntTreeSplit("s", IntTreeLine("l", IntTreeVar("b")), IntTreeVar("a"))
+    other = IntTreeSplit("s", IntTreeVar("b"), IntTreeLine("l", IntTreeVar("a")))
+    parallel = IntTreeParallel("s", [IntTreeVar("a"), IntTreeLine("l", IntTreeVar("b"))])
+    assert structure_id(first, structures) == structure_id(swapped, structures)
+    assert structure_id(first, structures) != structure_id(other, structures)
+    assert structure_id(first, structures) != structure_id(parallel, structures)
@@ -0,0 +1,38 @@
+import random
+
+from _pywmi.vtree.elimination_width import OrderEvaluator
+from _pywmi.vtree.int_tree import IntTreeFactory
+
+from conftest import create_graph
+
+
+def test_same_as_elimination():
+    rng = random.Random(0)
+    for _ in range(200):
+        nb_vertices = rng.randint(1, 14)
+        edges = [(a, b) for a in range(nb_vertices) for b in range(a + 1, nb_vertices) if rng.random() < 0.3]
+        order = rng.sample(range(nb_vertices), nb_vertices)
+        primal = create_graph(nb_vertices, edges)
+        evaluator = OrderEvaluator.from_primal(primal)
+        assert {vertex: set(neighbors) for vertex, neighbors in primal.connected_to.items()} == \
+            {vertex: set(neighbors) for vertex, neighbors in create_graph(nb_vertices, edges).connected_to.items()}
+
+        int_factory = IntTreeFactory(primal)
+        width = 0
+        for vertex in order:
+            width = max(width, len(primal.connected_to[vertex]))
+            int_factory.add_node(vertex)
+            primal.remove_and_process_node(vertex)
+        int_tree = int_factory.get_int_tree()
+        depth = int_tree.depth() - (1 if int_tree.var is None else 0)  # without the root joining the components
+        assert evaluator.evaluate(order) == (width, depth)
+
+
+def test_partial_order():
+    # A path 0 - 1 - 2 - 3, eliminating 1 connects 0 and 2
+    evaluator = OrderEvaluator(range(4), [{0, 1}, {1, 2}, {2, 3}])
+    assert evaluator.evaluate([1]) == (2, 1)
+    assert evaluator.evaluate([1, 0]) == (2, 2)
+    assert evaluator.width([0, 1, 2, 3]) == 1
+    assert evaluator.depth([0, 1, 2, 3]) == 4
+    assert evaluator.depth([0, 3, 1, 2]) == 3
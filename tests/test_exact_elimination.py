@@ -0,0 +1,44 @@
+import itertools
+import random
+
+from _pywmi.vtree.exact_elimination import ExactOrderingSearch
+from _pywmi.vtree.primal import PrimalGraph
+
+from conftest import random_graph
+
+
+def width_depth(primal: PrimalGraph, order):
+    """ The induced width and the depth of the integration tree of an elimination order. """
+    connected_to = {vertex: set(neighbors) for vertex, neighbors in primal.connected_to.items()}
+    pending = {vertex: 0 for vertex in connected_to}
+    width, depth = 0, 0
+    for vertex in order:
+        neighbors = connected_to.pop(vertex)
+        width, depth = max(width, len(neighbors)), max(depth, pending[vertex] + 1)
+        for neighbor in neighbors:
+            connected_to[neighbor] |= neighbors - {neighbor}
+            connected_to[neighbor].discard(vertex)
+            pending[neighbor] = max(pending[neighbor], pending[vertex] + 1)
+    return width, depth
+
+
+def test_optimal_against_brute_force():
+    rng = random.Random(0)
+    for _ in range(60):
+        primal = random_graph(rng, rng.randint(1, 7), 0.4)
+        best = min(width_depth(primal, order) for order in itertools.permutations(primal.connected_to))
+        search = ExactOrderingSearch(primal, time_budget=60.0)
+        order = search.search()
+        assert search.optimal
+        assert sorted(order) == sorted(primal.connected_to)
+        assert width_depth(primal, order) == (search.width, search.depth) == best
+
+
+def test_greedy_is_valid():
+    rng = random.Random(1)
+    for _ in range(20):
+        primal = random_graph(rng, rng.randint(1, 20), 0.4)
+        search = ExactOrderingSearch(primal)
+        order = search.greedy()
+        assert sorted(order) == sorted(primal.connected_to)
+        assert width_depth(primal, order) == (search.width, search.depth)
@@ -0,0 +1,61 @@
+import random
+
+from _pywmi.vtree.incremental_elimination import extend_order
+from _pywmi.vtree.primal import PrimalGraph
+
+from conftest import create_graph, random_graph
+
+
+def path_graph(nb_vertices, compute_fills=True) -> PrimalGraph:
+    edges = [(vertex, vertex + 1) for vertex in range(nb_vertices - 1)]
+    return create_graph(nb_vertices, edges, compute_fills=compute_fills)
+
+
+def replay(primal: PrimalGraph, eliminations):
+    """ Check that eliminations (in order) has the neighbors of each vertex at its elimination in primal. """
+    assert set(eliminations) == set(primal.connected_to)
+    for var, neighbors in eliminations.items():
+        assert primal.connected_to[var] == neighbors
+        primal.remove_and_process_node(var)
+
+
+def test_same_problem_keeps_order():
+    rng = random.Random(0)
+    for _ in range(50):
+        nb_vertices = rng.randint(2, 14)
+        seed = rng.random()
+        previous, _, width = extend_order(dict(), random_graph(random.Random(seed), nb_vertices, compute_fills=True))
+        primal = random_graph(random.Random(seed), nb_vertices, compute_fills=True)
+        eliminations, _, repaired_width = extend_order(previous, primal)
+        assert list(eliminations.items()) == list(previous.items())
+        assert repaired_width == width
+
+
+def test_extended_problem_is_repaired_locally():
+    previous, _, _ = extend_order(dict(), path_graph(20))
+    eliminations, _, width = extend_order(previous, path_graph(21))
+    replay(path_graph(21, False), eliminations)
+    assert width == 1
+    # The half of the path away from the new vertex keeps its previous eliminations, the other half is reordered
+    assert list(eliminations.items())[:10] == [(var, neighbors) for var, neighbors in previous.items() if var < 10]
+
+
+def test_random_extensions_are_valid_orders():
+    rng = random.Random(1)
+    for _ in range(50):
+        nb_vertices = rng.randint(2, 14)
+        seed = rng.random()
+        previous, _, _ = extend_order(dict(), random_graph(random.Random(seed), nb_vertices, compute_fills=True))
+        larger = random_graph(random.Random(seed), nb_vertices, compute_fills=True)
+        larger.connected_to[nb_vertices] = set()
+        for vertex in rng.sample(range(nb_vertices), rng.randint(1, nb_vertices)):
+            larger.add_edge(vertex, nb_vertices)
+        reference = {vertex: set(neighbors) for vertex, neighbors in larger.connected_to.items()}
+        eliminations, _, width = extend_order(previous, larger)
+        primal = PrimalGraph(reference, compute_fills=False, compute_degrees=False)
+        for vertex, neighbors in reference.items():
+            for neighbor in neighbors:
+                if vertex < neighbor:
+                    primal.add_edge(vertex, neighbor)
+        replay(primal, eliminations)
+        assert width == max(len(neighbors) for neighbors in eliminations.values())
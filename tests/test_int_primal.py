@@ -0,0 +1,104 @@
+import copy
+import random
+
+import pytest
+
+from _pywmi.vtree.int_primal import IntPrimalGraph, popcount, iter_bits
+from _pywmi.vtree.primal import PrimalGraph
+
+from conftest import create_graph, random_edges, random_graph
+
+
+def test_bits():
+    assert popcount(0b101101) == 4
+    assert list(iter_bits(0b101101)) == [0, 2, 3, 5]
+    assert list(iter_bits(0)) == []
+
+
+@pytest.mark.parametrize("incremental", [False, True])
+def test_same_as_primal_graph(incremental):
+    rng = random.Random(0)
+    for _ in range(100):
+        nb_vertices = rng.randint(1, 14)
+        edges = random_edges(rng, nb_vertices)
+        options = dict(compute_fills=True, compute_degrees=True, incremental=incremental)
+        primal = create_graph(nb_vertices, edges, PrimalGraph, **options)
+        int_primal = create_graph(nb_vertices, edges, IntPrimalGraph, **options)
+        while primal.nb_fills() > 0:
+            assert {vertex: set(neighbors) for vertex, neighbors in int_primal.connected_to.items()} == \
+                {vertex: set(neighbors) for vertex, neighbors in primal.connected_to.items()}
+            assert set(int_primal.get_minfills()) == set(primal.get_minfills())
+            assert set(int_primal.get_mindegrees()) == set(primal.get_mindegrees())
+            candidates = sorted(primal.get_minfills())
+            assert set(int_primal.get_lowest_future_minfill(candidates)) == \
+                set(primal.get_lowest_future_minfill(candidates))
+            vertex = rng.choice(candidates)
+            if rng.random() < 0.2:
+                primal.remove_node(vertex)
+                int_primal.remove_node(vertex)
+            else:
+                primal.remove_and_process_node(vertex)
+                int_primal.remove_and_process_node(vertex)
+        assert int_primal.nb_fills() == 0
+
+
+def test_incremental_fills_are_exact():
+    # 4-cycle a-x-w-y: eliminating a connects x and y, which removes the only missing edge among the neighbors of w
+    options = dict(compute_fills=True, compute_degrees=True, incremental=True)
+    int_primal = create_graph(4, [(0, 1), (1, 2), (2, 3), (3, 0)], IntPrimalGraph, **options)
+    int_primal.remove_and_process_node(0)
+    assert int_primal.get_fill_count(2) == 0
+
+    rng = random.Random(1)
+    for _ in range(100):
+        nb_vertices = rng.randint(1, 14)
+        int_primal = random_graph(rng, nb_vertices, backend=IntPrimalGraph, **options)
+        while int_primal.nb_fills() > 0:
+            int_primal.remove_and_process_node(rng.choice(int_primal.get_minfills()))
+            for index in iter_bits(int_primal.alive):
+                assert int_primal._fills[index] == int_primal._fill_of(index)
+
+
+def test_rollback():
+    rng = random.Random(2)
+    for _ in range(50):
+        nb_vertices = rng.randint(2, 14)
+        int_primal = random_graph(rng, nb_vertices, backend=IntPrimalGraph, compute_fills=True, compute_degrees=True,
+                                  incremental=True)
+        adjacency, alive = list(int_primal.adjacency), int_primal.alive
+        fills = int_primal.get_lowest_fills(nb_vertices)
+        mark = int_primal.checkpoint()
+        for vertex in rng.sample(range(nb_vertices), 2):
+            int_primal.remove_and_process_node(vertex)
+        int_primal.rollback(mark)
+        assert int_primal.adjacency == adjacency and int_primal.alive == alive
+        assert sorted(int_primal.get_lowest_fills(nb_vertices)) == sorted(fills)
+
+
+@pytest.mark.parametrize("incremental", [False, True])
+def test_lowest_future_minfill_keeps_tie_order(incremental):
+    rng = random.Random(3)
+    for _ in range(100):
+        nb_vertices = rng.randint(2, 14)
+        edges = random_edges(rng, nb_vertices)
+        options = dict(compute_fills=True, compute_degrees=True, incremental=incremental)
+        int_primal = create_graph(nb_vertices, edges, IntPrimalGraph, **options)
+        reference = create_graph(nb_vertices, edges, IntPrimalGraph, **options)
+        while int_primal.nb_fills() > 0:
+            candidates = int_primal.get_minfills()
+            int_primal.get_lowest_future_minfill(candidates)
+            if len(candidates) > 1:
+                # The changed fills of each candidate are reinserted: the other vertices, its neighbors, the candidate
+                for vertex in candidates:
+                    index = reference.index[vertex]
+                    neighbors = list(iter_bits(reference.adjacency[index]))
+                    eliminated = copy.deepcopy(reference)
+                    eliminated.remove_and_process_node(vertex)
+                    changed = [other for other in iter_bits(eliminated.alive) if other not in neighbors
+                               and eliminated._fills[other] != reference._fills[other]]
+                    for restored in [*changed, *neighbors, index]:
+                        reference._fills[restored] = reference._fills[restored]
+            assert int_primal.get_lowest_fills(nb_vertices) == reference.get_lowest_fills(nb_vertices)
+            assert int_primal.adjacency == reference.adjacency
+            int_primal.remove_and_process_node(candidates[0])
+            reference.remove_and_process_node(candidates[0])
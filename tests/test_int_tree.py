@@ -0,0 +1,101 @@
+import itertools
+import random
+
+import pytest
+from pywmi.engines.xsdd.vtrees.vtree import VtreeVar, VtreeSplit
+
+from _pywmi.vtree.int_tree import IntTreeVar, IntTreeLine, IntTreeSplit, IntTreeParallel, IntTreeFactory, \
+    vtree_to_int_tree
+from _pywmi.vtree.primal import create_interaction_graph_from_literals
+
+
+def example_tree():
+    split = IntTreeSplit("s", IntTreeVar("a"), IntTreeLine("l", IntTreeVar("b")))
+    return IntTreeParallel(None, [split, IntTreeVar("c"), IntTreeVar("d")])
+
+
+def test_con_vars_and_count():
+    tree = example_tree()
+    assert tree.get_con_vars() == {"s", "a", "l", "b", "c", "d"}
+    assert tree.con_count() == 6
+    assert tree.trees[0].get_con_vars() == {"s", "a", "l", "b"}
+    assert tree.trees[0].con_count() == 4
+    assert tree.depth() == 4
+
+
+def test_deep_line():
+    tree = IntTreeVar(0)
+    for var in range(1, 5000):
+        tree = IntTreeLine(var, tree)
+    assert tree.con_count() == 5000
+    assert tree.get_con_vars() == set(range(5000))
+    assert tree.depth() == 5000
+
+
+def best_partition(weights):
+    total = sum(weights)
+    return min(max(sum(subset), total - sum(subset))
+               for size in range(1, len(weights)) for subset in itertools.combinations(weights, size))
+
+
+@pytest.mark.parametrize("method", ["greedy", "kk", "exact", "auto"])
+def test_partition_trees(method):
+    rng = random.Random(0)
+    parallel = IntTreeParallel(None, [IntTreeVar(0)])
+    for _ in range(200):
+        values = [(rng.choice([0, rng.randint(1, 20)]), i) for i in range(rng.randint(2, 9))]
+        left, right = parallel._partition_trees(values, method)
+        assert len(left) > 0 and len(right) > 0
+        assert sorted(left + right) == sorted(values)
+        heaviest = max(sum(w for w, _ in left), sum(w for w, _ in right))
+        if method in ("exact", "auto"):
+            assert heaviest == best_partition([w for w, _ in values])
+
+
+def test_partition_trees_default_is_greedy():
+    rng = random.Random(1)
+    parallel = IntTreeParallel(None, [IntTreeVar(0)])
+    for _ in range(100):
+        values = [(rng.randint(1, 20), i) for i in range(rng.randint(2, 9))]
+        assert parallel._partition_trees(values) == parallel._partition_greedy(values)
+
+
+def test_vtree_to_int_tree():
+    assert vtree_to_int_tree(VtreeVar("a"), {"a": {"x"}}).var == "x"
+    assert vtree_to_int_tree(VtreeVar("a"), {"a": {"x", "y"}}).get_con_vars() == {"x", "y"}
+    logic2cont = {"a": {"x", "y"}, "b": {"y", "z"}, "c": {"z"}}
+    int_tree = vtree_to_int_tree(VtreeSplit(VtreeVar("a"), VtreeSplit(VtreeVar("b"), VtreeVar("c"))), logic2cont)
+    assert int_tree.get_con_vars() == {"x", "y", "z"}
+    # y is shared by the two sides of the root, so it is eliminated last
+    assert int_tree.get_elimination_order()[-1] == "y"
+
+
+def vtree_leaves(vtree):
+    leaves, stack = [], [vtree]
+    while len(stack) > 0:
+        node = stack.pop()
+        if isinstance(node, VtreeVar):
+            leaves.append(node.var)
+        else:
+            stack.extend((node.subs, node.primes))
+    return leaves
+
+
+@pytest.mark.parametrize("partition", ["greedy", "kk", "exact", "auto"])
+def test_create_vtree_covers_literals(partition):
+    rng = random.Random(2)
+    for _ in range(100):
+        nb_vars = rng.randint(1, 10)
+        logic2cont = {f"l{i}": set(rng.sample(range(nb_vars), rng.randint(0, min(3, nb_vars))))
+                      for i in range(rng.randint(1, 12))}
+        cont_vars = sorted({var for cont_vars in logic2cont.values() for var in cont_vars})
+        if len(cont_vars) == 0:
+            continue
+        primal = create_interaction_graph_from_literals(cont_vars, logic2cont.values(), False, False)
+        int_factory = IntTreeFactory(primal)
+        for var in rng.sample(cont_vars, len(cont_vars)):
+            int_factory.add_node(var)
+            primal.remove_and_process_node(var)
+        int_tree = int_factory.get_int_tree()
+        vtree = int_tree.create_vtree(set(logic2cont), logic2cont, partition)
+        assert sorted(vtree_leaves(vtree)) == sorted(logic2cont)
@@ -0,0 +1,39 @@
+import copy
+import random
+
+from _pywmi.vtree.elimination_engine import EliminationState
+from _pywmi.vtree.int_tree import IntTreeFactory
+from _pywmi.vtree.lookahead import MinfillLookahead
+from _pywmi.vtree.primal import PrimalGraph
+
+from conftest import random_graph
+
+
+def lookahead_cost(primal: PrimalGraph, vertex, depth, beam_width) -> int:
+    """ The lookahead cost of eliminating vertex, computed on copies of the graph. """
+    fill = primal.get_fill_count(vertex)
+    if depth == 1:
+        return fill
+    primal = copy.deepcopy(primal)
+    primal.remove_and_process_node(vertex)
+    if primal.nb_fills() == 0:
+        return fill
+    return fill + min(lookahead_cost(primal, next_vertex, depth - 1, beam_width)
+                      for next_vertex, _ in primal.get_lowest_fills(beam_width))
+
+
+def test_lookahead_tie_breaker():
+    rng = random.Random(0)
+    for _ in range(50):
+        primal = random_graph(rng, rng.randint(2, 12), compute_fills=True, incremental=True)
+        depth, beam_width = rng.randint(1, 3), rng.randint(1, 3)
+        lookahead = MinfillLookahead(depth=depth, beam_width=beam_width)
+        state = EliminationState(primal, IntTreeFactory(primal), rng)
+        while primal.nb_fills() > 0:
+            candidates = list(primal.connected_to)
+            costs = [lookahead_cost(primal, vertex, depth, beam_width) for vertex in candidates]
+            assert lookahead(state, candidates) == [v for v, cost in zip(candidates, costs) if cost == min(costs)]
+            assert all(eliminated >= frozenset(state.ordering) for eliminated, _ in lookahead._memo)
+            selected_var = rng.choice(candidates)
+            state.ordering.append(selected_var)
+            primal.remove_and_process_node(selected_var)
@@ -0,0 +1,53 @@
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from _pywmi.vtree.int_primal import IntPrimalGraph
+from _pywmi.vtree.parallel_ties import ParallelLowestFutureMinfill, get_lowest_future_minfill
+from _pywmi.vtree.primal import PrimalGraph
+from _pywmi.vtree.weighted_primal import WeightedPrimalGraph
+
+from conftest import create_graph
+
+
+def random_problems(seed, nb_problems):
+    rng = random.Random(seed)
+    for _ in range(nb_problems):
+        nb_vertices = rng.randint(2, 14)
+        edges = [(a, b) for a in range(nb_vertices) for b in range(a + 1, nb_vertices) if rng.random() < 0.3]
+        weights = {vertex: float(rng.randint(1, 4)) for vertex in range(nb_vertices)}
+        yield nb_vertices, edges, weights
+
+
+def backends(weights):
+    return [(PrimalGraph, dict()), (IntPrimalGraph, dict()), (WeightedPrimalGraph, dict(weights=weights))]
+
+
+def test_snapshot_same_as_primal():
+    for nb_vertices, edges, weights in random_problems(0, 100):
+        for backend, options in backends(weights):
+            primal = create_graph(nb_vertices, edges, backend, compute_fills=True, **options)
+            reference = create_graph(nb_vertices, edges, backend, compute_fills=True, **options)
+            while primal.nb_fills() > 0:
+                candidates = primal.get_minfills()
+                assert get_lowest_future_minfill(primal, candidates) == reference.get_lowest_future_minfill(candidates)
+                primal.remove_and_process_node(candidates[0])
+                reference.remove_and_process_node(candidates[0])
+
+
+@pytest.mark.parametrize("processes", [False, True])
+def test_parallel_same_as_primal(processes):
+    with ParallelLowestFutureMinfill(workers=2, processes=processes, min_candidates=2) as tie_breaker:
+        for nb_vertices, edges, weights in random_problems(1, 20):
+            for backend, options in backends(weights):
+                primal = create_graph(nb_vertices, edges, backend, compute_fills=True, **options)
+                reference = create_graph(nb_vertices, edges, backend, compute_fills=True, **options)
+                state = SimpleNamespace(primal=primal, ordering=[])
+                while primal.nb_fills() > 0:
+                    candidates = primal.get_minfills()
+                    assert tie_breaker(state, candidates) == reference.get_lowest_future_minfill(candidates)
+                    vertex = candidates[-1]
+                    primal.remove_and_process_node(vertex)
+                    reference.remove_and_process_node(vertex)
+                    state.ordering.append(vertex)
@@ -0,0 +1,97 @@
+import time
+from collections import defaultdict
+
+from pywmi.engines.xsdd.vtrees.vtree import VtreeVar, VtreeSplit
+
+from _pywmi.vtree import portfolio
+from _pywmi.vtree.elimination_width import OrderEvaluator
+from _pywmi.vtree.int_tree import IntTreeVar, IntTreeLine
+from _pywmi.vtree.portfolio import _run_candidates, width_depth
+
+
+def fast(literals):
+    return f"fast {literals}"
+
+
+def slow(literals):
+    time.sleep(10)
+    return f"slow {literals}"
+
+
+def failing(literals):
+    raise ValueError(literals)
+
+
+def test_run_candidates_within_budget():
+    start = time.time()
+    results = _run_candidates("problem", [slow, fast, failing, fast], budget=2.0, max_workers=2)
+    assert time.time() - start < 5
+    assert sorted(results) == [(1, "fast problem"), (3, "fast problem")]
+
+
+def test_width_depth():
+    evaluator = OrderEvaluator("abc", ["ab", "bc"])
+    assert width_depth(IntTreeLine("c", IntTreeLine("b", IntTreeVar("a"))), evaluator) == (1, 3)
+    assert width_depth(IntTreeLine("a", IntTreeLine("c", IntTreeVar("b"))), evaluator) == (2, 3)
+
+
+LOGIC2CONT = {"a": {"x"}, "b": {"x", "y"}, "c": {"y", "z"}, "d": {"z"}}
+
+
+def tables(logic2cont):
+    """ conversion_tables for test problems, which are given as logic2cont. """
+    cont2logic = defaultdict(set)
+    for lit, cont_vars in logic2cont.items():
+        for var in cont_vars:
+            cont2logic[var].add(lit)
+    return logic2cont, cont2logic
+
+
+def split(*leaves):
+    return VtreeSplit(VtreeSplit(VtreeVar(leaves[0]), VtreeVar(leaves[1])),
+                      VtreeSplit(VtreeVar(leaves[2]), VtreeVar(leaves[3])))
+
+
+def chain(literals):
+    return split("a", "b", "c", "d")
+
+
+def reversed_chain(literals):
+    return split("d", "c", "b", "a")
+
+
+def crossed(literals):
+    return split("a", "d", "b", "c")
+
+
+def slow_chain(literals):
+    time.sleep(10)
+    return chain(literals)
+
+
+def leaves(vtree):
+    if isinstance(vtree, VtreeVar):
+        return [vtree.var]
+    return leaves(vtree.primes) + leaves(vtree.subs)
+
+
+def test_portfolio(monkeypatch):
+    monkeypatch.setattr(portfolio, "conversion_tables", tables)
+    monkeypatch.setattr(portfolio, "balanced", lambda literals: "balanced")
+    evaluator = OrderEvaluator("xyz", [LOGIC2CONT[lit] for lit in "abcd"])
+
+    def score(vtree):
+        return width_depth(portfolio.vtree_to_int_tree(vtree, LOGIC2CONT), evaluator)
+    assert score(chain(LOGIC2CONT)) < score(crossed(LOGIC2CONT))
+    assert score(chain(LOGIC2CONT)) == score(reversed_chain(LOGIC2CONT))
+
+    # Nothing finishes within the budget
+    assert portfolio.portfolio([slow_chain, failing], budget=1.0)(LOGIC2CONT) == "balanced"
+    # The lowest (width, depth) wins, unfinished and failing candidates are ignored
+    strat = portfolio.portfolio([crossed, slow_chain, failing, chain], budget=2.0)
+    assert leaves(strat(LOGIC2CONT)) == leaves(chain(LOGIC2CONT))
+    # The first candidate wins ties
+    strat = portfolio.portfolio([crossed, reversed_chain, chain], budget=2.0)
+    assert leaves(strat(LOGIC2CONT)) == leaves(reversed_chain(LOGIC2CONT))
+    strat = portfolio.portfolio([crossed, chain, reversed_chain], budget=2.0)
+    assert leaves(strat(LOGIC2CONT)) == leaves(chain(LOGIC2CONT))
@@ -0,0 +1,102 @@
+import math
+import random
+
+import pytest
+
+from _pywmi.vtree.primal import PrimalGraph
+
+from conftest import random_graph
+
+
+def seeded_graph(seed, **options) -> PrimalGraph:
+    """ The random graph of seed (with fills), the same graph for every call. """
+    rng = random.Random(seed)
+    return random_graph(rng, rng.randint(2, 16), compute_fills=True, **options)
+
+
+def copy_restore_future_minfill(primal: PrimalGraph, vertices):
+    """ get_lowest_future_minfill by backing up and restoring copies of the changed entries (before the trail). """
+    if len(vertices) == 1:
+        return vertices
+    lowest_minfill = math.inf
+    lowest_minfill_vertices = []
+    for vertex in vertices:
+        neighbors = primal.connected_to[vertex]
+        connected_to_partial_backup = {neighbor: primal.connected_to[neighbor].copy() for neighbor in neighbors}
+        connected_to_partial_backup[vertex] = neighbors
+        fills_partial_backup = {neighbor: primal._fills[neighbor] for neighbor in neighbors}
+        fills_partial_backup[vertex] = primal._fills[vertex]
+
+        primal.remove_and_process_node(vertex)
+        _, new_minfill = primal.get_lowest_fills(1)[0]
+        if new_minfill < lowest_minfill:
+            lowest_minfill = new_minfill
+            lowest_minfill_vertices = [vertex]
+        elif new_minfill == lowest_minfill:
+            lowest_minfill_vertices.append(vertex)
+
+        primal.connected_to.update(connected_to_partial_backup)
+        primal._fills.update(fills_partial_backup)
+    return lowest_minfill_vertices
+
+
+def state(primal: PrimalGraph):
+    """ The observable state of primal, including the iteration orders that decide ties. """
+    return [(vertex, list(neighbors)) for vertex, neighbors in primal.connected_to.items()], \
+        primal.get_lowest_fills(primal.nb_fills())
+
+
+@pytest.mark.parametrize("options", [dict(), dict(incremental=True), dict(lazy_fills=True)])
+def test_rollback_restores_graph(options):
+    for seed in range(100):
+        primal = seeded_graph(seed, **options)
+        connected_to = {vertex: set(neighbors) for vertex, neighbors in primal.connected_to.items()}
+        fills = dict(primal.get_lowest_fills(primal.nb_fills()))
+        mark = primal.checkpoint()
+        inner = None
+        for vertex in list(primal.connected_to)[:3]:
+            primal.remove_and_process_node(vertex)
+            if inner is None:
+                inner = primal.checkpoint()
+        if inner is not None:
+            primal.rollback(inner)
+        primal.rollback(mark)
+        assert {vertex: set(neighbors) for vertex, neighbors in primal.connected_to.items()} == connected_to
+        assert dict(primal.get_lowest_fills(primal.nb_fills())) == fills
+
+
+def test_lowest_future_minfill_keeps_tie_order():
+    for seed in range(200):
+        primal, reference = seeded_graph(seed), seeded_graph(seed)
+        while primal.nb_fills() > 0:
+            candidates = primal.get_minfills()
+            assert candidates == reference.get_minfills()
+            assert primal.get_lowest_future_minfill(candidates) == copy_restore_future_minfill(reference, candidates)
+            assert state(primal) == state(reference)
+            primal.remove_and_process_node(candidates[0])
+            reference.remove_and_process_node(candidates[0])
+
+
+def exact_fill(primal: PrimalGraph, vertex):
+    """ The amount of missing edges among the neighbors of vertex, counted in both directions. """
+    neighbors = primal.connected_to[vertex]
+    return sum(len(neighbors - primal.connected_to[neighbor] - {neighbor}) for neighbor in neighbors)
+
+
+def test_incremental_fills_are_exact():
+    for seed in range(100):
+        primal = seeded_graph(seed, incremental=True)
+        while primal.nb_fills() > 0:
+            fills = dict(primal.get_lowest_fills(primal.nb_fills()))
+            assert fills == {vertex: exact_fill(primal, vertex) for vertex in primal.connected_to}
+            primal.remove_and_process_node(primal.get_minfills()[0])
+
+
+def test_lazy_fills_same_as_default():
+    for seed in range(100):
+        primal, reference = seeded_graph(seed, lazy_fills=True), seeded_graph(seed)
+        while primal.nb_fills() > 0:
+            assert primal.get_lowest_fills(primal.nb_fills()) == reference.get_lowest_fills(reference.nb_fills())
+            vertex = reference.get_minfills()[0]
+            primal.remove_and_process_node(vertex)
+            reference.remove_and_process_node(vertex)
@@ -0,0 +1,64 @@
+import random
+from functools import lru_cache
+
+from _pywmi.vtree.primal import PrimalGraph
+from _pywmi.vtree.treedepth import TreeDepthDecomposition
+
+from conftest import create_graph, random_graph
+
+
+def brute_force_tree_depth(primal: PrimalGraph) -> int:
+    """ td(G) = max over the components C of 1 + min over the vertices v of C of td(C - v). """
+    @lru_cache(maxsize=None)
+    def tree_depth(vertices: frozenset) -> int:
+        if len(vertices) == 0:
+            return 0
+        components, todo = [], set(vertices)
+        while todo:
+            component, frontier = set(), {todo.pop()}
+            while frontier:
+                component |= frontier
+                frontier = {n for v in frontier for n in primal.connected_to[v] if n in todo and n not in component}
+                todo -= frontier
+            components.append(frozenset(component))
+        return max(1 + min(tree_depth(component - {v}) for v in component) for component in components)
+    return tree_depth(frozenset(primal.connected_to))
+
+
+def check_elimination_tree(primal: PrimalGraph, int_tree):
+    """ Each variable occurs once and each edge connects a variable with one of its ancestors. """
+    ancestors = dict()
+    stack = [(int_tree, frozenset())]
+    while stack:
+        node, above = stack.pop()
+        if node.var is not None:
+            assert node.var not in ancestors
+            ancestors[node.var] = above
+            above = above | {node.var}
+        stack.extend((child, above) for child in node.get_children())
+    assert set(ancestors) == set(primal.connected_to)
+    for vertex, neighbors in primal.connected_to.items():
+        for neighbor in neighbors:
+            assert neighbor in ancestors[vertex] or vertex in ancestors[neighbor]
+
+
+def test_exact_tree_depth():
+    primal = create_graph(8, [(0, 2), (0, 6), (1, 3), (1, 4), (2, 4), (3, 5), (3, 7), (4, 5)])
+    assert brute_force_tree_depth(primal) == 3
+    assert TreeDepthDecomposition(primal).get_int_tree().depth() == 3
+
+    rng = random.Random(0)
+    for _ in range(500):
+        primal = random_graph(rng, rng.randint(1, 10))
+        int_tree = TreeDepthDecomposition(primal).get_int_tree()
+        check_elimination_tree(primal, int_tree)
+        # Several components are joined by a root without variable
+        assert int_tree.depth() == brute_force_tree_depth(primal) + (1 if int_tree.var is None else 0)
+
+
+def test_large_components():
+    rng = random.Random(1)
+    for _ in range(20):
+        primal = random_graph(rng, rng.randint(10, 40))
+        int_tree = TreeDepthDecomposition(primal, exact_size=6).get_int_tree()
+        check_elimination_tree(primal, int_tree)
@@ -0,0 +1,88 @@
+import itertools
+import random
+import time
+
+from _pywmi.vtree.vtree_cache import canonical_form
+
+
+def random_hypergraph(rng, nb_literals, nb_cont_vars, density=0.4):
+    return {f"l{i}": {f"c{j}" for j in range(nb_cont_vars) if rng.random() < density} for i in range(nb_literals)}
+
+
+def relabel(rng, logic2cont):
+    """ Rename and shuffle the literals and continuous variables (including the iteration orders). """
+    literals = list(logic2cont)
+    cont_vars = sorted({cvar for cvars in logic2cont.values() for cvar in cvars})
+    literal_names = dict(zip(literals, rng.sample(range(len(literals)), len(literals))))
+    cont_names = dict(zip(cont_vars, rng.sample(range(len(cont_vars)), len(cont_vars))))
+    rng.shuffle(literals)
+    return {("lit", literal_names[lit]): {("cvar", cont_names[cvar]) for cvar in rng.sample(sorted(logic2cont[lit]),
+                                                                                               len(logic2cont[lit]))}
+            for lit in literals}
+
+
+def isomorphic(first, second):
+    first_literals, second_literals = list(first), list(second)
+    first_cont = sorted({cvar for cvars in first.values() for cvar in cvars})
+    second_cont = sorted({cvar for cvars in second.values() for cvar in cvars})
+    if len(first_literals) != len(second_literals) or len(first_cont) != len(second_cont):
+        return False
+    for cont_permutation in itertools.permutations(second_cont):
+        cont_map = dict(zip(first_cont, cont_permutation))
+        mapped = sorted(sorted(cont_map[cvar] for cvar in first[lit]) for lit in first_literals)
+        if mapped == sorted(sorted(second[lit]) for lit in second_literals):
+            return True
+    return False
+
+
+def star(nb_leaves):
+    return {**{f"x{i}": {"c", f"y{i}"} for i in range(nb_leaves)}, **{f"b{i}": {"c"} for i in range(nb_leaves)}}
+
+
+def xor(nb_vars):
+    return {**{f"x{i}": {f"v{i}"} for i in range(nb_vars)},
+            **{f"s{i}": {f"v{i}", f"v{i + 1}"} for i in range(nb_vars - 1)}}
+
+
+def test_canonical_form_relabeling_invariant():
+    rng = random.Random(0)
+    for _ in range(300):
+        logic2cont = random_hypergraph(rng, rng.randint(1, 10), rng.randint(1, 8))
+        form = canonical_form(logic2cont)[0]
+        for _ in range(3):
+            assert canonical_form(relabel(rng, logic2cont))[0] == form
+
+
+def test_canonical_form_symmetric_families():
+    rng = random.Random(1)
+    for logic2cont in [star(6), xor(8), {f"m{i}": {f"v{i}", f"v{(i + 1) % 7}"} for i in range(7)}]:
+        form = canonical_form(logic2cont)[0]
+        for _ in range(5):
+            assert canonical_form(relabel(rng, logic2cont))[0] == form
+
+
+def test_canonical_orders_rebuild_hypergraph():
+    rng = random.Random(2)
+    for _ in range(200):
+        logic2cont = random_hypergraph(rng, rng.randint(1, 8), rng.randint(1, 6))
+        (nb_literals, nb_cont_vars, edges), literal_order, cont_order = canonical_form(logic2cont)
+        assert sorted(literal_order) == sorted(logic2cont) and nb_literals == len(literal_order)
+        assert nb_cont_vars == len(cont_order)
+        rebuilt = {lit: set() for lit in literal_order}
+        for literal, cvar in edges:
+            rebuilt[literal_order[literal]].add(cont_order[cvar])
+        assert rebuilt == logic2cont
+
+
+def test_canonical_form_equal_iff_isomorphic():
+    rng = random.Random(3)
+    hypergraphs = [random_hypergraph(rng, rng.randint(1, 4), rng.randint(1, 3), 0.5) for _ in range(60)]
+    forms = [canonical_form(logic2cont)[0] for logic2cont in hypergraphs]
+    for i, j in itertools.combinations(range(len(hypergraphs)), 2):
+        assert (forms[i] == forms[j]) == isomorphic(hypergraphs[i], hypergraphs[j])
+
+
+def test_canonical_form_large_symmetric():
+    start = time.perf_counter()
+    canonical_form(star(40))
+    assert time.perf_counter() - start < 10
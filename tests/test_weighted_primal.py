@@ -0,0 +1,46 @@
+import random
+
+import pytest
+
+from _pywmi.vtree.primal import PrimalGraph
+from _pywmi.vtree.weighted_primal import WeightedPrimalGraph
+
+from conftest import create_graph
+
+
+def weighted_fill(primal: WeightedPrimalGraph, vertex):
+    neighbors = sorted(primal.connected_to[vertex])
+    return sum(2 * primal.weight(a) * primal.weight(b) for i, a in enumerate(neighbors) for b in neighbors[i + 1:]
+               if b not in primal.connected_to[a])
+
+
+def test_weighted_fills():
+    rng = random.Random(0)
+    for _ in range(50):
+        nb_vertices = rng.randint(2, 12)
+        edges = [(a, b) for a in range(nb_vertices) for b in range(a + 1, nb_vertices) if rng.random() < 0.3]
+        weights = {vertex: float(rng.randint(1, 5)) for vertex in range(nb_vertices)}
+        primal = create_graph(nb_vertices, edges, WeightedPrimalGraph, compute_fills=True, weights=weights)
+        unit = create_graph(nb_vertices, edges, WeightedPrimalGraph, compute_fills=True)
+        reference = create_graph(nb_vertices, edges, PrimalGraph, compute_fills=True)
+        fills = dict(primal.get_lowest_fills(primal.nb_fills()))
+        assert fills == {vertex: weighted_fill(primal, vertex) for vertex in primal.connected_to}
+        # With unit weights, the fills (and their updates) are those of the unweighted graph
+        while unit.nb_fills() > 0:
+            assert unit.get_lowest_fills(unit.nb_fills()) == reference.get_lowest_fills(reference.nb_fills())
+            vertex = reference.get_minfills()[0]
+            unit.remove_and_process_node(vertex)
+            reference.remove_and_process_node(vertex)
+
+
+def test_weighted_degrees():
+    primal = WeightedPrimalGraph(range(3), compute_fills=False, compute_degrees=True, weights={0: 2.0, 1: 3.0})
+    primal.add_edge(0, 1)
+    primal.add_edge(1, 2)
+    primal.compute_degrees()
+    assert primal.get_mindegrees() == [2]  # 1.0 + 3.0, versus 2.0 + 3.0 and 3.0 + 2.0 + 1.0
+
+
+def test_bucket_queue_rejected():
+    with pytest.raises(AssertionError):
+        WeightedPrimalGraph(range(3), bucket_queue=True)